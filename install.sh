@@ -65,8 +65,15 @@ install_package "numpy"
 # 設定主程式執行權限
 echo ""
 echo -e "${YELLOW}[3/5]${NC} 設定執行權限..."
-chmod +x "$SCRIPT_DIR/remove_watermark.py"
-echo -e "  ${GREEN}✓${NC} 已設定 remove_watermark.py 執行權限"
+chmod +x "$SCRIPT_DIR/remove_watermark.py" "$SCRIPT_DIR/watermark_daemon.py"
+echo -e "  ${GREEN}✓${NC} 已設定 remove_watermark.py、watermark_daemon.py 執行權限"
+
+# 預先建立 alpha map 快取（失敗時執行期會改用內嵌素材）
+if "$PYTHON_PATH" "$SCRIPT_DIR/remove_watermark.py" --build-cache >/dev/null 2>&1; then
+	echo -e "  ${GREEN}✓${NC} 已建立 alpha map 快取"
+else
+	echo -e "  ${YELLOW}○${NC} 無法建立 alpha map 快取，將使用內嵌素材"
+fi
 
 # 建立 Services 目錄
 echo ""
@@ -193,25 +200,20 @@ export PATH="/usr/local/bin:/opt/homebrew/bin:/usr/bin:\$PATH"
 # Python 路徑（安裝時自動偵測）
 PYTHON_PATH="${PYTHON_PATH}"
 
-# 腳本路徑
-SCRIPT_PATH="${SCRIPT_DIR}/remove_watermark.py"
-
-# 計數器
-SUCCESS=0
-FAIL=0
+# 客戶端腳本路徑（透過常駐服務處理，必要時自動啟動）
+CLIENT_PATH="${SCRIPT_DIR}/watermark_daemon.py"
 
-# 處理每個輸入檔案
-for f in "\$@"; do
-    if "\$PYTHON_PATH" "\$SCRIPT_PATH" "\$f"; then
-        ((SUCCESS++))
-    else
-        ((FAIL++))
-    fi
-done
+# 一次送出所有選取的檔案，每個檔案輸出一行 ✓ 或 ✗
+OUTPUT=\$("\$PYTHON_PATH" "\$CLIENT_PATH" "\$@")
+STATUS=\$?
+SUCCESS=\$(printf '%s\\n' "\$OUTPUT" | grep -c '^✓')
+FAIL=\$(printf '%s\\n' "\$OUTPUT" | grep -c '^✗')
 
-# 顯示通知
-if [ \$FAIL -eq 0 ]; then
+# 顯示通知（客戶端以非零狀態結束時，即使沒有 ✗ 也視為失敗）
+if [ \$STATUS -eq 0 ] && [ \$FAIL -eq 0 ]; then
     osascript -e "display notification \"成功處理 \$SUCCESS 張圖片\" with title \"KillWatermark\" sound name \"Glass\""
+elif [ \$FAIL -eq 0 ]; then
+    osascript -e "display notification \"處理未完成（結束代碼 \$STATUS），成功: \$SUCCESS\" with title \"KillWatermark\" sound name \"Basso\""
 else
     osascript -e "display notification \"成功: \$SUCCESS, 失敗: \$FAIL\" with title \"KillWatermark\" sound name \"Basso\""
 fi
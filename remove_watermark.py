@@ -10,12 +10,19 @@
     pip3 install Pillow numpy
 """
 
+from __future__ import annotations
+
 import sys
 import os
-import base64
+import threading
+import contextlib
 from io import BytesIO
-import numpy as np
-from PIL import Image
+from collections import OrderedDict, deque
+
+# NumPy 與 Pillow 在建立 WatermarkRemover 時才匯入（見 _load_dependencies），
+# 使用說明、找不到檔案等不需要處理圖片的路徑可以快速結束
+np = None
+Image = None
 
 # ===== 預設背景素材 (Base64 編碼) =====
 # 48x48 背景
@@ -191,23 +198,168 @@ kyfLPyzPz8+f/OTJ6uVLNLrF9qsbd2owXSWan6U73q47YXrioeqVEF4fBvBvwZvfB2giLLAAAAAASUVO
 RK5CYII=
 """
 
+# ===== alpha map 快取檔 =====
+# 預先計算的 48/96 alpha map 與正規化 alpha map 以 float32 陣列存放，
+# 各行程以唯讀 mmap 載入，共用同一份 page cache
+ALPHA_CACHE_VERSION = 1
+LOGO_SIZES = (48, 96)
+
+# ===== 縮放過的 logo =====
+# 其他尺寸的 alpha map 由 96 的 alpha map 重新取樣，以 LRU 保留最近使用的尺寸
+SOURCE_LOGO_SIZE = 96
+ALPHA_MAP_LRU_SIZE = 16
+# 邊距與 logo 尺寸的比例（48/32、96/64）
+LOGO_MARGIN_RATIO = 2 / 3
+
+# ===== 輸出編碼設定 =====
+# fast: 低 zlib 壓縮等級且不做最佳化搜尋，編碼最快
+# balanced: Pillow 預設的 zlib 壓縮等級
+# smallest: 完整的 optimize 搜尋，檔案最小但最慢（原本的行為）
+ENCODE_PROFILES = {
+    "fast": {"png": {"compress_level": 1}, "jpeg": {}, "other": {}},
+    "balanced": {"png": {"compress_level": 6}, "jpeg": {"optimize": True}, "other": {}},
+    "smallest": {
+        "png": {"optimize": True},
+        "jpeg": {"optimize": True},
+        "other": {"optimize": True},
+    },
+}
+DEFAULT_ENCODE_PROFILE = "smallest"
+DEFAULT_JPEG_QUALITY = 95
+
+# ===== 多影格圖片 =====
+# 可輸出多影格的格式（動態 GIF/WebP/PNG 與多頁 TIFF），其他輸出格式只處理第一個影格
+MULTI_FRAME_FORMATS = ("GIF", "WEBP", "PNG", "TIFF")
+# 平行處理影格的預設執行緒數上限
+MAX_FRAME_JOBS = 4
+
+# 未啟用各階段量測時共用的空 context manager
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def _load_dependencies():
+    """匯入 NumPy 與 Pillow（只在第一次呼叫時匯入）"""
+    global np, Image
+    if np is None:
+        import numpy
+        from PIL import Image as pil_image
+
+        np = numpy
+        Image = pil_image
+
+
+def get_alpha_cache_path() -> str:
+    """
+    取得 alpha map 快取檔路徑
+    檔名包含素材與格式版本的雜湊，素材變更後舊的快取檔自動失效
+    """
+    import hashlib
+
+    cache_dir = os.environ.get("KILLWATERMARK_CACHE_DIR")
+    if not cache_dir:
+        cache_root = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        cache_dir = os.path.join(cache_root, "killwatermark")
+    digest = hashlib.sha256(
+        f"{ALPHA_CACHE_VERSION}\n{BG_48_BASE64}\n{BG_96_BASE64}".encode("utf-8")
+    ).hexdigest()[:16]
+    return os.path.join(cache_dir, f"alpha_maps-{digest}.npy")
+
+
+def _fft_length(n: int) -> int:
+    """不小於 n、且只有 2、3、5 質因數的長度（FFT 在這些長度上最快）"""
+    while True:
+        m = n
+        for factor in (2, 3, 5):
+            while m % factor == 0:
+                m //= factor
+        if m == 1:
+            return n
+        n += 1
+
 
 class WatermarkRemover:
-    """浮水印移除器"""
+    """
+    浮水印移除器
+    同一個實例可在多個執行緒間共用（daemon 與 pipeline 即是如此）：alpha map 只在第一次使用時
+    於鎖內載入一次，之後唯讀；重新取樣與查表的 LRU 也以鎖保護。
+    啟用 metrics 時各階段量測會正確彙總，但 Metrics.last_record 是任一執行緒最後完成的圖片，
+    需要逐張量測時請改用各自的 ImageRecord（見 watermark_pipeline）
+    """
     
     # 浮水印移除參數設定
     ALPHA_THRESHOLD = 0.002
     MAX_ALPHA = 0.99
     DEFAULT_LOGO_VALUE = 255
     
-    def __init__(self):
-        self.bg_48 = self._load_base64_image(BG_48_BASE64)
-        self.bg_96 = self._load_base64_image(BG_96_BASE64)
-        self.alpha_map_48 = None
-        self.alpha_map_96 = None
+    # 候選搜尋參數（與 JS 版本 PROFILE_STRENGTHS 一致）
+    CANDIDATE_ALPHA_SCALES = (1.0, 0.9, 0.8, 0.7)
+    CANDIDATE_LOGO_VALUES = (DEFAULT_LOGO_VALUE,)
+    
+    # 位置搜尋參數：只在各尺寸的預期位置（依比例縮放的邊距）附近搜尋，
+    # 容許的偏移為 logo 尺寸的倍數
+    SEARCH_OFFSET_FACTOR = 1.0
+    SEARCH_NCC_THRESHOLD = 0.3
+    # 縮放過的 logo 尺寸搜尋範圍，先以約 1/12 尺寸的步長掃描，再逐像素細調
+    SEARCH_LOGO_SIZE_RANGE = (24, 192)
+    SEARCH_SIZE_STEP_RATIO = 12
+    # 依相關係數由高到低細調並驗證的候選數
+    SEARCH_CANDIDATES = 5
+    # 固定位置命中但形狀不符時，附近搜尋的尺寸與位置範圍（logo 尺寸的比例）
+    SEARCH_NEAR_RATIO = 0.25
+    # 形狀驗證：去除背景後的亮度變化須符合 alpha * (255 - 背景)，
+    # 增益需在 alpha 強度的合理範圍內，且模型可解釋的變異比例（R²）不低於下限
+    SEARCH_GAIN_RANGE = (0.55, 1.25)
+    SEARCH_MIN_FIT = 0.4
+    # 固定位置的結果只需增益與選出的 alpha 強度相差不超過此值（雜訊很強的背景 R² 很低）
+    SEARCH_FIXED_GAIN_TOLERANCE = 0.05
+    
+    def __init__(self, cache_path: str = None,
+                 encode_profile: str = DEFAULT_ENCODE_PROFILE,
+                 jpeg_quality=DEFAULT_JPEG_QUALITY, jpeg_subsampling=None,
+                 search: bool = False, logo_size: int = None, metrics=None,
+                 frame_jobs: int = None):
+        """
+        Args:
+            cache_path: alpha map 快取檔路徑（預設由 get_alpha_cache_path 決定）
+            encode_profile: 輸出編碼設定，fast / balanced / smallest
+            jpeg_quality: JPEG 品質（1-100），或 "keep" 沿用來源 JPEG 的量化表
+            jpeg_subsampling: JPEG 色度抽樣，"4:4:4" / "4:2:2" / "4:2:0" / "keep"，
+                None 表示使用 Pillow 預設值
+            search: 固定位置未偵測到浮水印時，是否在右下角範圍內搜尋
+                （適用於裁切、補邊或重新構圖過的圖片）；48/96 都找不到時再搜尋其他尺寸
+            logo_size: 指定 logo 尺寸（圖片縮放過時使用），邊距依比例縮放；
+                None 表示依圖片尺寸選擇 48 或 96
+            metrics: 各階段量測（watermark_metrics.Metrics），None 表示不量測
+            frame_jobs: 多影格圖片平行處理影格的執行緒數，
+                None 表示 CPU 核心數（最多 MAX_FRAME_JOBS），1 表示不使用執行緒
+        """
+        if encode_profile not in ENCODE_PROFILES:
+            raise ValueError(f"未知的編碼設定: {encode_profile}")
+        _load_dependencies()
+        self.cache_path = cache_path or get_alpha_cache_path()
+        self.encode_profile = encode_profile
+        self.jpeg_quality = jpeg_quality
+        self.jpeg_subsampling = jpeg_subsampling
+        self.search = search
+        self.logo_size = logo_size
+        self.metrics = metrics
+        self.frame_jobs = frame_jobs or min(MAX_FRAME_JOBS, os.cpu_count() or 1)
+        self._backgrounds = {}
+        self._alpha_maps = {}
+        self._alpha_norms = {}
+        # 尺寸 -> (alpha map, 正規化 alpha map)，依最近使用順序排列
+        self._resampled = OrderedDict()
+        # (尺寸, alpha 強度, logo 色彩) -> 移除用的查表，依最近使用順序排列
+        self._removal_luts = OrderedDict()
+        # 多個執行緒共用同一個實例時，保護上面兩個 LRU
+        self._lru_lock = threading.Lock()
+        # 確保 alpha map 只載入一次，其他執行緒等待載入完成
+        self._load_lock = threading.Lock()
         
     def _load_base64_image(self, base64_str: str) -> Image.Image:
         """從 Base64 字串載入圖片"""
+        import base64
+
         # 移除前後空白並清除空白字元
         base64_str = base64_str.strip()
         # 若為 data URI，去除前綴
@@ -227,37 +379,149 @@ class WatermarkRemover:
         與 JS 版本一致：使用 max(r, g, b) / 255
         """
         bg_array = np.array(bg_image, dtype=np.float32)
-        height, width = bg_array.shape[:2]
-        alpha_map = np.zeros((height, width), dtype=np.float32)
-        
-        for y in range(height):
-            for x in range(width):
-                r, g, b = bg_array[y, x, :3]
-                # 與 JS 版本一致：計算 max channel 作為 alpha
-                max_channel = max(r, g, b)
-                alpha_map[y, x] = max_channel / 255.0
-                    
-        return alpha_map
+        # 與 JS 版本一致：計算 max channel 作為 alpha（整張陣列一次計算）
+        return bg_array[:, :, :3].max(axis=2) / 255.0
     
+    def _get_background(self, size: int) -> Image.Image:
+        """取得指定尺寸的背景素材（僅在需要時才解碼 Base64）"""
+        if size not in self._backgrounds:
+            base64_str = BG_96_BASE64 if size == 96 else BG_48_BASE64
+            self._backgrounds[size] = self._load_base64_image(base64_str)
+        return self._backgrounds[size]
+
+    def _compute_alpha_data(self) -> np.ndarray:
+        """
+        由內嵌 Base64 素材計算快取內容
+        依 LOGO_SIZES 順序串接每個尺寸的 alpha map 與正規化 alpha map
+        """
+        parts = []
+        for size in LOGO_SIZES:
+            alpha_map = self._calculate_alpha_map(self._get_background(size))
+            # 與 JS 版本 calculateAlphaStats 一致：(alpha - mean) / std
+            mean = alpha_map.mean(dtype=np.float64)
+            std = alpha_map.std(dtype=np.float64) or 1.0
+            alpha_norm = ((alpha_map - mean) / std).astype(np.float32)
+            parts.extend([alpha_map.ravel(), alpha_norm.ravel()])
+        return np.concatenate(parts).astype(np.float32)
+
+    def _read_alpha_cache(self):
+        """以唯讀 mmap 載入快取檔，檔案不存在、不完整或格式不符時回傳 None"""
+        expected = sum(2 * size * size for size in LOGO_SIZES)
+        try:
+            data = np.load(self.cache_path, mmap_mode="r", allow_pickle=False)
+        except (OSError, ValueError, EOFError):
+            # 空檔案會引發 EOFError，截斷的檔案會引發 ValueError
+            return None
+        if data.dtype != np.float32 or data.shape != (expected,):
+            return None
+        return data
+
+    def build_alpha_cache(self) -> str:
+        """
+        建立 alpha map 快取檔
+        先寫入暫存檔再 rename，避免其他行程讀到寫到一半的檔案
+
+        Returns:
+            快取檔路徑
+        """
+        return self._write_alpha_cache(self._compute_alpha_data())
+
+    def _write_alpha_cache(self, data: np.ndarray) -> str:
+        """將 alpha map 陣列寫入快取檔"""
+        import tempfile
+
+        cache_dir = os.path.dirname(self.cache_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, data, allow_pickle=False)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.cache_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self.cache_path
+
+    def _load_alpha_maps(self):
+        """
+        載入所有尺寸的 alpha map
+        優先使用 mmap 快取檔；若不存在或已過期，改由內嵌 Base64 計算並嘗試寫入快取
+        """
+        data = self._read_alpha_cache()
+        if data is None:
+            data = self._compute_alpha_data()
+            try:
+                self._write_alpha_cache(data)
+            except OSError:
+                # 快取目錄不可寫時仍可使用記憶體中的結果
+                pass
+
+        offset = 0
+        for size in LOGO_SIZES:
+            count = size * size
+            alpha_map = data[offset:offset + count].reshape(size, size)
+            offset += count
+            # 先放入正規化 alpha map：其他執行緒以 _alpha_maps 判斷是否已載入
+            self._alpha_norms[size] = data[offset:offset + count].reshape(size, size)
+            self._alpha_maps[size] = alpha_map
+            offset += count
+
     def _get_alpha_map(self, size: int) -> np.ndarray:
         """取得指定尺寸的 alpha map"""
-        if size == 48:
-            if self.alpha_map_48 is None:
-                self.alpha_map_48 = self._calculate_alpha_map(self.bg_48)
-            return self.alpha_map_48
-        elif size == 96:
-            if self.alpha_map_96 is None:
-                self.alpha_map_96 = self._calculate_alpha_map(self.bg_96)
-            return self.alpha_map_96
-        else:
-            # 預設使用 48
-            return self._get_alpha_map(48)
+        if size not in LOGO_SIZES:
+            return self._get_resampled(size)[0]
+        if size not in self._alpha_maps:
+            with self._load_lock:
+                if size not in self._alpha_maps:
+                    self._load_alpha_maps()
+        return self._alpha_maps[size]
+
+    def _get_alpha_norm(self, size: int) -> np.ndarray:
+        """取得指定尺寸的正規化 alpha map（(alpha - mean) / std）"""
+        if size not in LOGO_SIZES:
+            return self._get_resampled(size)[1]
+        self._get_alpha_map(size)
+        return self._alpha_norms[size]
+
+    def _get_resampled(self, size: int) -> tuple:
+        """
+        取得重新取樣的 alpha map 與正規化 alpha map
+        由 96 的 alpha map 以 Lanczos 縮放，結果保留在 LRU 中
+        """
+        with self._lru_lock:
+            entry = self._resampled.get(size)
+            if entry is not None:
+                self._resampled.move_to_end(size)
+                return entry
+
+        source = Image.fromarray(np.array(self._get_alpha_map(SOURCE_LOGO_SIZE)), mode="F")
+        alpha = np.asarray(source.resize((size, size), Image.LANCZOS), dtype=np.float32)
+        # Lanczos 的振鈴可能產生負值或超過 1 的值
+        alpha = np.clip(alpha, 0.0, 1.0)
+        std = alpha.std()
+        norm = (alpha - alpha.mean()) / std if std > 0 else np.zeros_like(alpha)
+        entry = (alpha, norm.astype(np.float32))
+
+        with self._lru_lock:
+            self._resampled[size] = entry
+            if len(self._resampled) > ALPHA_MAP_LRU_SIZE:
+                self._resampled.popitem(last=False)
+        return entry
+
+    def _scaled_config(self, logo_size: int) -> dict:
+        """任意 logo 尺寸的浮水印配置，邊距依比例縮放"""
+        margin = int(round(logo_size * LOGO_MARGIN_RATIO))
+        return {"logo_size": logo_size, "margin_right": margin, "margin_bottom": margin}
 
     def _detect_watermark_config(self, image_width: int, image_height: int) -> dict:
         """
         根據圖片尺寸決定浮水印配置
-        與 JS 版本一致
+        與 JS 版本一致；指定 logo_size 時改用該尺寸並依比例縮放邊距
         """
+        if self.logo_size is not None:
+            return self._scaled_config(self.logo_size)
         if image_width > 1024 and image_height > 1024:
             return {"logo_size": 96, "margin_right": 64, "margin_bottom": 64}
         else:
@@ -280,12 +544,17 @@ class WatermarkRemover:
             "height": logo_size,
         }
 
-    def _detect_watermark_position(self, image: Image.Image) -> tuple:
+    def _detect_watermark(self, image: Image.Image):
         """
-        偵測浮水印位置
-        使用與 JS 版本一致的邏輯
+        偵測浮水印並選出最佳的移除參數
+        使用與 JS 版本一致的邏輯：先以亮度特徵判斷，再以候選搜尋選出 alpha 強度與 logo 色彩；
+        固定位置未偵測到且啟用搜尋時，再於右下角範圍內定位
+
+        Returns:
+            {"x", "y", "size", "alpha_scale", "logo_value", "score", "base_score"}，
+            未偵測到浮水印時回傳 None
         """
-        width, height = image.size
+        width, height = self._get_image_size(image)
 
         # 使用配置決定浮水印大小和位置
         config = self._detect_watermark_config(width, height)
@@ -295,29 +564,285 @@ class WatermarkRemover:
         x = position["x"]
         y = position["y"]
 
+        detection = None
         if x >= 0 and y >= 0:
-            # 取得 alpha map
-            alpha_map = self._get_alpha_map(wm_size)
-
-            # 檢查此區域是否有浮水印
-            if self._is_watermark_present(image, alpha_map, position):
-                return (x, y, wm_size)
+            detection = self._detect_at(image, x, y, wm_size)
+            if detection is not None and not self.search:
+                return detection
         
+        if not self.search:
+            return detection
+        if detection is None:
+            # 只有固定位置沒有命中時才掃描整個尺寸範圍
+            return self._search_watermark(image)
+        # 固定位置命中但形狀不符時（例如縮放比例接近 1、logo 只重疊一部分），
+        # 只在固定位置附近的尺寸與位置比對；找不到時維持固定位置的結果，
+        # 搜尋模式不會比固定位置少偵測
+        if self._verify_logo_shape(image, detection, fixed=True):
+            return detection
+        return self._search_near(image, detection) or detection
+
+    def _detect_at(self, image: Image.Image, x: int, y: int, size: int,
+                   alpha_maps: tuple = None):
+        """
+        檢查指定位置是否有浮水印，有則回傳偵測結果與移除參數
+
+        Args:
+            alpha_maps: (alpha map, 正規化 alpha map)，None 表示使用該尺寸的預設 alpha map
+        """
+        # 取得 alpha map
+        if alpha_maps is None:
+            alpha_maps = (self._get_alpha_map(size), self._get_alpha_norm(size))
+        alpha_map, alpha_norm = alpha_maps
+
+        # 只裁切浮水印區塊進行檢查，不轉換整張圖片
+        patch = self._crop_patch(image, x, y, size)
+        if not self._is_watermark_present(patch, alpha_map):
+            return None
+        profile = self._select_best_profile(patch, alpha_map, alpha_norm)
+        if profile is None:
+            return None
+        return {"x": x, "y": y, "size": size, **profile}
+
+    def _search_watermark(self, image: Image.Image):
+        """
+        在右下角預期位置附近搜尋浮水印（用於裁切、補邊、重新構圖或縮放過的圖片）
+        在尺寸範圍內以固定比例的步長掃描，每個尺寸只在依比例縮放的邊距位置附近定位；
+        相關係數最高的幾個候選再逐像素細調尺寸與位置，依序以亮度特徵與形狀驗證。
+        相關係數只比對形狀，平滑的漸層或光斑也可能得到高分，因此不能單獨作為判斷依據
+        """
+        width, height = self._get_image_size(image)
+        low, high = self.SEARCH_LOGO_SIZE_RANGE
+        high = min(high, width, height)
+
+        sizes = set(size for size in LOGO_SIZES if low <= size <= high)
+        size = low
+        while size <= high:
+            sizes.add(size)
+            size += self._search_step(size)
+
+        located = [self._locate_size(image, size) for size in sorted(sizes)]
+        return self._verify_candidates(image, located)
+
+    def _search_near(self, image: Image.Image, detection: dict):
+        """
+        在固定位置的結果附近搜尋：尺寸與位置偏移都不超過 SEARCH_NEAR_RATIO 倍 logo 尺寸，
+        只計算幾個小範圍，成本遠低於完整掃描
+        """
+        size, x, y = detection["size"], detection["x"], detection["y"]
+        low, high = self.SEARCH_LOGO_SIZE_RANGE
+        low = max(low, int(size * (1 - self.SEARCH_NEAR_RATIO)))
+        high = min(high, int(size * (1 + self.SEARCH_NEAR_RATIO)))
+        pad = int(round(size * self.SEARCH_NEAR_RATIO))
+        box = (x - pad, y - pad, x + size + pad, y + size + pad)
+
+        located = []
+        candidate = low
+        while candidate <= high:
+            located.append(self._locate_size(image, candidate, box))
+            candidate += self._search_step(candidate)
+        return self._verify_candidates(image, located)
+
+    def _verify_candidates(self, image: Image.Image, located: list):
+        """依相關係數由高到低細調並驗證 (ncc, 尺寸, x, y) 候選，回傳第一個通過的偵測結果"""
+        candidates = sorted(
+            (c for c in located if c[0] >= self.SEARCH_NCC_THRESHOLD), reverse=True
+        )
+        for ncc, size, x, y in candidates[:self.SEARCH_CANDIDATES]:
+            ncc, size, x, y = self._refine_size(image, ncc, size, x, y)
+            detection = self._detect_at(image, x, y, size)
+            if detection is not None and self._verify_logo_shape(image, detection):
+                detection["ncc"] = ncc
+                return detection
         return None
 
-    def _is_watermark_present(
-        self, image: Image.Image, alpha_map: np.ndarray, position: dict
-    ) -> bool:
+    def _search_step(self, size: int) -> int:
+        """尺寸掃描的步長"""
+        return max(2, size // self.SEARCH_SIZE_STEP_RATIO)
+
+    def _refine_size(self, image: Image.Image, ncc: float, size: int, x: int, y: int) -> tuple:
         """
-        判斷區域是否存在浮水印
-        使用與 JS 版本一致的亮度與 alpha 特徵分析
+        在掃描步長內細調尺寸：每次比較目前尺寸兩側相距 h 的尺寸，h 逐次減半到 1；
+        只在目前位置附近的小範圍內定位，尺寸不會離開掃描時的一個步長
         """
-        x = position["x"]
-        y = position["y"]
-        width = position["width"]
-        height = position["height"]
+        best = (ncc, size, x, y)
+        low, high = self.SEARCH_LOGO_SIZE_RANGE
+        step = self._search_step(size)
+        low, high = max(low, size - step + 1), min(high, size + step - 1)
+        offset = step // 2
+        while offset >= 1:
+            _, size, x, y = best
+            pad = offset + 2
+            box = (x - pad, y - pad, x + size + pad, y + size + pad)
+            for candidate in (size - offset, size + offset):
+                if low <= candidate <= high:
+                    located = self._locate_size(image, candidate, box)
+                    if located[0] > best[0]:
+                        best = located
+            offset //= 2
+        return best
+
+    def _locate_size(self, image: Image.Image, size: int, box: tuple = None) -> tuple:
+        """
+        在指定範圍內定位指定尺寸的 logo
+        未指定範圍時搜尋該尺寸預期位置（依比例縮放的邊距）附近，偏移不超過 SEARCH_OFFSET_FACTOR 倍尺寸
+
+        Returns:
+            (ncc, 尺寸, x, y)，搜尋範圍小於 logo 時 ncc 為 -1
+        """
+        width, height = self._get_image_size(image)
+        if box is None:
+            position = self._calculate_watermark_position(width, height, self._scaled_config(size))
+            tolerance = int(round(size * self.SEARCH_OFFSET_FACTOR))
+            box = (
+                position["x"] - tolerance, position["y"] - tolerance,
+                position["x"] + size + tolerance, position["y"] + size + tolerance,
+            )
+        box = (max(0, box[0]), max(0, box[1]), min(width, box[2]), min(height, box[3]))
+        located = self._locate_watermark(image, size, box)
+        if located is None:
+            return (-1.0, size, 0, 0)
+        x, y, ncc = located
+        return (ncc, size, x, y)
+
+    def _verify_logo_shape(self, image: Image.Image, detection: dict,
+                           fixed: bool = False) -> bool:
+        """
+        驗證候選位置的亮度變化確實是 logo 疊加造成的
+        以 logo 外圍（alpha 很低）的像素擬合二次曲面作為背景，logo 疊加應使每個像素
+        增加 alpha * (255 - 背景)；漸層與光斑即使形狀相似，增益與擬合程度也不符。
+        fixed 為 True 時（固定位置的結果）增益與選出的 alpha 強度一致即通過，
+        位置或尺寸偏差時增益會明顯偏低
+        """
+        size = detection["size"]
+        patch = self._crop_patch(image, detection["x"], detection["y"], size)
+        gain, fit = self._logo_shape_fit(patch, self._get_alpha_map(size))
+        if fixed and abs(gain - detection["alpha_scale"]) <= self.SEARCH_FIXED_GAIN_TOLERANCE:
+            return True
+        low, high = self.SEARCH_GAIN_RANGE
+        return low <= gain <= high and fit >= self.SEARCH_MIN_FIT
+
+    def _logo_shape_fit(self, patch: np.ndarray, alpha_map: np.ndarray) -> tuple:
+        """
+        計算區塊相對於 logo 疊加模型的增益與擬合程度
+
+        Returns:
+            (增益, R²)，背景像素不足或 logo 無法造成亮度變化時回傳 (0.0, 0.0)
+        """
+        rows = min(patch.shape[0], alpha_map.shape[0])
+        cols = min(patch.shape[1], alpha_map.shape[1])
+        pixels = patch[:rows, :cols, :3].reshape(-1, 3).astype(np.float64)
+        alpha = alpha_map[:rows, :cols].reshape(-1).astype(np.float64)
+
+        # 背景模型：1, x, y, x², xy, y²
+        yy, xx = np.mgrid[0:rows, 0:cols] / float(max(rows, cols))
+        xx, yy = xx.reshape(-1), yy.reshape(-1)
+        terms = np.stack([np.ones_like(xx), xx, yy, xx * xx, xx * yy, yy * yy], axis=1)
+        outside = alpha <= 0.02
+        inside = alpha >= 0.05
+        if outside.sum() < 4 * terms.shape[1] or not inside.any():
+            return (0.0, 0.0)
+        coef = np.linalg.lstsq(terms[outside], pixels[outside], rcond=None)[0]
+        background = np.clip(terms[inside] @ coef, 0, 255)
+
+        actual = (pixels[inside] - background).ravel()
+        predicted = (alpha[inside, None] * (255 - background)).ravel()
+        energy = predicted @ predicted
+        if energy < 1e-6:
+            return (0.0, 0.0)
+        gain = (predicted @ actual) / energy
+        residual = actual - gain * predicted
+        centered = actual - actual.mean()
+        variance = centered @ centered
+        if variance < 1e-6:
+            return (float(gain), 0.0)
+        return (float(gain), float(1 - (residual @ residual) / variance))
+
+    def _locate_watermark(self, image: Image.Image, size: int, box: tuple):
+        """
+        以正規化互相關（NCC）在 box 範圍內找出最像 logo 的位置
+        分子以 FFT 計算互相關，分母以積分影像計算區域變異數，成本為 O(N log N)
+
+        Returns:
+            (x, y, ncc)，搜尋範圍小於 logo 時回傳 None
+        """
+        left, top = box[0], box[1]
+        # logo 疊加會提高亮度，以灰階亮度與 alpha map 比對
+        if isinstance(image, np.ndarray):
+            region = image[top:box[3], left:box[2], :3] @ np.array([0.299, 0.587, 0.114])
+        else:
+            region = image.crop(box)
+            if region.mode not in ("L", "RGB", "RGBA"):
+                region = region.convert("RGBA")
+            region = np.asarray(region.convert("L"), dtype=np.float64)
+        rows, cols = region.shape
+        if rows < size or cols < size:
+            return None
+
+        template = self._get_alpha_map(size).astype(np.float64)
+        template = template - template.mean()
+        template_norm = np.sqrt((template * template).sum())
+
+        # 互相關 = 與翻轉後模板的卷積，取完全重疊的部分；補零到 FFT 較快的長度
+        shape = (_fft_length(rows + size - 1), _fft_length(cols + size - 1))
+        spectrum = np.fft.rfft2(region, shape) * np.fft.rfft2(template[::-1, ::-1], shape)
+        corr = np.fft.irfft2(spectrum, shape)[size - 1:rows, size - 1:cols]
+
+        # 以積分影像計算每個位置的區域總和與平方和
+        def box_sum(values: np.ndarray) -> np.ndarray:
+            integral = np.zeros((rows + 1, cols + 1))
+            integral[1:, 1:] = values.cumsum(axis=0).cumsum(axis=1)
+            return (integral[size:, size:] - integral[:-size, size:]
+                    - integral[size:, :-size] + integral[:-size, :-size])
+
+        local_sum = box_sum(region)
+        local_var = box_sum(region * region) - local_sum * local_sum / (size * size)
+        denom = template_norm * np.sqrt(np.maximum(local_var, 0))
+        ncc = np.divide(corr, denom, out=np.zeros_like(corr), where=denom > 1e-6)
+
+        iy, ix = np.unravel_index(int(np.argmax(ncc)), ncc.shape)
+        return (left + int(ix), top + int(iy), float(ncc[iy, ix]))
+
+    def _detect_watermark_position(self, image: Image.Image) -> tuple:
+        """
+        偵測浮水印位置
+
+        Returns:
+            (x, y, size)，未偵測到浮水印時回傳 None
+        """
+        detection = self._detect_watermark(image)
+        if detection is None:
+            return None
+        return (detection["x"], detection["y"], detection["size"])
+
+    def _get_image_size(self, image) -> tuple:
+        """取得 (寬, 高)，支援 PIL 圖片與 HxWxC 陣列"""
+        if isinstance(image, np.ndarray):
+            return image.shape[1], image.shape[0]
+        return image.size
+
+    def _crop_patch(self, image: Image.Image, x: int, y: int, size: int) -> np.ndarray:
+        """
+        裁切浮水印區塊並轉為 float32 陣列
+        區塊會限制在圖片範圍內，非 RGB/RGBA 模式只轉換這一小塊
+        """
+        if isinstance(image, np.ndarray):
+            return image[y:y + size, x:x + size].astype(np.float32)
+        width, height = image.size
+        patch = image.crop((x, y, min(x + size, width), min(y + size, height)))
+        if patch.mode not in ("RGB", "RGBA"):
+            patch = patch.convert("RGBA")
+        return np.array(patch, dtype=np.float32)
+
+    def _is_watermark_present(self, patch: np.ndarray, alpha_map: np.ndarray) -> bool:
+        """
+        判斷區塊是否存在浮水印
+        使用與 JS 版本一致的亮度與 alpha 特徵分析
 
-        image_array = np.array(image.convert("RGBA"), dtype=np.float32)
+        Args:
+            patch: 浮水印區塊（由 _crop_patch 取得，左上角對齊 alpha map）
+            alpha_map: 對應尺寸的 alpha map
+        """
 
         # 閾值設定（與 JS 版本一致）
         HIGH_ALPHA_THRESHOLD = 0.15
@@ -327,67 +852,36 @@ class WatermarkRemover:
         WHITE_MEAN_THRESHOLD = 245
         WHITE_STDDEV_THRESHOLD = 5
 
-        high_alpha_sum = 0
-        high_alpha_weighted_sum = 0
-        high_alpha_count = 0
-        low_alpha_brightness_sum = 0
-        low_alpha_count = 0
-        white_pixel_count = 0
-        brightness_values = []
-
-        for row in range(height):
-            for col in range(width):
-                alpha_idx_y = row
-                alpha_idx_x = col
-
-                # 確保不超出 alpha_map 範圍
-                if (
-                    alpha_idx_y >= alpha_map.shape[0]
-                    or alpha_idx_x >= alpha_map.shape[1]
-                ):
-                    continue
+        # 只取 alpha map 與區塊重疊的範圍
+        rows = min(patch.shape[0], alpha_map.shape[0])
+        cols = min(patch.shape[1], alpha_map.shape[1])
+        region = patch[:rows, :cols, :3]
+        alpha = alpha_map[:rows, :cols]
 
-                alpha = alpha_map[alpha_idx_y, alpha_idx_x]
+        brightness = region.sum(axis=2) / 3
+        white_pixel_count = int(
+            np.count_nonzero((region >= WHITE_PIXEL_THRESHOLD).all(axis=2))
+        )
 
-                img_y = y + row
-                img_x = x + col
+        # 高 alpha 與低 alpha 區域遮罩
+        high_mask = alpha >= HIGH_ALPHA_THRESHOLD
+        low_mask = alpha <= LOW_ALPHA_THRESHOLD
+        high_alpha_count = int(np.count_nonzero(high_mask))
+        low_alpha_count = int(np.count_nonzero(low_mask))
+        high_alpha_sum = float(brightness[high_mask].sum(dtype=np.float64))
+        high_alpha_weighted_sum = float(alpha[high_mask].sum(dtype=np.float64))
+        low_alpha_brightness_sum = float(brightness[low_mask].sum(dtype=np.float64))
 
-                # 確保不超出圖片範圍
-                if img_y >= image_array.shape[0] or img_x >= image_array.shape[1]:
-                    continue
-
-                r, g, b = image_array[img_y, img_x, :3]
-                brightness = (r + g + b) / 3
-                brightness_values.append(brightness)
-
-                # 白色像素計數
-                if (
-                    r >= WHITE_PIXEL_THRESHOLD
-                    and g >= WHITE_PIXEL_THRESHOLD
-                    and b >= WHITE_PIXEL_THRESHOLD
-                ):
-                    white_pixel_count += 1
-
-                # 高 alpha 區域統計
-                if alpha >= HIGH_ALPHA_THRESHOLD:
-                    high_alpha_sum += brightness
-                    high_alpha_weighted_sum += alpha
-                    high_alpha_count += 1
-                # 低 alpha 區域統計
-                elif alpha <= LOW_ALPHA_THRESHOLD:
-                    low_alpha_brightness_sum += brightness
-                    low_alpha_count += 1
-
-        total_pixels = width * height
+        total_pixels = alpha_map.shape[0] * alpha_map.shape[1]
         if total_pixels == 0:
             return False
 
         white_ratio = white_pixel_count / total_pixels
 
         # 計算亮度平均值和標準差
-        if brightness_values:
-            brightness_mean = np.mean(brightness_values)
-            brightness_stddev = np.std(brightness_values)
+        if brightness.size:
+            brightness_mean = np.mean(brightness)
+            brightness_stddev = np.std(brightness)
         else:
             return False
 
@@ -422,144 +916,687 @@ class WatermarkRemover:
         boost_ratio = actual_boost / expected_boost
         return 0.4 <= boost_ratio <= 1.5
     
-    def _remove_watermark_from_region(self, image: Image.Image, 
-                                       position: tuple) -> Image.Image:
+    def _channel_correlation(self, channels: np.ndarray, alpha_norm: np.ndarray) -> np.ndarray:
+        """
+        計算各色彩通道與正規化 alpha 的相關性並匯總為分數
+        與 JS 版本 computeChannelCorrelationMagnitude 一致，但可一次處理多組候選
+
+        Args:
+            channels: (..., 3, N) 像素值（通道在前，沿最後一軸連續存放）
+            alpha_norm: (N,) 正規化 alpha
+
+        Returns:
+            (...) 每組的相關性分數
+        """
+        count = alpha_norm.shape[0]
+        mean = channels.mean(axis=-1)
+        std = np.sqrt(np.maximum((channels * channels).mean(axis=-1) - mean * mean, 0))
+        std[std == 0] = 1
+        # sum(norm * (c - mean) / std) = (norm·c - mean * sum(norm)) / std
+        dot = np.matmul(channels, alpha_norm)
+        corr = (dot - mean * alpha_norm.sum(dtype=np.float64)) / std / count
+        return np.sqrt((corr * corr).sum(axis=-1))
+
+    def _select_best_profile(self, patch: np.ndarray, alpha_map: np.ndarray,
+                              alpha_norm: np.ndarray):
+        """
+        從 (alpha 強度, logo 色彩) 候選中選出還原後與 alpha 相關性最低的組合
+        與 JS 版本 selectBestProfile 一致，所有候選以單一張量運算一次計算
+
+        Returns:
+            {"alpha_scale", "logo_value", "score", "base_score"}，
+            沒有候選比原始區塊更好時回傳 None
+        """
+        rows = min(patch.shape[0], alpha_map.shape[0])
+        cols = min(patch.shape[1], alpha_map.shape[1])
+        # (3, N) 通道在前，讓後續的統計沿連續記憶體計算
+        pixels = np.ascontiguousarray(
+            patch[:rows, :cols, :3].reshape(-1, 3).T, dtype=np.float32
+        )
+        alpha = alpha_map[:rows, :cols].reshape(-1)
+        norm = alpha_norm[:rows, :cols].reshape(-1)
+
+        base_score = float(self._channel_correlation(pixels, norm))
+
+        # 候選參數展開為 (K,)
+        candidates = [
+            (scale, logo)
+            for scale in self.CANDIDATE_ALPHA_SCALES
+            for logo in self.CANDIDATE_LOGO_VALUES
+        ]
+        scales = np.array([c[0] for c in candidates], dtype=np.float32)
+        logos = np.array([c[1] for c in candidates], dtype=np.float32)
+
+        # (K, N) 每組候選的 alpha，低於閾值的像素維持原值
+        scaled = scales[:, None] * alpha[None, :]
+        inactive = scaled < self.ALPHA_THRESHOLD
+        np.minimum(scaled, self.MAX_ALPHA, out=scaled)
+
+        # (K, 3, N) 反向 alpha 混合還原
+        restored = pixels[None, :, :] - (scaled * logos[:, None])[:, None, :]
+        restored /= (1 - scaled)[:, None, :]
+        np.clip(np.round(restored, out=restored), 0, 255, out=restored)
+        if inactive.any():
+            np.copyto(
+                restored,
+                np.broadcast_to(pixels, restored.shape),
+                where=inactive[:, None, :],
+            )
+
+        scores = self._channel_correlation(restored, norm)
+        best = int(np.argmin(scores))
+        if not scores[best] < base_score:
+            return None
+        alpha_scale, logo_value = candidates[best]
+        return {
+            "alpha_scale": alpha_scale,
+            "logo_value": logo_value,
+            "score": float(scores[best]),
+            "base_score": base_score,
+        }
+
+    def _remove_watermark_from_region(self, image: Image.Image, position: tuple,
+                                       alpha_scale: float = 1.0,
+                                       logo_value: float = None) -> Image.Image:
         """
         從指定區域移除浮水印
-        使用反向 alpha 混合
+        只裁切浮水印區塊處理後貼回原圖（原地修改），不複製整張圖片
         """
         x, y, size = position
-        result = image.copy()
-        result_array = np.array(result.convert('RGBA'), dtype=np.float32)
-        
-        alpha_map = self._get_alpha_map(size)
-        
-        # 對浮水印區域進行處理
-        for dy in range(size):
-            for dx in range(size):
-                img_x = x + dx
-                img_y = y + dy
-                
-                if img_y < result_array.shape[0] and img_x < result_array.shape[1]:
-                    alpha = alpha_map[dy, dx]
-                    
-                    if alpha > self.ALPHA_THRESHOLD:
-                        # 限制 alpha 最大值
-                        alpha = min(alpha, self.MAX_ALPHA)
-                        
-                        # 反向 alpha 混合公式
-                        # 原始色彩 = (混合色彩 - logo色彩 * alpha) / (1 - alpha)
-                        for c in range(3):  # RGB
-                            blended = result_array[img_y, img_x, c]
-                            logo_value = self.DEFAULT_LOGO_VALUE
-                            original = (blended - logo_value * alpha) / (1 - alpha)
-                            result_array[img_y, img_x, c] = np.clip(original, 0, 255)
+        width, height = image.size
+        patch_image = image.crop((x, y, min(x + size, width), min(y + size, height)))
+        if patch_image.mode not in ("RGB", "RGBA"):
+            patch_image = patch_image.convert("RGBA")
+        patch = np.array(patch_image)
+        self._remove_watermark_from_patch(patch, size, alpha_scale, logo_value)
         
-        return Image.fromarray(result_array.astype(np.uint8), 'RGBA')
+        patch_image = Image.fromarray(patch)
+        if patch_image.mode != image.mode:
+            patch_image = patch_image.convert(image.mode)
+        image.paste(patch_image, (x, y))
+        return image
     
-    def remove_watermark(self, image_path: str, output_path: str = None) -> str:
+    def _get_removal_lut(self, size: int, alpha_scale: float = 1.0,
+                         logo_value: float = None) -> tuple:
         """
-        移除圖片浮水印
-        
+        取得反向 alpha 混合的查表
+        alpha map 中每個不同的 alpha 值各有一列 256 個 uint8 結果，第 0 列為不需處理的像素（原值），
+        移除時只需查表，不做浮點運算；查表以與逐像素計算相同的 float32 運算建立，
+        結果與逐像素計算完全一致，且不受平台影響（IEEE 運算皆為正確捨入）
+
+        Returns:
+            (offsets, lut)：每個像素在查表中的列起點 (size, size, 1)，以及攤平的查表
+        """
+        if logo_value is None:
+            logo_value = self.DEFAULT_LOGO_VALUE
+        key = (size, alpha_scale, logo_value)
+        with self._lru_lock:
+            entry = self._removal_luts.get(key)
+            if entry is not None:
+                self._removal_luts.move_to_end(key)
+                return entry
+
+        alpha = self._get_alpha_map(size)
+        if alpha_scale != 1.0:
+            alpha = alpha * np.float32(alpha_scale)
+        mask = alpha > self.ALPHA_THRESHOLD
+        # 限制 alpha 最大值
+        values, inverse = np.unique(np.minimum(alpha[mask], self.MAX_ALPHA), return_inverse=True)
+        rows = np.zeros(alpha.shape, dtype=np.int32)
+        rows[mask] = inverse.ravel() + 1
+
+        # 反向 alpha 混合公式
+        # 原始色彩 = (混合色彩 - logo色彩 * alpha) / (1 - alpha)
+        blended = np.arange(256, dtype=np.float32)[None, :]
+        values = values[:, None]
+        original = (blended - logo_value * values) / (1 - values)
+        # 與原本轉回 uint8 的方式相同，直接捨去小數
+        lut = np.vstack([
+            np.arange(256, dtype=np.uint8)[None, :],
+            np.clip(original, 0, 255).astype(np.uint8),
+        ])
+
+        entry = ((rows * 256)[:, :, None], lut.ravel())
+        with self._lru_lock:
+            self._removal_luts[key] = entry
+            if len(self._removal_luts) > ALPHA_MAP_LRU_SIZE * len(self.CANDIDATE_ALPHA_SCALES):
+                self._removal_luts.popitem(last=False)
+        return entry
+
+    def _remove_watermark_from_patch(self, patch: np.ndarray, size: int,
+                                      alpha_scale: float = 1.0,
+                                      logo_value: float = None) -> np.ndarray:
+        """
+        對 uint8 浮水印區塊進行反向 alpha 混合（原地修改，只查表）
+
         Args:
-            image_path: 輸入圖片路徑
-            output_path: 輸出圖片路徑（若為 None 則覆蓋原檔）
-            
+            patch: HxWx3 或 HxWx4 的 uint8 區塊（可為 view），只處理前 3 個通道
+            size: logo 尺寸
+            alpha_scale: alpha 強度倍率（候選搜尋選出的值）
+            logo_value: logo 色彩值，預設為 DEFAULT_LOGO_VALUE
+        """
+        offsets, lut = self._get_removal_lut(size, alpha_scale, logo_value)
+        rows = min(patch.shape[0], size)
+        cols = min(patch.shape[1], size)
+        region = patch[:rows, :cols, :3]
+        region[...] = np.take(lut, offsets[:rows, :cols] + region)
+        return patch
+    
+    def remove_watermark_array(self, array: np.ndarray):
+        """
+        原地移除 uint8 HxWx3 / HxWx4 陣列中的浮水印
+        可接受 C-contiguous 陣列或 strided view（例如大圖的切片），
+        只改寫浮水印區塊，不配置整張圖片大小的記憶體
+
         Returns:
-            輸出檔案路徑
+            偵測結果 {"x", "y", "size", "alpha_scale", "logo_value", "score", ...}，
+            未偵測到浮水印時回傳 None
         """
-        # 載入圖片並保留中繼資料
-        image = Image.open(image_path)
-        original_info = image.info.copy()
-        original_mode = image.mode
+        if array.dtype != np.uint8 or array.ndim != 3 or array.shape[2] not in (3, 4):
+            raise ValueError("需要 uint8 的 HxWx3 或 HxWx4 陣列")
+        if not array.flags.writeable:
+            raise ValueError("陣列必須可寫入")
 
-        # 轉換為 RGBA 進行處理
-        image = image.convert("RGBA")
-        
-        # 偵測浮水印位置
-        position = self._detect_watermark_position(image)
-        
-        if position is None:
-            print(f"未偵測到浮水印: {image_path}")
-            return image_path
-        
-        print(f"偵測到浮水印位置: x={position[0]}, y={position[1]}, size={position[2]}")
-        
-        # 移除浮水印
-        result = self._remove_watermark_from_region(image, position)
-        
-        # 決定輸出路徑
-        if output_path is None:
-            # 在原檔名加上 _no_watermark 後綴
-            base, ext = os.path.splitext(image_path)
-            output_path = f"{base}_no_watermark{ext}"
+        detection = self._detect_watermark(array)
+        if detection is None:
+            return None
+
+        x, y, size = detection["x"], detection["y"], detection["size"]
+        self._remove_watermark_from_patch(
+            array[y:y + size, x:x + size], size,
+            detection["alpha_scale"], detection["logo_value"],
+        )
+        return detection
 
-        # 準備儲存參數
-        save_args = {"optimize": True}
+    def _get_output_format(self, output_path: str):
+        """依副檔名決定輸出格式，其他副檔名交由 Pillow 判斷（回傳 None）"""
+        if output_path.lower().endswith('.png'):
+            return "PNG"
+        if output_path.lower().endswith(('.jpg', '.jpeg')):
+            return "JPEG"
+        return None
+
+    def _get_save_args(self, image: Image.Image, output_format: str,
+                       original_info: dict) -> dict:
+        """依編碼設定產生儲存參數"""
+        profile = ENCODE_PROFILES[self.encode_profile]
+        if output_format == "PNG":
+            save_args = dict(profile["png"])
+        elif output_format == "JPEG":
+            save_args = dict(profile["jpeg"])
+            # "keep" 只適用於來源為 JPEG 的圖片（需要原本的量化表）
+            is_jpeg_source = getattr(image, "format", None) == "JPEG"
+            quality = self.jpeg_quality
+            if quality == "keep" and not is_jpeg_source:
+                quality = DEFAULT_JPEG_QUALITY
+            save_args["quality"] = quality
+            subsampling = self.jpeg_subsampling
+            if subsampling is not None and (subsampling != "keep" or is_jpeg_source):
+                save_args["subsampling"] = subsampling
+        else:
+            save_args = dict(profile["other"])
 
         # 嘗試保留原有的 DPI 資訊（對 macOS 縮圖很重要）
         if "dpi" in original_info:
             save_args["dpi"] = original_info["dpi"]
         else:
             save_args["dpi"] = (72, 72)  # 預設 72 DPI
+        return save_args
 
-        # 若為 PNG，可加入背景資訊避免某些檢視器顯示空白
-        if output_path.lower().endswith('.png'):
-            if original_mode == "RGB":
-                # 如果原本是 RGB，處理完後轉回去可以減少檔案大小並提高相容性
-                result.convert("RGB").save(output_path, "PNG", **save_args)
-            else:
-                result.save(output_path, "PNG", **save_args)
-        elif output_path.lower().endswith(('.jpg', '.jpeg')):
-            result.convert("RGB").save(output_path, "JPEG", quality=95, **save_args)
-        else:
-            result.save(output_path, **save_args)
+    def _save_image(self, image: Image.Image, fp, output_format: str,
+                    original_info: dict):
+        """
+        依編碼設定儲存圖片
+        原本是 RGB 的圖片全程維持 RGB，不需再轉換整張圖片；JPEG 不支援 alpha，需轉為 RGB
+        """
+        save_args = self._get_save_args(image, output_format, original_info)
+        if output_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(fp, output_format, **save_args)
 
-        # macOS 特有的後處理：使用 sips 刷新檔案結構（若在 macOS 上執行）
-        if sys.platform == "darwin":
-            try:
-                import subprocess
-
-                # 使用 sips 進行無損的屬性重新掃描，這通常能強制 Finder 生成縮圖
-                subprocess.run(
-                    [
-                        "sips",
-                        "-s",
-                        "format",
-                        "png" if output_path.endswith(".png") else "jpeg",
-                        output_path,
-                        "--out",
-                        output_path,
-                    ],
-                    capture_output=True,
+    def _get_path_format(self, output_path: str):
+        """依副檔名決定輸出格式，無法判斷時回傳 None（沿用來源格式）"""
+        output_format = self._get_output_format(output_path)
+        if output_format is None:
+            ext = os.path.splitext(output_path)[1].lower()
+            output_format = Image.registered_extensions().get(ext)
+        return output_format
+
+    def _stage(self, record, name: str):
+        """量測一個階段；未啟用量測時回傳共用的空 context manager"""
+        return _NULL_STAGE if record is None else record.stage(name)
+
+    def _start_record(self):
+        return None if self.metrics is None else self.metrics.start()
+
+    def _finish_record(self, record, outcome: str):
+        if record is not None:
+            record.outcome = outcome
+            self.metrics.finish(record)
+
+    def _decode_stream(self, input_fp, format: str, record) -> tuple:
+        """
+        解碼圖片並決定輸出格式
+
+        Returns:
+            (圖片, 輸出格式, 中繼資料)；需逐一處理影格的多影格圖片在此只開啟不解碼，
+            中繼資料為 None
+        """
+        with self._stage(record, "decode"):
+            image = Image.open(input_fp)
+        output_format = (format or image.format or "PNG").upper()
+        if output_format == "JPG":
+            output_format = "JPEG"
+        # 動態圖片與多頁 TIFF 逐一處理每個影格；輸出格式不支援多影格時只處理第一個影格
+        if getattr(image, "n_frames", 1) > 1 and output_format in MULTI_FRAME_FORMATS:
+            return image, output_format, None
+
+        # 載入圖片並保留中繼資料
+        with self._stage(record, "decode"):
+            image.load()
+            original_info = image.info.copy()
+        if record is not None:
+            record.bytes_read = _tell(input_fp)
+        return image, output_format, original_info
+
+    def _detect_and_remove(self, image: Image.Image, record) -> tuple:
+        """
+        偵測並移除已解碼圖片的浮水印
+
+        Returns:
+            (移除後的圖片, 偵測結果)；未偵測到時為 (原圖, None)
+        """
+        # 偵測浮水印位置（只裁切右下角區塊分析）
+        with self._stage(record, "detect"):
+            detection = self._detect_watermark(image)
+        if detection is None:
+            return image, None
+
+        with self._stage(record, "remove"):
+            # RGB/RGBA 直接在原圖上處理，其餘模式才轉換為 RGBA
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+
+            # 移除浮水印（只處理浮水印區塊並貼回原圖）
+            position = (detection["x"], detection["y"], detection["size"])
+            result = self._remove_watermark_from_region(
+                image, position, detection["alpha_scale"], detection["logo_value"]
+            )
+        return result, detection
+
+    def _encode_image(self, image: Image.Image, output_fp, output_format: str,
+                      original_info: dict, record):
+        """編碼到 output_fp 並記錄寫入的位元組數"""
+        with self._stage(record, "encode"):
+            start = _tell(output_fp)
+            self._save_image(image, output_fp, output_format, original_info)
+        if record is not None:
+            record.bytes_written = _tell(output_fp) - start
+
+    def _process_stream(self, input_fp, output_fp, format: str, record):
+        """解碼、偵測、移除並編碼到 output_fp，回傳偵測結果（未偵測到時為 None）"""
+        image, output_format, original_info = self._decode_stream(input_fp, format, record)
+        if original_info is None:
+            detection = self._process_frames(image, output_fp, output_format, record)
+            if record is not None:
+                record.bytes_read = _tell(input_fp)
+            return detection
+
+        image, detection = self._detect_and_remove(image, record)
+        if detection is None:
+            return None
+        self._encode_image(image, output_fp, output_format, original_info, record)
+        return detection
+
+    def _iter_frames(self, image, record):
+        """
+        依序解碼每個影格，產生 (影格, 顯示時間, disposal, blend)
+        影格為 RGB/RGBA 的獨立複本，之後的 seek 不會影響它
+        """
+        for index in range(image.n_frames):
+            with self._stage(record, "decode"):
+                image.seek(index)
+                if image.mode in ("RGB", "RGBA"):
+                    frame = image.copy()
+                else:
+                    frame = image.convert("RGBA")
+            info = image.info
+            # GIF 的 disposal 是影格屬性，APNG 則放在 info 中
+            disposal = getattr(image, "disposal_method", info.get("disposal"))
+            yield frame, info.get("duration"), disposal, info.get("blend")
+
+    def _process_frame(self, frame: Image.Image) -> tuple:
+        """
+        偵測並移除單一影格的浮水印（原地修改，可在執行緒中執行）
+
+        Returns:
+            (偵測結果, 此影格的量測)；各執行緒使用自己的量測，由主執行緒合併
+        """
+        frame_record = self._start_record()
+        with self._stage(frame_record, "detect"):
+            detection = self._detect_watermark(frame)
+        if detection is not None:
+            with self._stage(frame_record, "remove"):
+                position = (detection["x"], detection["y"], detection["size"])
+                self._remove_watermark_from_region(
+                    frame, position, detection["alpha_scale"], detection["logo_value"]
                 )
-                # 清除可能干擾的隔離屬性
-                subprocess.run(["xattr", "-c", output_path], capture_output=True)
-            except Exception:
-                pass
+        return detection, frame_record
+
+    def _process_frames(self, image, output_fp, output_format: str, record):
+        """
+        多影格圖片：主執行緒依序解碼影格，以 frame_jobs 個執行緒平行偵測與移除，
+        再以原本的顯示時間、循環次數與 disposal 重新編碼
+        與先前影格內容完全相同的影格不重新偵測，直接沿用同一個處理結果（也不另外保留一份）；
+        尚未處理的影格最多 frame_jobs 的 2 倍，解碼不會遠超過處理進度
+
+        Returns:
+            第一個偵測到浮水印的影格的偵測結果，另含 frames（偵測到浮水印的影格數）
+            與 frame_count（總影格數）；所有影格都未偵測到時回傳 None
+        """
+        import hashlib
+        from concurrent.futures import Future, ThreadPoolExecutor
+
+        original_info = image.info.copy()
+        # alpha map 在主執行緒載入，執行緒中只讀取
+        self._get_alpha_map(LOGO_SIZES[0])
+
+        executor = ThreadPoolExecutor(self.frame_jobs) if self.frame_jobs > 1 else None
+        entries = []  # 每個影格的 (影格, future)，重複的影格共用同一組
+        durations, disposals, blends = [], [], []
+        seen = {}  # (模式, 尺寸, 內容雜湊) -> entries 中的項目
+        pending = deque()
+        try:
+            for frame, duration, disposal, blend in self._iter_frames(image, record):
+                durations.append(duration)
+                disposals.append(disposal)
+                blends.append(blend)
+                key = (frame.mode, frame.size,
+                       hashlib.blake2b(frame.tobytes(), digest_size=16).digest())
+                entry = seen.get(key)
+                if entry is None:
+                    if executor is None:
+                        future = Future()
+                        future.set_result(self._process_frame(frame))
+                    else:
+                        future = executor.submit(self._process_frame, frame)
+                        pending.append(future)
+                        if len(pending) >= self.frame_jobs * 2:
+                            pending.popleft().result()
+                    entry = seen[key] = (frame, future)
+                entries.append(entry)
+
+            detection = None
+            detected = 0
+            for _, future in entries:
+                frame_detection = future.result()[0]
+                if frame_detection is None:
+                    continue
+                detected += 1
+                if detection is None:
+                    detection = frame_detection
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        if record is not None:
+            for _, future in seen.values():
+                record.merge(future.result()[1])
+        if detection is None:
+            return None
+
+        with self._stage(record, "encode"):
+            start = _tell(output_fp)
+            self._save_frames(
+                [frame for frame, _ in entries], output_fp, output_format, original_info,
+                durations, disposals, blends,
+            )
+        if record is not None:
+            record.bytes_written = _tell(output_fp) - start
+        return dict(detection, frames=detected, frame_count=len(entries))
+
+    def _save_frames(self, frames: list, fp, output_format: str, original_info: dict,
+                     durations: list, disposals: list, blends: list):
+        """
+        依編碼設定儲存多影格圖片，保留每個影格的顯示時間、循環次數、disposal 與 blend
+        Pillow 的多影格編碼器需要完整的影格序列，內容相同的影格傳入同一個物件
+        """
+        save_args = self._get_save_args(frames[0], output_format, original_info)
+        save_args.update(save_all=True, append_images=frames[1:])
+        if output_format != "TIFF":
+            if any(duration is not None for duration in durations):
+                save_args["duration"] = [duration or 0 for duration in durations]
+            # 沒有 loop 的 GIF 只播放一次，維持原樣
+            if "loop" in original_info:
+                save_args["loop"] = original_info["loop"]
+        if output_format in ("GIF", "PNG") and None not in disposals:
+            save_args["disposal"] = disposals
+        if output_format == "PNG" and None not in blends:
+            save_args["blend"] = blends
+        if output_format == "WEBP" and "background" in original_info:
+            save_args["background"] = original_info["background"]
+        frames[0].save(fp, output_format, **save_args)
+
+    def remove_watermark_fileobj(self, input_fp, output_fp, format: str = None):
+        """
+        從檔案物件讀取圖片並將移除浮水印後的結果寫入另一個檔案物件
+        不存取檔案系統，也不執行 sips/xattr
+
+        Args:
+            input_fp: 可讀取的二進位檔案物件
+            output_fp: 可寫入的二進位檔案物件（未偵測到浮水印時不寫入）
+            format: 輸出格式（例如 "PNG"、"JPEG"），None 表示沿用來源格式
+
+        Returns:
+            偵測結果 {"x", "y", "size", "alpha_scale", "logo_value", "score", ...}，
+            未偵測到浮水印時回傳 None
+        """
+        record = self._start_record()
+        try:
+            detection = self._process_stream(input_fp, output_fp, format, record)
+        except Exception:
+            self._finish_record(record, "error")
+            raise
+        self._finish_record(record, "no_watermark" if detection is None else "detected")
+        return detection
+
+    def remove_watermark_bytes(self, data: bytes, format: str = None) -> tuple:
+        """
+        在記憶體中移除浮水印
+
+        Args:
+            data: 已編碼的圖片內容
+            format: 輸出格式（例如 "PNG"、"JPEG"），None 表示沿用來源格式
+
+        Returns:
+            (輸出內容, 偵測結果)；未偵測到浮水印時回傳 (原內容, None)
+        """
+        output = BytesIO()
+        detection = self.remove_watermark_fileobj(BytesIO(data), output, format)
+        if detection is None:
+            return bytes(data), None
+        return output.getvalue(), detection
+
+    def remove_watermark(self, image_path: str, output_path: str = None,
+                         verbose: bool = True) -> str:
+        """
+        移除圖片浮水印
         
-        print(f"已儲存: {output_path}")
+        Args:
+            image_path: 輸入圖片路徑
+            output_path: 輸出圖片路徑（若為 None 則覆蓋原檔）
+            verbose: 是否輸出偵測與儲存訊息；批次、非同步與服務模式由呼叫端回報結果，
+                傳入 False（不要用 redirect_stdout，它會替換整個行程的 sys.stdout）
+            
+        Returns:
+            輸出檔案路徑
+        """
+        # 決定輸出路徑
+        if output_path is None:
+            output_path = get_default_output_path(image_path)
+
+        record = self._start_record()
+        try:
+            output = BytesIO()
+            with open(image_path, "rb") as f:
+                detection = self._process_stream(
+                    f, output, self._get_path_format(output_path), record
+                )
+
+            if detection is None:
+                if verbose:
+                    print(f"未偵測到浮水印: {image_path}")
+                self._finish_record(record, "no_watermark")
+                return image_path
+
+            if verbose:
+                print(
+                    f"偵測到浮水印位置: x={detection['x']}, y={detection['y']}, "
+                    f"size={detection['size']}"
+                )
+                if "frame_count" in detection:
+                    print(f"影格: {detection['frames']}/{detection['frame_count']} 個有浮水印")
+            with self._stage(record, "write"):
+                with open(output_path, "wb") as f:
+                    f.write(output.getbuffer())
+
+            # macOS 特有的後處理：使用 sips 刷新檔案結構（若在 macOS 上執行）
+            if sys.platform == "darwin":
+                with self._stage(record, "sips"):
+                    _refresh_macos_metadata(output_path)
+        except Exception:
+            self._finish_record(record, "error")
+            raise
+
+        self._finish_record(record, "detected")
+        if verbose:
+            print(f"已儲存: {output_path}")
         return output_path
 
 
-def main():
+def get_default_output_path(image_path: str) -> str:
+    """未指定輸出路徑時，在原檔名加上 _no_watermark 後綴"""
+    base, ext = os.path.splitext(image_path)
+    return f"{base}_no_watermark{ext}"
+
+
+def _tell(fp) -> int:
+    """目前的檔案位置，無法取得時回傳 0"""
+    try:
+        return fp.tell()
+    except (AttributeError, OSError):
+        return 0
+
+
+def _refresh_macos_metadata(output_path: str):
+    """使用 sips 刷新檔案結構並清除隔離屬性，讓 Finder 產生縮圖"""
+    try:
+        import subprocess
+
+        # 使用 sips 進行無損的屬性重新掃描，這通常能強制 Finder 生成縮圖
+        subprocess.run(
+            [
+                "sips",
+                "-s",
+                "format",
+                "png" if output_path.endswith(".png") else "jpeg",
+                output_path,
+                "--out",
+                output_path,
+            ],
+            capture_output=True,
+        )
+        # 清除可能干擾的隔離屬性
+        subprocess.run(["xattr", "-c", output_path], capture_output=True)
+    except Exception:
+        pass
+
+
+def _build_single_parser():
+    """單張圖片模式的命令列參數"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="remove_watermark.py", description="移除單張圖片的浮水印"
+    )
+    parser.add_argument("input", help="圖片路徑")
+    parser.add_argument("output", nargs="?", default=None, help="輸出路徑（預設寫在原檔旁）")
+    parser.add_argument(
+        "--search", action="store_true", help="固定位置未偵測到浮水印時，在右下角範圍內搜尋"
+    )
+    parser.add_argument(
+        "--timings", action="store_true", help="輸出各階段（decode/detect/remove/encode/write/sips）的耗時"
+    )
+    parser.add_argument(
+        "--metrics-json", default=None, metavar="FILE", help="將各階段量測結果寫入 JSON 檔"
+    )
+    return parser
+
+
+def main(argv: list = None):
     """主程式"""
-    if len(sys.argv) < 2:
-        print("使用方式: python3 remove_watermark.py <圖片路徑> [輸出路徑]")
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("使用方式: python3 remove_watermark.py <圖片路徑> [輸出路徑] [--search] [--timings] [--metrics-json 檔案]")
         print("範例: python3 remove_watermark.py input.png")
         print("範例: python3 remove_watermark.py input.png output.png")
+        print("批次處理: python3 remove_watermark.py batch <路徑/目錄/glob> [...] [-r] [-j 行程數] [--shard i/n]")
+        print("監看資料夾: python3 remove_watermark.py watch <spool 目錄> -o <輸出目錄>")
+        print("掃描（唯讀）: python3 remove_watermark.py scan <路徑/目錄/glob> [...] [-o 報表.jsonl|.csv]")
+        print("合併分片紀錄: python3 remove_watermark.py merge <紀錄檔/目錄> [...] [-o 報表.jsonl|.csv]")
+        print("效能量測: python3 remove_watermark.py bench {encode,detect} <樣本路徑> [...]")
+        print("建立 alpha map 快取: python3 remove_watermark.py --build-cache")
         sys.exit(1)
     
-    input_path = sys.argv[1]
-    output_path = sys.argv[2] if len(sys.argv) > 2 else None
+    if argv[0] == "batch":
+        from watermark_batch import main as batch_main
+
+        sys.exit(batch_main(argv[1:]))
+    
+    if argv[0] == "watch":
+        from watermark_watch import main as watch_main
+
+        sys.exit(watch_main(argv[1:]))
     
-    if not os.path.exists(input_path):
-        print(f"錯誤: 找不到檔案 {input_path}")
+    if argv[0] == "scan":
+        from watermark_scan import main as scan_main
+
+        sys.exit(scan_main(argv[1:]))
+    
+    if argv[0] == "merge":
+        from watermark_shard import main as merge_main
+
+        sys.exit(merge_main(argv[1:]))
+    
+    if argv[0] == "bench":
+        from watermark_bench import main as bench_main
+
+        sys.exit(bench_main(argv[1:]))
+    
+    if argv[0] == "--build-cache":
+        cache_path = WatermarkRemover().build_alpha_cache()
+        print(f"已建立 alpha map 快取: {cache_path}")
+        return
+    
+    # 未知的選項由 argparse 回報錯誤，不會被當成輸出路徑
+    args = _build_single_parser().parse_args(argv)
+    if not os.path.exists(args.input):
+        print(f"錯誤: 找不到檔案 {args.input}")
         sys.exit(1)
     
-    remover = WatermarkRemover()
-    result_path = remover.remove_watermark(input_path, output_path)
+    metrics = None
+    if args.timings or args.metrics_json:
+        from watermark_metrics import Metrics
+
+        metrics = Metrics()
+    remover = WatermarkRemover(search=args.search, metrics=metrics)
+    result_path = remover.remove_watermark(args.input, args.output)
     print(f"處理完成: {result_path}")
+    if metrics is not None:
+        if args.timings:
+            metrics.print_summary()
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,66 @@
+"""
+測試共用設定
+測試直接匯入專案根目錄下的模組，alpha map 快取寫到暫存目錄，不影響使用者的快取
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault("KILLWATERMARK_CACHE_DIR", tempfile.mkdtemp(prefix="killwatermark-test-"))
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="session")
+def remover():
+    from remove_watermark import WatermarkRemover
+
+    return WatermarkRemover()
+
+
+def add_watermark(array: np.ndarray, alpha_map: np.ndarray, x: int, y: int,
+                  alpha_scale: float = 1.0, logo_value: float = 255.0) -> np.ndarray:
+    """以 alpha 混合在 (x, y) 疊上 logo（與 Gemini 加浮水印的方式相同），回傳 uint8 陣列"""
+    result = array.astype(np.float32)
+    size = alpha_map.shape[0]
+    alpha = (alpha_map * alpha_scale)[..., None]
+    region = result[y:y + size, x:x + size, :3]
+    region[...] = region * (1 - alpha) + logo_value * alpha
+    return np.clip(np.round(result), 0, 255).astype(np.uint8)
+
+
+def photo_like(width: int, height: int, seed: int = 0, blobs: int = 40,
+               noise: float = 1.5) -> np.ndarray:
+    """
+    平滑的類照片背景：漸層、低頻起伏、大小不一的亮暗光斑與輕微雜訊
+    亮光斑與 logo 的形狀相關性高，是位置搜尋最容易誤判的內容
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    channels = []
+    for _ in range(3):
+        fx, fy = rng.uniform(0.5, 3.0, 2) * 2 * np.pi
+        px, py = rng.uniform(0, 2 * np.pi, 2)
+        base = rng.uniform(40, 180)
+        wave = (np.sin(xx / width * fx + px) + np.cos(yy / height * fy + py)) * rng.uniform(15, 40)
+        ramp = (xx / width * rng.uniform(-40, 40)) + (yy / height * rng.uniform(-40, 40))
+        channels.append(base + wave + ramp)
+    image = np.stack(channels, axis=-1)
+    for _ in range(blobs):
+        cx, cy = rng.uniform(0, width), rng.uniform(0, height)
+        sigma = rng.uniform(4, 60)
+        color = rng.uniform(-80, 120, 3)
+        x0, x1 = int(max(0, cx - 4 * sigma)), int(min(width, cx + 4 * sigma + 1))
+        y0, y1 = int(max(0, cy - 4 * sigma)), int(min(height, cy + 4 * sigma + 1))
+        if x0 >= x1 or y0 >= y1:
+            continue
+        dist = (xx[y0:y1, x0:x1] - cx) ** 2 + (yy[y0:y1, x0:x1] - cy) ** 2
+        image[y0:y1, x0:x1] += np.exp(-dist / (2 * sigma * sigma))[..., None] * color
+    if noise:
+        image += rng.normal(0, noise, (height, width, 3))
+    return np.clip(image, 0, 255).astype(np.uint8)
@@ -0,0 +1,270 @@
+"""
+asyncio 介面（AsyncWatermarkRemover）的測試
+包含執行緒／行程池、逾時、取消、同時處理數上限、process_many 的串流，
+以及在同一個行程內啟動的本機 HTTP 服務
+"""
+
+import sys
+import asyncio
+import threading
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import add_watermark, photo_like
+from watermark_async import AsyncWatermarkRemover
+
+
+def encode_png(array: np.ndarray) -> bytes:
+    output = BytesIO()
+    Image.fromarray(array).save(output, "PNG")
+    return output.getvalue()
+
+
+@pytest.fixture(scope="module")
+def samples(remover):
+    """(有浮水印, 沒有浮水印) 的 PNG 內容"""
+    clean = photo_like(800, 600, 3)
+    marked = add_watermark(clean, remover._get_alpha_map(48), 800 - 80, 600 - 80)
+    return encode_png(marked), encode_png(clean)
+
+
+class Gate:
+    """讓工作停在執行緒池中，記錄同時執行的數量"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.started = 0
+
+    def __call__(self, value):
+        with self.lock:
+            self.started += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            self.release.wait(5)
+            return value
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_process_bytes(samples, executor):
+    marked, clean = samples
+
+    async def main():
+        async with AsyncWatermarkRemover(max_workers=2, executor=executor) as remover:
+            return await asyncio.gather(
+                remover.process_bytes(marked), remover.process_bytes(clean)
+            )
+
+    (output, detection), (unchanged, none) = asyncio.run(main())
+    assert detection is not None and detection["size"] == 48
+    assert output != marked
+    assert Image.open(BytesIO(output)).size == (800, 600)
+    assert none is None and unchanged == clean
+
+
+def test_process_file(samples, tmp_path):
+    path = tmp_path / "marked.png"
+    path.write_bytes(samples[0])
+    output_path = str(tmp_path / "out.png")
+
+    async def main():
+        async with AsyncWatermarkRemover(max_workers=1) as remover:
+            return await remover.process_file(str(path), output_path)
+
+    result = asyncio.run(main())
+    assert result["status"] == "ok" and result["output"] == output_path
+
+
+def test_concurrent_process_file_keeps_stdout(samples, tmp_path):
+    """process_file 在多個執行緒同時執行時不能替換整個行程的 sys.stdout"""
+    marked, clean = samples
+    paths = []
+    for index in range(16):
+        path = tmp_path / f"{index}.png"
+        path.write_bytes(marked if index % 2 == 0 else clean)
+        paths.append(str(path))
+    stdout = sys.stdout
+
+    async def main():
+        async with AsyncWatermarkRemover(max_workers=8) as remover:
+            for round_index in range(2):
+                results = await asyncio.gather(*(
+                    remover.process_file(path, str(tmp_path / f"out-{round_index}-{i}.png"))
+                    for i, path in enumerate(paths)
+                ))
+                assert [r["status"] for r in results] == ["ok", "no_watermark"] * 8
+
+    asyncio.run(main())
+    assert sys.stdout is stdout
+    print("stdout 仍可使用")
+
+
+def test_timeout_and_slot_release():
+    gate = Gate()
+
+    async def main():
+        async with AsyncWatermarkRemover(max_workers=1, max_in_flight=1) as remover:
+            with pytest.raises(asyncio.TimeoutError):
+                await remover._submit(gate, 1, timeout=0.05)
+            # 已開始的工作無法中斷，完成前仍佔用唯一的名額
+            waiter = asyncio.ensure_future(remover._submit(gate, 2))
+            await asyncio.sleep(0.1)
+            assert gate.started == 1 and not waiter.done()
+            gate.release.set()
+            return await asyncio.wait_for(waiter, 5)
+
+    assert asyncio.run(main()) == 2
+
+
+def test_cancel_queued_work_never_runs():
+    gate = Gate()
+
+    async def main():
+        async with AsyncWatermarkRemover(max_workers=1, max_in_flight=2) as remover:
+            first = asyncio.ensure_future(remover._submit(gate, 1))
+            second = asyncio.ensure_future(remover._submit(gate, 2))
+            await asyncio.sleep(0.1)
+            second.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await second
+            gate.release.set()
+            assert await first == 1
+            # 被取消的工作還在執行緒池佇列中，不會被執行
+            await asyncio.sleep(0.1)
+            return gate.started
+
+    assert asyncio.run(main()) == 1
+
+
+def test_semaphore_bounds_concurrency():
+    gate = Gate()
+
+    async def main():
+        async with AsyncWatermarkRemover(max_workers=8, max_in_flight=3) as remover:
+            tasks = [asyncio.ensure_future(remover._submit(gate, i)) for i in range(10)]
+            await asyncio.sleep(0.2)
+            assert gate.running == 3
+            gate.release.set()
+            return await asyncio.gather(*tasks)
+
+    assert asyncio.run(main()) == list(range(10))
+    assert gate.max_running == 3
+
+
+def test_process_many_streams(samples):
+    marked, clean = samples
+    consumed = []
+
+    def items():
+        for index in range(12):
+            consumed.append(index)
+            yield index, marked if index % 2 == 0 else clean
+
+    async def main():
+        statuses = {}
+        pulled_at_first = None
+        async with AsyncWatermarkRemover(max_workers=2, max_in_flight=2) as remover:
+            async for result in remover.process_many(items()):
+                if pulled_at_first is None:
+                    pulled_at_first = len(consumed)
+                statuses[result["key"]] = result["status"]
+        return statuses, pulled_at_first
+
+    statuses, pulled_at_first = asyncio.run(main())
+    # 第一個結果產生時只讀取了 max_in_flight * 2 個項目
+    assert pulled_at_first == 4
+    assert statuses == {
+        index: "ok" if index % 2 == 0 else "no_watermark" for index in range(12)
+    }
+
+
+def test_process_many_reports_errors():
+    async def main():
+        async with AsyncWatermarkRemover(max_workers=1) as remover:
+            return [r async for r in remover.process_many([("bad", b"not an image")], timeout=5)]
+
+    [result] = asyncio.run(main())
+    assert result["key"] == "bad" and result["status"] == "error"
+
+
+async def _serve(remover: AsyncWatermarkRemover, reader, writer):
+    """最簡單的 HTTP 端點：POST 圖片內容，回傳移除浮水印後的內容"""
+    headers = {}
+    await reader.readline()
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    try:
+        output, detection = await remover.process_bytes(body, timeout=10)
+        status, extra = "200 OK", f"X-Watermark: {'yes' if detection else 'no'}\r\n"
+    except asyncio.TimeoutError:
+        output, status, extra = b"", "504 Gateway Timeout", ""
+    except Exception:
+        output, status, extra = b"", "400 Bad Request", ""
+    writer.write(
+        f"HTTP/1.1 {status}\r\nContent-Length: {len(output)}\r\n{extra}"
+        "Connection: close\r\n\r\n".encode("latin-1") + output
+    )
+    await writer.drain()
+    writer.close()
+
+
+async def _post(port: int, body: bytes) -> tuple:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"POST /remove HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Length: {len(body)}\r\n\r\n"
+        .encode("latin-1") + body
+    )
+    await writer.drain()
+    status = (await reader.readline()).decode("latin-1").split(" ", 2)[1]
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    data = await reader.readexactly(int(headers["content-length"]))
+    writer.close()
+    return int(status), headers.get("x-watermark"), data
+
+
+def test_http_endpoint(samples):
+    marked, clean = samples
+
+    async def main():
+        async with AsyncWatermarkRemover(max_workers=2, max_in_flight=2) as remover:
+            server = await asyncio.start_server(
+                lambda r, w: _serve(remover, r, w), "127.0.0.1", 0
+            )
+            port = server.sockets[0].getsockname()[1]
+            try:
+                return await asyncio.gather(
+                    *(_post(port, marked if i % 2 == 0 else clean) for i in range(8)),
+                    _post(port, b"broken"),
+                )
+            finally:
+                server.close()
+                await server.wait_closed()
+
+    responses = asyncio.run(main())
+    for index, (status, watermark, data) in enumerate(responses[:-1]):
+        assert status == 200
+        if index % 2 == 0:
+            assert watermark == "yes" and data != marked
+        else:
+            assert watermark == "no" and data == clean
+    assert responses[-1][0] == 400
@@ -0,0 +1,54 @@
+"""
+批次模式輸入展開與輸出路徑的測試
+"""
+
+import os
+
+from watermark_batch import collect_inputs, find_output_conflicts, get_output_path, main
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb"):
+        pass
+
+
+def test_glob_keeps_directories_below_wildcard(tmp_path):
+    for name in ("a", "b"):
+        touch(str(tmp_path / "in" / name / "x.png"))
+    pattern = os.path.join(str(tmp_path), "in", "*", "x.png")
+    inputs = collect_inputs([pattern])
+    assert [rel for _, rel in inputs] == [os.path.join("a", "x.png"), os.path.join("b", "x.png")]
+    assert find_output_conflicts(inputs, "out") == {}
+
+
+def test_glob_in_file_name_uses_file_name(tmp_path):
+    touch(str(tmp_path / "in" / "x.png"))
+    inputs = collect_inputs([os.path.join(str(tmp_path), "in", "*.png")])
+    assert [rel for _, rel in inputs] == ["x.png"]
+
+
+def test_recursive_glob_is_relative_to_base(tmp_path):
+    touch(str(tmp_path / "in" / "a" / "b" / "x.png"))
+    inputs = collect_inputs([os.path.join(str(tmp_path), "in", "**", "*.png")])
+    assert [rel for _, rel in inputs] == [os.path.join("a", "b", "x.png")]
+
+
+def test_explicit_files_with_same_name_conflict(tmp_path):
+    paths = [str(tmp_path / name / "x.png") for name in ("a", "b")]
+    for path in paths:
+        touch(path)
+    inputs = collect_inputs(paths)
+    conflicts = find_output_conflicts(inputs, "out")
+    assert conflicts == {get_output_path("x.png", "out"): paths}
+    # 寫在原檔旁時沒有衝突
+    assert find_output_conflicts(inputs, None) == {}
+
+
+def test_main_fails_on_conflicting_outputs(tmp_path, capsys):
+    paths = [str(tmp_path / name / "x.png") for name in ("a", "b")]
+    for path in paths:
+        touch(path)
+    assert main(paths + ["-o", str(tmp_path / "out"), "-j", "1"]) == 1
+    assert "同一個輸出檔" in capsys.readouterr().out
+    assert not (tmp_path / "out").exists()
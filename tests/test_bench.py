@@ -0,0 +1,82 @@
+"""
+效能回歸判定（bench suite --baseline）的測試
+"""
+
+import pytest
+
+from watermark_bench import BASELINE_VERSION, compare_baseline, compare_detections
+
+DETECTIONS = {"small": None, "large": [3712, 1952, 96]}
+
+
+def make_results(scale: dict = None) -> dict:
+    """兩個樣本的各階段耗時；scale 指定 (樣本, 階段) 的倍數"""
+    scale = scale or {}
+    stages = {
+        "small": {"decode": 0.002, "detect": 0.001, "end_to_end": 0.008},
+        "large": {"decode": 0.200, "detect": 0.002, "end_to_end": 0.600},
+    }
+    return {
+        name: {
+            "stages": {
+                stage: seconds * scale.get((name, stage), 1.0) for stage, seconds in values.items()
+            },
+            "detection": DETECTIONS[name],
+        }
+        for name, values in stages.items()
+    }
+
+
+def baseline() -> dict:
+    return {"version": BASELINE_VERSION, "results": make_results()}
+
+
+def test_small_sample_jitter_is_not_a_regression():
+    # 2ms 的解碼慢了 25% 以上，但整個階段的總耗時幾乎不變
+    results = make_results({("small", "decode"): 1.3, ("small", "end_to_end"): 1.4})
+    assert compare_baseline(results, baseline(), 0.25) == []
+
+
+def test_stage_regression_is_reported():
+    results = make_results({("large", "decode"): 1.5, ("small", "decode"): 1.5})
+    [(stage, base, seconds, worst)] = compare_baseline(results, baseline(), 0.25)
+    assert stage == "decode" and worst == "large"
+    assert base == pytest.approx(0.202) and seconds == pytest.approx(0.303)
+
+
+def test_tiny_stage_below_floor_is_ignored():
+    # detect 總共只有 3ms，加倍也低於 REGRESSION_FLOOR
+    results = make_results({("small", "detect"): 2.0, ("large", "detect"): 2.0})
+    assert compare_baseline(results, baseline(), 0.25) == []
+
+
+def test_only_common_samples_are_compared():
+    results = make_results()
+    results["new"] = {"stages": {"decode": 5.0}, "detection": [0, 0, 48]}
+    assert compare_baseline(results, baseline(), 0.25) == []
+    assert compare_detections(results, baseline()) == []
+
+
+def test_old_baseline_version_is_rejected():
+    with pytest.raises(ValueError):
+        compare_baseline(make_results(), {"version": 1, "results": make_results()}, 0.25)
+    with pytest.raises(ValueError):
+        compare_detections(make_results(), {"version": 2, "results": make_results()})
+
+
+@pytest.mark.parametrize("name, detection", [
+    ("large", None),                 # 不再偵測到浮水印
+    ("large", [3710, 1952, 96]),     # 位置不同
+    ("large", [3712, 1952, 48]),     # 尺寸不同
+    ("small", [464, 464, 48]),       # 負樣本被誤判
+])
+def test_faster_with_changed_detection_fails(name, detection):
+    # 所有階段都變快，但偵測結果與基準不同
+    results = make_results({(n, "detect"): 0.5 for n in DETECTIONS})
+    results[name]["detection"] = detection
+    assert compare_baseline(results, baseline(), 0.25) == []
+    assert compare_detections(results, baseline()) == [(name, DETECTIONS[name], detection)]
+
+
+def test_same_detection_passes():
+    assert compare_detections(make_results(), baseline()) == []
@@ -0,0 +1,93 @@
+"""
+alpha map 快取檔的測試：快取不完整、損毀、格式過期或目錄不可寫時，改由內嵌素材重新計算
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+
+def make_remover(cache_path):
+    from remove_watermark import WatermarkRemover
+
+    return WatermarkRemover(cache_path=str(cache_path))
+
+
+@pytest.fixture(scope="module")
+def reference():
+    """由內嵌素材計算的快取內容"""
+    from remove_watermark import WatermarkRemover
+
+    return WatermarkRemover(cache_path=os.devnull)._compute_alpha_data()
+
+
+def assert_maps(remover, reference):
+    from remove_watermark import LOGO_SIZES
+
+    offset = 0
+    for size in LOGO_SIZES:
+        count = size * size
+        assert np.array_equal(remover._get_alpha_map(size).ravel(), reference[offset:offset + count])
+        assert np.array_equal(remover._get_alpha_norm(size).ravel(),
+                              reference[offset + count:offset + 2 * count])
+        offset += 2 * count
+
+
+def corrupt(path, kind):
+    if kind == "empty":
+        open(path, "wb").close()
+    elif kind == "truncated_header":
+        with open(path, "r+b") as f:
+            f.truncate(50)
+    elif kind == "truncated_data":
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) // 2)
+    elif kind == "garbage":
+        with open(path, "wb") as f:
+            f.write(os.urandom(4096))
+    elif kind == "stale_shape":
+        np.save(path, np.zeros(100, np.float32))
+    elif kind == "stale_dtype":
+        np.save(path, np.load(path).astype(np.float64))
+
+
+@pytest.mark.parametrize("kind", [
+    "empty", "truncated_header", "truncated_data", "garbage", "stale_shape", "stale_dtype",
+])
+def test_broken_cache_is_rebuilt(tmp_path, reference, kind):
+    path = str(tmp_path / "alpha_maps.npy")
+    make_remover(path).build_alpha_cache()
+    corrupt(path, kind)
+
+    remover = make_remover(path)
+    assert remover._read_alpha_cache() is None
+    assert_maps(remover, reference)
+    # 重新寫入的快取檔可以直接以 mmap 載入
+    data = make_remover(path)._read_alpha_cache()
+    assert isinstance(data, np.memmap) and np.array_equal(data, reference)
+
+
+def test_unwritable_cache_location_falls_back(tmp_path, reference):
+    # 快取目錄的上層是一般檔案，無法建立目錄（root 也一樣）
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_bytes(b"")
+    path = str(blocker / "cache" / "alpha_maps.npy")
+    remover = make_remover(path)
+    assert_maps(remover, reference)
+    assert not os.path.exists(path)
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "geteuid") or os.geteuid() == 0, reason="root 不受目錄權限限制"
+)
+def test_read_only_cache_dir_falls_back(tmp_path, reference):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    cache_dir.chmod(0o555)
+    try:
+        remover = make_remover(cache_dir / "alpha_maps.npy")
+        assert_maps(remover, reference)
+        assert os.listdir(str(cache_dir)) == []
+    finally:
+        cache_dir.chmod(0o755)
@@ -0,0 +1,58 @@
+"""
+常駐服務客戶端的測試：服務在回報 done 之前斷線時，未回報的檔案都算失敗
+"""
+
+import os
+import sys
+import json
+import socket
+import threading
+
+import pytest
+
+import watermark_daemon
+
+
+def fake_server(sock, replies, partial=b""):
+    """讀入請求、回覆 replies 後（可再寫入不完整的一行）直接關閉連線"""
+
+    def run():
+        with sock:
+            sock.makefile("rb").readline()
+            for reply in replies:
+                sock.sendall(json.dumps(reply).encode("utf-8") + b"\n")
+            sock.sendall(partial)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+@pytest.mark.parametrize("partial", [b"", b'{"path": "/x/b.pn'])
+def test_eof_before_done_fails_unreported_paths(tmp_path, monkeypatch, capsys, partial):
+    paths = [str(tmp_path / name) for name in ("a.png", "b.png", "c.png")]
+    client, server = socket.socketpair()
+    thread = fake_server(
+        server, [{"path": paths[0], "status": "ok", "output": paths[0] + ".out"}], partial
+    )
+    monkeypatch.setattr(watermark_daemon, "connect_or_start", lambda: client)
+    monkeypatch.setattr(sys, "argv", ["watermark_daemon.py"] + paths)
+
+    with pytest.raises(SystemExit) as exc_info:
+        watermark_daemon.main()
+    thread.join()
+    assert exc_info.value.code == 1
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith("✓ " + paths[0])
+    assert [line.split(":")[0] for line in lines[1:]] == ["✗ " + p for p in paths[1:]]
+
+
+def test_done_ends_request(tmp_path, monkeypatch):
+    path = os.path.abspath(str(tmp_path / "a.png"))
+    client, server = socket.socketpair()
+    thread = fake_server(server, [{"path": path, "status": "no_watermark"}, {"done": True}])
+    monkeypatch.setattr(watermark_daemon, "connect_or_start", lambda: client)
+
+    results = list(watermark_daemon.process_paths([path]))
+    thread.join()
+    assert results == [{"path": path, "status": "no_watermark"}]
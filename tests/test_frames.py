@@ -0,0 +1,85 @@
+"""
+動態圖片與多頁 TIFF 的測試：影格數、每個影格的顯示時間、循環次數，以及每個影格的浮水印都已移除
+"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageSequence
+
+from conftest import add_watermark
+
+DURATIONS = [80, 120, 80, 200]
+LOOP = 2
+# 第 3 個影格與第 1 個相同，走沿用先前結果的路徑
+COLORS = [(40, 90, 160), (150, 60, 30), (40, 90, 160), (20, 120, 70)]
+X, Y, SIZE = 800 - 32 - 48, 600 - 32 - 48, 48
+
+
+def flat_frame(color: tuple, index: int) -> np.ndarray:
+    """單色背景加上一個位置不同的色塊，顏色少，GIF 的調色盤不會量化掉浮水印"""
+    array = np.empty((600, 800, 3), dtype=np.uint8)
+    array[:] = color
+    array[100:200, 100 + index * 50:250 + index * 50] = (230, 230, 40)
+    return array
+
+
+@pytest.fixture(scope="module")
+def frames(remover):
+    """(乾淨的影格, 加上浮水印的影格)"""
+    clean = [flat_frame(color, COLORS.index(color)) for color in COLORS]
+    alpha_map = remover._get_alpha_map(SIZE)
+    return clean, [add_watermark(frame, alpha_map, X, Y) for frame in clean]
+
+
+def encode(arrays: list, format: str) -> bytes:
+    images = [Image.fromarray(array) for array in arrays]
+    save_args = {"save_all": True, "append_images": images[1:]}
+    if format != "TIFF":
+        save_args.update(duration=DURATIONS, loop=LOOP)
+    if format == "WEBP":
+        save_args["lossless"] = True
+    output = io.BytesIO()
+    images[0].save(output, format, **save_args)
+    return output.getvalue()
+
+
+def region_error(frame: Image.Image, clean: np.ndarray) -> float:
+    array = np.asarray(frame.convert("RGB"), dtype=np.float32)
+    return float(np.abs(array[Y:Y + SIZE, X:X + SIZE] - clean[Y:Y + SIZE, X:X + SIZE]).mean())
+
+
+@pytest.mark.parametrize("frame_jobs", [1, 3])
+@pytest.mark.parametrize("format", ["GIF", "WEBP", "PNG", "TIFF"])
+def test_frames_keep_timing_and_lose_watermark(frames, format, frame_jobs):
+    from remove_watermark import WatermarkRemover
+
+    clean, marked = frames
+    data = encode(marked, format)
+    output, detection = WatermarkRemover(frame_jobs=frame_jobs).remove_watermark_bytes(data)
+    assert detection is not None
+    assert (detection["frames"], detection["frame_count"]) == (4, 4)
+
+    source = Image.open(io.BytesIO(data))
+    result = Image.open(io.BytesIO(output))
+    assert result.format == format and result.n_frames == len(COLORS)
+    if format != "TIFF":
+        assert result.info.get("loop") == LOOP
+    for index, (before, after) in enumerate(zip(ImageSequence.Iterator(source),
+                                                 ImageSequence.Iterator(result))):
+        # WebP 的顯示時間在載入影格後才會放入 info
+        after.load()
+        if format != "TIFF":
+            assert after.info.get("duration") == DURATIONS[index]
+        marked_error = region_error(before, clean[index])
+        assert marked_error > 20
+        assert region_error(after, clean[index]) < 1.5
+
+
+def test_clean_animation_is_unchanged(frames):
+    from remove_watermark import WatermarkRemover
+
+    data = encode(frames[0], "PNG")
+    output, detection = WatermarkRemover(frame_jobs=2).remove_watermark_bytes(data)
+    assert detection is None and output == data
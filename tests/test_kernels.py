@@ -0,0 +1,207 @@
+"""
+向量化核心與原本逐像素迴圈實作的等價性測試
+參考實作取自改寫前的 remove_watermark.py，輸出需逐位元組一致
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import add_watermark
+
+CONFIGS = {48: 32, 96: 64}
+
+
+def loop_alpha_map(bg_image: Image.Image) -> np.ndarray:
+    """原本的 _calculate_alpha_map"""
+    bg_array = np.array(bg_image, dtype=np.float32)
+    height, width = bg_array.shape[:2]
+    alpha_map = np.zeros((height, width), dtype=np.float32)
+    for y in range(height):
+        for x in range(width):
+            r, g, b = bg_array[y, x, :3]
+            alpha_map[y, x] = max(r, g, b) / 255.0
+    return alpha_map
+
+
+def loop_is_watermark_present(image: Image.Image, alpha_map: np.ndarray, x: int, y: int,
+                              size: int) -> bool:
+    """原本的 _is_watermark_present"""
+    image_array = np.array(image.convert("RGBA"), dtype=np.float32)
+    high_alpha_sum = high_alpha_weighted_sum = 0
+    high_alpha_count = low_alpha_count = 0
+    low_alpha_brightness_sum = 0
+    white_pixel_count = 0
+    brightness_values = []
+    for row in range(size):
+        for col in range(size):
+            if row >= alpha_map.shape[0] or col >= alpha_map.shape[1]:
+                continue
+            alpha = alpha_map[row, col]
+            img_y, img_x = y + row, x + col
+            if img_y >= image_array.shape[0] or img_x >= image_array.shape[1]:
+                continue
+            r, g, b = image_array[img_y, img_x, :3]
+            brightness = (r + g + b) / 3
+            brightness_values.append(brightness)
+            if r >= 250 and g >= 250 and b >= 250:
+                white_pixel_count += 1
+            if alpha >= 0.15:
+                high_alpha_sum += brightness
+                high_alpha_weighted_sum += alpha
+                high_alpha_count += 1
+            elif alpha <= 0.02:
+                low_alpha_brightness_sum += brightness
+                low_alpha_count += 1
+
+    white_ratio = white_pixel_count / (size * size)
+    if not brightness_values:
+        return False
+    if (white_ratio >= 0.98 and np.mean(brightness_values) >= 245
+            and np.std(brightness_values) <= 5):
+        return False
+    if high_alpha_count == 0 or low_alpha_count == 0:
+        return False
+    high_avg = high_alpha_sum / high_alpha_count
+    low_avg = low_alpha_brightness_sum / low_alpha_count
+    avg_alpha = high_alpha_weighted_sum / high_alpha_count
+    expected_boost = avg_alpha * (255 - low_avg)
+    actual_boost = high_avg - low_avg
+    if expected_boost < 5:
+        return high_avg >= avg_alpha * 255 + (1 - avg_alpha) * low_avg - 20
+    return 0.4 <= actual_boost / expected_boost <= 1.5
+
+
+def loop_remove(image: Image.Image, alpha_map: np.ndarray, x: int, y: int, size: int,
+                alpha_threshold: float, max_alpha: float, logo_value: float) -> Image.Image:
+    """原本的 _remove_watermark_from_region"""
+    result_array = np.array(image.convert("RGBA"), dtype=np.float32)
+    for dy in range(size):
+        for dx in range(size):
+            img_x, img_y = x + dx, y + dy
+            if img_y < result_array.shape[0] and img_x < result_array.shape[1]:
+                alpha = alpha_map[dy, dx]
+                if alpha > alpha_threshold:
+                    alpha = min(alpha, max_alpha)
+                    for c in range(3):
+                        blended = result_array[img_y, img_x, c]
+                        original = (blended - logo_value * alpha) / (1 - alpha)
+                        result_array[img_y, img_x, c] = np.clip(original, 0, 255)
+    return Image.fromarray(result_array.astype(np.uint8), "RGBA")
+
+
+def make_case(remover, size: int, kind: str, watermarked: bool, seed: int) -> tuple:
+    """產生測試圖片，回傳 (RGBA 圖片, x, y)"""
+    rng = np.random.default_rng(seed)
+    width, height = (1400, 1200) if size == 96 else (800, 600)
+    if kind == "random":
+        array = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    elif kind == "flat":
+        array = np.empty((height, width, 3), dtype=np.uint8)
+        array[:] = rng.integers(0, 256, 3)
+    else:
+        array = np.full((height, width, 3), 255, dtype=np.uint8)
+    margin = CONFIGS[size]
+    x, y = width - margin - size, height - margin - size
+    if watermarked:
+        array = add_watermark(array, remover._get_alpha_map(size), x, y)
+    return Image.fromarray(array).convert("RGBA"), x, y
+
+
+@pytest.mark.parametrize("size", [48, 96])
+def test_alpha_map_matches_loop(remover, size):
+    expected = loop_alpha_map(remover._get_background(size))
+    assert remover._get_alpha_map(size).tobytes() == expected.tobytes()
+
+
+@pytest.mark.parametrize("size", [48, 96])
+@pytest.mark.parametrize("kind", ["random", "flat", "white"])
+@pytest.mark.parametrize("watermarked", [True, False])
+def test_is_watermark_present_matches_loop(remover, size, kind, watermarked):
+    image, x, y = make_case(remover, size, kind, watermarked, seed=size)
+    alpha_map = remover._get_alpha_map(size)
+    expected = loop_is_watermark_present(image, alpha_map, x, y, size)
+    patch = remover._crop_patch(image, x, y, size)
+    assert remover._is_watermark_present(patch, alpha_map) == expected
+    if watermarked and kind != "white":
+        assert expected
+
+
+@pytest.mark.parametrize("size", [48, 96])
+@pytest.mark.parametrize("kind", ["random", "flat", "white"])
+def test_removal_matches_loop(remover, size, kind):
+    image, x, y = make_case(remover, size, kind, True, seed=size + 1)
+    expected = loop_remove(
+        image, remover._get_alpha_map(size), x, y, size,
+        remover.ALPHA_THRESHOLD, remover.MAX_ALPHA, remover.DEFAULT_LOGO_VALUE,
+    )
+    result = remover._remove_watermark_from_region(image.copy(), (x, y, size))
+    assert result.tobytes() == expected.tobytes()
+
+
+def test_removal_clipped_at_image_edge(remover):
+    """logo 超出圖片邊界時只處理重疊部分"""
+    image, _, _ = make_case(remover, 48, "random", True, seed=7)
+    x, y = image.width - 20, image.height - 30
+    expected = loop_remove(
+        image, remover._get_alpha_map(48), x, y, 48,
+        remover.ALPHA_THRESHOLD, remover.MAX_ALPHA, remover.DEFAULT_LOGO_VALUE,
+    )
+    result = remover._remove_watermark_from_region(image.copy(), (x, y, 48))
+    assert result.tobytes() == expected.tobytes()
+
+
+def make_edge_case(remover, kind: str, alpha_scale: float, logo_value: float) -> tuple:
+    """
+    以指定 alpha 強度與 logo 色彩產生 48px 測試圖片，回傳 (RGBA 圖片, x, y)
+    black 未加浮水印，反向混合的結果低於 0；white 在 logo 色彩低於 255 時高於 255
+    """
+    rng = np.random.default_rng(int(alpha_scale * 100))
+    if kind == "random":
+        array = rng.integers(0, 256, (600, 800, 3), dtype=np.uint8)
+    else:
+        array = np.full((600, 800, 3), 0 if kind == "black" else 255, dtype=np.uint8)
+    x, y = 800 - 32 - 48, 600 - 32 - 48
+    if kind == "random":
+        array = add_watermark(array, remover._get_alpha_map(48), x, y, alpha_scale, logo_value)
+    return Image.fromarray(array).convert("RGBA"), x, y
+
+
+@pytest.mark.parametrize("alpha_scale", [0.55, 0.8, 1.25])
+@pytest.mark.parametrize("logo_value", [255.0, 230.0])
+@pytest.mark.parametrize("kind", ["random", "black", "white"])
+def test_scaled_removal_matches_loop(remover, alpha_scale, logo_value, kind):
+    """alpha 強度不為 1 時（含超過 MAX_ALPHA 的部分）查表結果與逐像素計算一致"""
+    image, x, y = make_edge_case(remover, kind, alpha_scale, logo_value)
+    alpha_map = remover._get_alpha_map(48) * np.float32(alpha_scale)
+    expected = loop_remove(
+        image, alpha_map, x, y, 48, remover.ALPHA_THRESHOLD, remover.MAX_ALPHA, logo_value
+    )
+    result = remover._remove_watermark_from_region(image.copy(), (x, y, 48), alpha_scale, logo_value)
+    assert result.tobytes() == expected.tobytes()
+
+    # 確認查表的 0 與 255 兩端確實被用到
+    region = np.asarray(result)[y:y + 48, x:x + 48, :3]
+    mask = alpha_map > remover.ALPHA_THRESHOLD
+    if kind == "black":
+        assert (region[mask] == 0).all()
+    elif kind == "white" and logo_value < 255:
+        # logo 為 255 時結果在 255 附近，float32 捨入後可能捨去為 254，不經過上限
+        before = np.asarray(image)[y:y + 48, x:x + 48, :3][mask].astype(np.float32)
+        alpha = np.minimum(alpha_map[mask], remover.MAX_ALPHA)[:, None]
+        assert ((before - logo_value * alpha) / (1 - alpha) > 255).all()
+        assert (region[mask] == 255).all()
+
+
+def test_scaled_lut_covers_every_input_value(remover):
+    """查表的每一列、每個輸入值都與逐像素公式一致"""
+    for alpha_scale in (0.55, 1.25):
+        offsets, lut = remover._get_removal_lut(48, alpha_scale, 240.0)
+        alpha_map = np.minimum(remover._get_alpha_map(48) * np.float32(alpha_scale), remover.MAX_ALPHA)
+        rows = offsets[..., 0] // 256
+        for row in np.unique(rows)[1:]:
+            alpha = alpha_map[rows == row][0]
+            for value in (0, 1, 127, 254, 255):
+                original = (np.float32(value) - 240.0 * alpha) / (1 - alpha)
+                assert lut[row * 256 + value] == np.uint8(np.clip(original, 0, 255))
+        assert (lut[:256] == np.arange(256)).all()
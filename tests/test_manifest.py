@@ -0,0 +1,138 @@
+"""
+處理紀錄（manifest）的測試
+"""
+
+import os
+import sqlite3
+import time
+
+from PIL import Image
+
+from conftest import photo_like
+from watermark_batch import main
+from watermark_manifest import Manifest, options_fingerprint
+
+
+def make_file(path, data=b"image"):
+    with open(path, "wb") as f:
+        f.write(data)
+    stat = os.stat(path)
+    return {
+        "path": str(path), "bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+        "content_hash": "h" + os.path.basename(str(path)), "status": "no_watermark",
+    }
+
+
+def age(manifest, days):
+    """讓所有紀錄看起來是 days 天前處理、最後一次看到的"""
+    past = time.time() - days * 86400
+    manifest.conn.execute("UPDATE files SET updated_at = ?, seen_at = ?", (past, past))
+    manifest.commit()
+
+
+def test_lookup_hit_keeps_unchanged_file(tmp_path):
+    kept = make_file(tmp_path / "kept.png")
+    gone = make_file(tmp_path / "gone.png")
+    with Manifest(str(tmp_path / "m.db")) as manifest:
+        manifest.record(kept)
+        manifest.record(gone)
+        age(manifest, 100)
+
+        # 未變更的檔案被略過，刪除的檔案不再出現
+        os.remove(gone["path"])
+        manifest.touch([kept["path"]])
+        manifest.commit()
+        assert manifest.lookup(kept["path"])["status"] == "no_watermark"
+        assert manifest.lookup(gone["path"]) is None
+
+        assert manifest.prune(max_age_days=90) == 1
+        assert manifest.lookup(kept["path"]) is not None
+
+
+def test_max_entries_keeps_recently_seen(tmp_path):
+    entries = [make_file(tmp_path / f"{index}.png") for index in range(3)]
+    with Manifest(str(tmp_path / "m.db")) as manifest:
+        for entry in entries:
+            manifest.record(entry)
+        age(manifest, 10)
+        manifest.touch([entries[0]["path"]])
+        manifest.commit()
+
+        assert manifest.prune(max_entries=1) == 2
+        assert manifest.lookup(entries[0]["path"]) is not None
+
+
+def test_read_only_lookup_does_not_write(tmp_path):
+    entry = make_file(tmp_path / "a.png")
+    db_path = str(tmp_path / "m.db")
+    with Manifest(db_path) as manifest:
+        manifest.record(entry)
+        age(manifest, 10)
+    with Manifest(db_path, read_only=True) as manifest:
+        assert manifest.lookup(entry["path"]) is not None
+
+
+def test_old_schema_is_migrated(tmp_path):
+    entry = make_file(tmp_path / "a.png")
+    db_path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE files (
+            path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+            content_hash TEXT NOT NULL, status TEXT NOT NULL, output TEXT, error TEXT,
+            updated_at REAL NOT NULL
+        );
+    """)
+    conn.execute(
+        "INSERT INTO files VALUES (?, ?, ?, ?, ?, NULL, NULL, ?)",
+        (os.path.abspath(entry["path"]), entry["bytes"], entry["mtime_ns"],
+         entry["content_hash"], "no_watermark", 123.0),
+    )
+    conn.commit()
+    conn.close()
+
+    with Manifest(db_path) as manifest:
+        seen_at = manifest.conn.execute("SELECT seen_at FROM files").fetchone()[0]
+        assert seen_at == 123.0
+        # 舊紀錄沒有處理參數，不能確定與目前參數相同
+        assert manifest.lookup(entry["path"]) is None
+        manifest.record(entry)
+        assert manifest.lookup(entry["path"]) is not None
+
+
+def test_changed_options_are_not_reused(tmp_path):
+    entry = make_file(tmp_path / "a.png")
+    db_path = str(tmp_path / "m.db")
+    with Manifest(db_path, options={"search": False, "frame_jobs": 2}) as manifest:
+        manifest.record(entry)
+        manifest.commit()
+    # 明確指定預設值與只影響速度的參數都不改變指紋
+    assert options_fingerprint({"search": False, "frame_jobs": 4}) == options_fingerprint()
+    for options in ({"search": True}, {"logo_size": 64}, {"encode_profile": "fast"},
+                    {"jpeg_quality": 80}, {"jpeg_subsampling": "4:2:0"}):
+        with Manifest(db_path, read_only=True, options=options) as manifest:
+            assert manifest.lookup(entry["path"]) is None
+            assert manifest.lookup_hash(entry["content_hash"], entry["bytes"]) is None
+    with Manifest(db_path, read_only=True, options={"frame_jobs": 8}) as manifest:
+        assert manifest.lookup(entry["path"]) is not None
+        assert manifest.lookup_hash(entry["content_hash"], entry["bytes"]) is not None
+
+
+def test_prune_keeps_inputs_of_other_shards_and_checkpoint(tmp_path):
+    for index in range(6):
+        Image.fromarray(photo_like(64, 64, index)).save(str(tmp_path / f"{index}.png"))
+    db_path = str(tmp_path / "m.db")
+    checkpoints = str(tmp_path / "checkpoints")
+    for shard in ("1/2", "2/2"):
+        args = [str(tmp_path), "-j", "1", "-q", "--manifest", db_path, "--shard", shard]
+        assert main(args + ["--checkpoint-dir", checkpoints]) == 0
+    with Manifest(db_path) as manifest:
+        assert manifest.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 6
+        age(manifest, 100)
+
+    # 第一個分片的檔案全部由檢查點略過，第二個分片的檔案不屬於這次執行
+    args = [str(tmp_path), "-j", "1", "-q", "--manifest", db_path, "--shard", "1/2",
+            "--checkpoint-dir", checkpoints, "--manifest-max-age", "90"]
+    assert main(args) == 0
+    with Manifest(db_path) as manifest:
+        assert manifest.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 6
@@ -0,0 +1,171 @@
+"""
+記憶體介面（remove_watermark_bytes / remove_watermark_fileobj / remove_watermark_array）的測試
+"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import add_watermark, photo_like
+
+
+class NonSeekableReader(io.RawIOBase):
+    """只能依序讀取的串流（例如管線或網路連線）"""
+
+    def __init__(self, data: bytes):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._data.read(min(len(buffer), 4096))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+class NonSeekableWriter(io.RawIOBase):
+    """只能依序寫入的串流"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def getvalue(self) -> bytes:
+        return b"".join(self.chunks)
+
+
+def encode(array: np.ndarray, format: str) -> bytes:
+    output = io.BytesIO()
+    Image.fromarray(array).save(output, format, **({"quality": 95} if format == "JPEG" else {}))
+    return output.getvalue()
+
+
+@pytest.fixture(scope="module")
+def images(remover):
+    """(乾淨的圖片, 加上 48px 浮水印的圖片)"""
+    clean = photo_like(800, 600, 5)
+    return clean, add_watermark(clean, remover._get_alpha_map(48), 720, 520)
+
+
+def region_error(data: bytes, clean: np.ndarray) -> float:
+    """浮水印區塊與乾淨圖片的平均絕對差"""
+    array = np.asarray(Image.open(io.BytesIO(data)).convert("RGB"), dtype=np.float32)
+    return float(np.abs(array[520:568, 720:768] - clean[520:568, 720:768]).mean())
+
+
+@pytest.mark.parametrize("format", ["PNG", "JPEG", "WEBP", "TIFF"])
+def test_bytes_round_trip_keeps_format(remover, images, format):
+    clean, marked = images
+    data = encode(marked, format)
+    output, detection = remover.remove_watermark_bytes(data)
+
+    assert (detection["x"], detection["y"], detection["size"]) == (720, 520, 48)
+    with Image.open(io.BytesIO(output)) as image:
+        assert image.format == format and image.size == (800, 600)
+    assert region_error(output, clean) < region_error(data, clean) / 4
+
+
+def test_bytes_converts_to_requested_format(remover, images):
+    data = encode(images[1], "PNG")
+    output, detection = remover.remove_watermark_bytes(data, "jpg")
+    assert detection is not None
+    assert Image.open(io.BytesIO(output)).format == "JPEG"
+
+
+@pytest.mark.parametrize("format", ["PNG", "JPEG"])
+def test_clean_image_is_returned_unchanged(remover, images, format):
+    data = encode(images[0], format)
+    output, detection = remover.remove_watermark_bytes(data)
+    assert detection is None and output == data
+
+    # fileobj 介面未偵測到浮水印時不寫入任何內容
+    target = io.BytesIO()
+    assert remover.remove_watermark_fileobj(io.BytesIO(data), target) is None
+    assert target.getvalue() == b""
+
+
+def test_fileobj_with_non_seekable_streams(remover, images):
+    data = encode(images[1], "PNG")
+    reader = NonSeekableReader(data)
+    writer = NonSeekableWriter()
+    assert not reader.seekable() and not writer.seekable()
+
+    detection = remover.remove_watermark_fileobj(reader, writer)
+    assert detection is not None and detection["size"] == 48
+    expected, _ = remover.remove_watermark_bytes(data)
+    assert writer.getvalue() == expected
+
+
+def test_fileobj_rejects_non_image(remover):
+    from PIL import UnidentifiedImageError
+
+    with pytest.raises(UnidentifiedImageError):
+        remover.remove_watermark_fileobj(io.BytesIO(b"not an image"), io.BytesIO())
+
+
+def view_cases(marked: np.ndarray):
+    """(父陣列, 取得與 marked 內容相同之 view 的切片) 清單"""
+    height, width = marked.shape[:2]
+    offset = np.zeros((height + 100, width + 60, 3), np.uint8)
+    offset[40:40 + height, 20:20 + width] = marked
+    doubled = np.repeat(np.repeat(marked, 2, axis=0), 2, axis=1)
+    rgba = np.dstack([marked, np.full((height, width), 255, np.uint8)])
+    return [
+        (offset, (slice(40, 40 + height), slice(20, 20 + width))),
+        (doubled, (slice(None, None, 2), slice(None, None, 2))),
+        (rgba, (slice(None), slice(None), slice(0, 3))),
+    ]
+
+
+@pytest.mark.parametrize("case", range(3), ids=["offset", "strided", "channels"])
+def test_array_view_modifies_parent(remover, images, case):
+    marked = images[1]
+    expected = marked.copy()
+    assert remover.remove_watermark_array(expected) is not None
+
+    parent, index = view_cases(marked)[case]
+    original = parent.copy()
+    view = parent[index]
+    assert not view.flags.c_contiguous
+    detection = remover.remove_watermark_array(view)
+
+    assert (detection["x"], detection["y"], detection["size"]) == (720, 520, 48)
+    assert np.array_equal(parent[index], expected)
+    # view 以外的內容不變
+    outside = np.ones(parent.shape, bool)
+    outside[index] = False
+    assert np.array_equal(parent[outside], original[outside])
+
+
+def test_array_without_watermark_is_untouched(remover, images):
+    array = images[0].copy()
+    assert remover.remove_watermark_array(array) is None
+    assert np.array_equal(array, images[0])
+
+
+@pytest.mark.parametrize("array", [
+    np.zeros((600, 800, 3), np.float32),
+    np.zeros((600, 800, 3), np.uint16),
+    np.zeros((600, 800), np.uint8),
+    np.zeros((600, 800, 2), np.uint8),
+    np.zeros((600, 800, 5), np.uint8),
+], ids=["float32", "uint16", "gray", "2ch", "5ch"])
+def test_array_rejects_wrong_dtype_or_channels(remover, array):
+    with pytest.raises(ValueError):
+        remover.remove_watermark_array(array)
+
+
+def test_array_rejects_read_only(remover, images):
+    array = images[1].copy()
+    array.flags.writeable = False
+    with pytest.raises(ValueError):
+        remover.remove_watermark_array(array)
@@ -0,0 +1,130 @@
+"""
+各階段量測（watermark_metrics）與單張圖片命令列量測參數的測試
+"""
+
+import os
+import json
+import time
+
+import pytest
+from PIL import Image
+
+from conftest import add_watermark, photo_like
+from watermark_metrics import STAGES, ImageRecord, Metrics
+
+
+def test_stage_accumulates_repeated_stages():
+    record = ImageRecord()
+    for _ in range(2):
+        with record.stage("decode"):
+            time.sleep(0.01)
+    with pytest.raises(RuntimeError):
+        with record.stage("encode"):
+            raise RuntimeError("encode failed")
+
+    wall, cpu = record.stages["decode"]
+    assert wall >= 0.02 and 0.0 <= cpu < wall
+    # 發生例外的階段仍會記錄
+    assert "encode" in record.stages
+
+
+def test_merge_adds_frame_stages():
+    record = ImageRecord()
+    record.stages["detect"] = [1.0, 0.5]
+    frame = ImageRecord()
+    frame.stages["detect"] = [0.25, 0.25]
+    frame.stages["remove"] = [2.0, 1.5]
+    record.merge(frame)
+    record.merge(frame)
+    assert record.stages == {"detect": [1.5, 1.0], "remove": [4.0, 3.0]}
+    assert frame.stages == {"detect": [0.25, 0.25], "remove": [2.0, 1.5]}
+
+
+def test_finish_calls_hook_and_sets_last_record():
+    seen = []
+    metrics = Metrics(hook=seen.append)
+    for outcome in ("detected", "no_watermark", "detected"):
+        record = metrics.start()
+        record.stages["decode"] = [0.5, 0.25]
+        record.bytes_read = 100
+        record.bytes_written = 40 if outcome == "detected" else 0
+        record.outcome = outcome
+        metrics.finish(record)
+
+    assert len(seen) == 3 and metrics.last_record is seen[-1]
+    assert seen[0] == {
+        "stages": {"decode": {"wall": 0.5, "cpu": 0.25}},
+        "bytes_read": 100, "bytes_written": 40, "outcome": "detected",
+    }
+    summary = metrics.to_dict()
+    assert summary["images"] == 3
+    assert summary["stages"] == {"decode": {"count": 3, "wall": 1.5, "cpu": 0.75}}
+    assert summary["outcomes"] == {"detected": 2, "no_watermark": 1, "error": 0}
+    assert (summary["bytes_read"], summary["bytes_written"]) == (300, 80)
+
+
+def test_remover_sets_last_record(remover, tmp_path):
+    from remove_watermark import WatermarkRemover
+
+    array = add_watermark(photo_like(800, 600, 2), remover._get_alpha_map(48), 720, 520)
+    path = str(tmp_path / "marked.png")
+    Image.fromarray(array).save(path)
+    records = []
+    metrics = Metrics(hook=records.append)
+    WatermarkRemover(metrics=metrics).remove_watermark(
+        path, str(tmp_path / "out.png"), verbose=False
+    )
+
+    [record] = records
+    assert metrics.last_record is record and record["outcome"] == "detected"
+    assert set(record["stages"]) <= set(STAGES)
+    assert {"decode", "detect", "remove", "encode"} <= set(record["stages"])
+    # 解碼器不一定會讀到檔尾的結束區塊
+    assert 0.9 * os.path.getsize(path) < record["bytes_read"] <= os.path.getsize(path)
+    assert record["bytes_written"] == os.path.getsize(str(tmp_path / "out.png"))
+
+
+def test_write_json_skips_unused_stages(tmp_path):
+    metrics = Metrics()
+    metrics.add({
+        "stages": {"detect": {"wall": 0.125, "cpu": 0.0625}},
+        "bytes_read": 10, "bytes_written": 0, "outcome": "no_watermark",
+    })
+    path = str(tmp_path / "metrics.json")
+    metrics.write_json(path)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    assert data == {
+        "images": 1,
+        "stages": {"detect": {"count": 1, "wall": 0.125, "cpu": 0.0625}},
+        "bytes_read": 10, "bytes_written": 0,
+        "outcomes": {"detected": 0, "no_watermark": 1, "error": 0},
+    }
+
+
+def test_single_file_cli_writes_metrics(remover, tmp_path, capsys):
+    from remove_watermark import main
+
+    array = add_watermark(photo_like(800, 600, 4), remover._get_alpha_map(48), 720, 520)
+    path = str(tmp_path / "marked.png")
+    Image.fromarray(array).save(path)
+    output_path = str(tmp_path / "out.png")
+    metrics_path = str(tmp_path / "metrics.json")
+
+    main([path, output_path, "--timings", "--metrics-json", metrics_path])
+    assert os.path.exists(output_path)
+    assert "decode" in capsys.readouterr().out
+    with open(metrics_path, encoding="utf-8") as f:
+        assert json.load(f)["outcomes"]["detected"] == 1
+
+
+def test_single_file_cli_rejects_unknown_option(tmp_path, capsys):
+    from remove_watermark import main
+
+    path = str(tmp_path / "image.png")
+    Image.fromarray(photo_like(64, 64)).save(path)
+    with pytest.raises(SystemExit) as exc_info:
+        main([path, "--quality", "90"])
+    assert exc_info.value.code == 2
+    assert "--quality" in capsys.readouterr().err
+    assert sorted(os.listdir(str(tmp_path))) == ["image.png"]
@@ -0,0 +1,42 @@
+"""
+執行緒管線（--executor pipeline）的測試
+"""
+
+import pytest
+from PIL import Image
+
+from conftest import add_watermark, photo_like
+from watermark_batch import build_parser
+from watermark_pipeline import Pipeline
+
+
+@pytest.mark.parametrize("counts", [(0, 1, 1), (1, 1, 0), (1, -1, 1)])
+def test_rejects_empty_stage(remover, counts):
+    readers, workers, writers = counts
+    with pytest.raises(ValueError):
+        Pipeline(remover, readers, workers, writers)
+
+
+@pytest.mark.parametrize("option", ["--readers", "--writers", "-j", "--frame-jobs"])
+def test_cli_rejects_zero_threads(option, capsys):
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["x.png", "--executor", "pipeline", option, "0"])
+    assert "正整數" in capsys.readouterr().err
+
+
+def test_single_thread_stages(remover, tmp_path):
+    tasks = []
+    for index in range(4):
+        array = photo_like(800, 600, index)
+        if index % 2 == 0:
+            array = add_watermark(array, remover._get_alpha_map(48), 800 - 80, 600 - 80)
+        path = tmp_path / f"{index}.png"
+        Image.fromarray(array).save(path)
+        tasks.append((str(path), str(tmp_path / f"{index}_out.png")))
+
+    results = list(Pipeline(remover, 1, 1, 1).run(tasks))
+    statuses = {result["path"]: result["status"] for result in results}
+    assert statuses == {
+        path: "ok" if index % 2 == 0 else "no_watermark"
+        for index, (path, _) in enumerate(tasks)
+    }
@@ -0,0 +1,40 @@
+"""
+掃描模式的測試：draft 縮小解碼與完整解碼的偵測結果一致
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import add_watermark, photo_like
+from watermark_scan import scan_file
+
+
+@pytest.mark.parametrize("watermarked", [True, False])
+@pytest.mark.parametrize("seed", range(3))
+def test_draft_matches_full_decode(remover, tmp_path, watermarked, seed):
+    array = photo_like(1600, 1200, seed)
+    if watermarked:
+        array = add_watermark(array, remover._get_alpha_map(96), 1600 - 160, 1200 - 160, 0.9)
+    path = str(tmp_path / "image.jpg")
+    Image.fromarray(array).save(path, quality=92)
+
+    draft = scan_file(remover, path, draft=True)
+    full = scan_file(remover, path, draft=False)
+    assert draft["draft_scale"] == 2 and full["draft_scale"] == 1
+    assert draft["status"] == full["status"] == ("detected" if watermarked else "no_watermark")
+    if watermarked:
+        assert (draft["x"], draft["y"], draft["logo_size"]) == (1440, 1040, 96)
+        assert (full["x"], full["y"], full["logo_size"]) == (1440, 1040, 96)
+        # 縮小後的區塊無法代表完整解碼的 alpha 強度與分數
+        assert "alpha_scale" not in draft and "score" not in draft
+        assert full["alpha_scale"] == pytest.approx(0.9)
+
+
+def test_small_jpeg_is_not_drafted(remover, tmp_path):
+    array = add_watermark(photo_like(800, 600, 1), remover._get_alpha_map(48), 720, 520)
+    path = str(tmp_path / "image.jpg")
+    Image.fromarray(array).save(path, quality=92)
+    row = scan_file(remover, path)
+    assert row["draft_scale"] == 1 and row["status"] == "detected"
+    assert isinstance(row["alpha_scale"], float) and np.isfinite(row["score"])
@@ -0,0 +1,97 @@
+"""
+位置與尺寸搜尋（--search）的測試
+乾淨的類照片圖片不應偵測到浮水印；補邊、裁切或整張縮放過的圖片應找到正確的位置與尺寸
+"""
+
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import add_watermark, photo_like
+
+
+@pytest.fixture(scope="module")
+def searcher():
+    from remove_watermark import WatermarkRemover
+
+    return WatermarkRemover(search=True)
+
+
+def assert_located(detection, expected, tolerance=2):
+    assert detection is not None, f"未偵測到浮水印，預期 {expected}"
+    x, y, size = expected
+    got = (detection["x"], detection["y"], detection["size"])
+    assert abs(got[0] - x) <= tolerance and abs(got[1] - y) <= tolerance, (got, expected)
+    assert abs(got[2] - size) <= tolerance, (got, expected)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_clean_photo_has_no_detection(searcher, seed):
+    """平滑漸層與光斑的形狀可能與 logo 相似，但不是 logo 疊加造成的亮度變化"""
+    image = Image.fromarray(photo_like(1000, 800, seed))
+    assert searcher._detect_watermark(image) is None
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_clean_array_is_not_modified(searcher, seed):
+    array = photo_like(1000, 800, seed + 100)
+    original = array.copy()
+    assert searcher.remove_watermark_array(array) is None
+    assert np.array_equal(array, original)
+
+
+@pytest.mark.parametrize("size,shift", [(48, (-20, -12)), (48, (25, 10)), (96, (-40, 30))])
+def test_shifted_logo_is_found(searcher, size, shift):
+    """補邊或裁切使 logo 偏離固定位置"""
+    width, height = (1200, 1100) if size == 96 else (800, 600)
+    margin = size * 2 // 3
+    x, y = width - margin - size + shift[0], height - margin - size + shift[1]
+    array = add_watermark(photo_like(width, height, 7), searcher._get_alpha_map(size), x, y)
+    assert_located(searcher._detect_watermark(Image.fromarray(array)), (x, y, size), 0)
+
+
+def test_fixed_position_kept_on_textured_background(searcher):
+    """形狀驗證無法確認的雜訊背景，搜尋模式仍保留固定位置的結果"""
+    rng = np.random.default_rng(0)
+    array = (rng.random((600, 800, 3)) * 255).astype(np.uint8)
+    array = add_watermark(array, searcher._get_alpha_map(48), 800 - 80, 600 - 80)
+    detection = searcher._detect_watermark(Image.fromarray(array))
+    assert_located(detection, (720, 520, 48), 0)
+
+
+def test_fixed_hit_skips_search_sweep(searcher):
+    """固定位置已命中時不掃描尺寸範圍，搜尋模式的成本接近固定位置檢查"""
+    from remove_watermark import WatermarkRemover
+
+    rng = np.random.default_rng(1)
+    array = (rng.random((2160, 3840, 3)) * 255).astype(np.uint8)
+    array = add_watermark(array, searcher._get_alpha_map(96), 3840 - 160, 2160 - 160)
+    image = Image.fromarray(array)
+    fixed = WatermarkRemover()
+
+    def best_time(remover):
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            detection = remover._detect_watermark(image)
+            timings.append(time.perf_counter() - start)
+        assert_located(detection, (3680, 2000, 96), 0)
+        return min(timings)
+
+    # 完整掃描需要數百毫秒；寬鬆的上限只用來防止快速路徑退化成掃描
+    assert best_time(searcher) < best_time(fixed) + 0.025
+
+
+@pytest.mark.parametrize("width,height", [(1600, 1200), (2000, 1100)])
+@pytest.mark.parametrize("factor", [0.5, 0.6, 0.75, 0.9, 0.95, 1.05, 1.25, 1.5])
+def test_rescaled_photo(searcher, width, height, factor):
+    """整張圖片縮放過時 logo 尺寸與邊距依比例改變"""
+    x, y = width - 64 - 96, height - 64 - 96
+    array = add_watermark(photo_like(width, height, 1), searcher._get_alpha_map(96), x, y)
+    size = (round(width * factor), round(height * factor))
+    image = Image.fromarray(array).resize(size, Image.LANCZOS)
+    expected = (round(x * factor), round(y * factor), round(96 * factor))
+    assert_located(searcher._detect_watermark(image), expected)
+
@@ -0,0 +1,155 @@
+"""
+分片、檢查點續跑與合併報表的測試
+"""
+
+import os
+import json
+import argparse
+
+import pytest
+from PIL import Image
+
+from conftest import photo_like
+from watermark_batch import main as batch_main
+from watermark_shard import (
+    CheckpointLog, checkpoint_path, merge_logs, parse_shard, select_shard, shard_of,
+)
+from watermark_shard import main as merge_main
+
+
+def make_file(path, data=b"image"):
+    with open(path, "wb") as f:
+        f.write(data)
+    stat = os.stat(path)
+    return {"path": str(path), "status": "ok", "bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+@pytest.mark.parametrize("value, expected", [("1/1", (1, 1)), ("3/4", (3, 4)), ("4/4", (4, 4))])
+def test_parse_shard(value, expected):
+    assert parse_shard(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0/4", "5/4", "1/0", "1", "a/b", "1/2/3"])
+def test_parse_shard_rejects_invalid(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_shard(value)
+
+
+def test_shard_of_is_stable():
+    # 固定值：不同機器、不同 Python 版本與 PYTHONHASHSEED 都必須相同
+    assert shard_of("a.png", 4) == 3
+    assert shard_of("photos/2019/IMG_0001.jpg", 4) == 3
+    assert shard_of("photos/2019/IMG_0001.jpg", 7) == 5
+    assert shard_of("x/y/z.webp", 4) == 2
+    assert shard_of(os.path.join("x", "y", "z.webp"), 4) == 2
+
+
+def test_select_shard_partitions_inputs():
+    inputs = [(f"/in/{index}.png", f"{index}.png") for index in range(50)]
+    selected = [select_shard(inputs, (index, 3)) for index in range(1, 4)]
+    assert sorted(sum(selected, [])) == sorted(inputs)
+    assert all(selected)
+
+
+def test_resume_from_other_cwd_and_spelling(tmp_path, monkeypatch):
+    os.makedirs(str(tmp_path / "in"))
+    monkeypatch.chdir(str(tmp_path / "in"))
+    done = make_file("a.png")
+    failed = dict(make_file("b.png"), status="error", error="OSError: broken")
+    log_path = str(tmp_path / "shards" / "shard-1-of-1.jsonl")
+    log = CheckpointLog(log_path)
+    log.record(done)
+    log.record(failed)
+    log.close()
+
+    monkeypatch.chdir(str(tmp_path))
+    log = CheckpointLog(log_path)
+    assert log.is_done(os.path.join("in", "a.png"))
+    assert log.is_done(os.path.join(".", "in", "a.png"))
+    assert log.is_done(str(tmp_path / "in" / "a.png"))
+    # 失敗的檔案重試，變更過的檔案重新處理
+    assert not log.is_done(os.path.join("in", "b.png"))
+    make_file(os.path.join("in", "a.png"), b"changed image")
+    assert not log.is_done(os.path.join("in", "a.png"))
+    log.close()
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    entry = make_file(tmp_path / "a.png")
+    log_path = str(tmp_path / "shard-1-of-1.jsonl")
+    log = CheckpointLog(log_path)
+    log.record(entry)
+    log.close()
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write('{"path": "b.png", "sta')
+
+    log = CheckpointLog(log_path)
+    assert log.is_done(entry["path"]) and len(log.done) == 1
+    log.close()
+    with open(log_path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    # 不完整的行之後換行，新的 run 紀錄可以正常讀取
+    assert "run" in json.loads(lines[-1])
+
+
+def test_log_of_other_shard_is_rejected(tmp_path):
+    log_path = str(tmp_path / "shard-1-of-2.jsonl")
+    CheckpointLog(log_path, (1, 2)).close()
+    with pytest.raises(ValueError):
+        CheckpointLog(log_path, (2, 2))
+
+
+def test_merge_reports_missing_and_incomplete_shards(tmp_path):
+    directory = str(tmp_path / "shards")
+    entries = [make_file(tmp_path / f"{index}.png") for index in range(3)]
+    for index, entry in enumerate(entries, 1):
+        log = CheckpointLog(checkpoint_path(directory, (index, 4)), (index, 4))
+        log.record(entry)
+        if index != 2:
+            log.finish()
+        log.close()
+
+    paths = [checkpoint_path(directory, (index, 4)) for index in range(1, 4)]
+    rows, count, missing, incomplete = merge_logs(paths)
+    assert count == 4 and missing == [4] and incomplete == [2]
+    assert [row["path"] for row in rows] == sorted(os.path.abspath(e["path"]) for e in entries)
+    assert merge_main([directory]) == 1
+
+    # 重新執行中斷的分片並完成後，只剩缺少的分片
+    log = CheckpointLog(paths[1], (2, 4))
+    log.finish()
+    log.close()
+    assert merge_logs(paths)[2:] == ([4], [])
+
+
+def test_merge_uses_last_result_and_latest_run(tmp_path):
+    entry = make_file(tmp_path / "a.png")
+    log_path = str(tmp_path / "shard-1-of-1.jsonl")
+    log = CheckpointLog(log_path)
+    log.record(dict(entry, status="error", error="OSError: broken"))
+    log.finish()
+    log.close()
+    # 第二次執行被中斷：先前的完成標記不代表這次也完成
+    log = CheckpointLog(log_path)
+    log.record(entry)
+    log.close()
+
+    [row], count, missing, incomplete = merge_logs([log_path])
+    assert row["status"] == "ok" and row["shard"] == "1/1"
+    assert (count, missing, incomplete) == (1, [], [1])
+
+
+def test_batch_resume_and_merge(tmp_path, monkeypatch, capsys):
+    os.makedirs(str(tmp_path / "in"))
+    for index in range(4):
+        Image.fromarray(photo_like(64, 64, index)).save(str(tmp_path / "in" / f"{index}.png"))
+    shards = str(tmp_path / "shards")
+    monkeypatch.chdir(str(tmp_path))
+    assert batch_main(["in", "-j", "1", "-q", "--checkpoint-dir", shards]) == 0
+
+    # 從其他工作目錄、以不同寫法重新執行，所有檔案都已完成
+    monkeypatch.chdir(str(tmp_path / "in"))
+    capsys.readouterr()
+    assert batch_main([".", "-j", "1", "--checkpoint-dir", shards]) == 0
+    assert "略過 4" in capsys.readouterr().out
+    assert merge_main([shards]) == 0
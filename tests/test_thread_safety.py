@@ -0,0 +1,54 @@
+"""
+多個執行緒共用同一個 WatermarkRemover 的測試
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from conftest import add_watermark, photo_like
+
+
+def test_concurrent_first_use_loads_alpha_maps_once():
+    from remove_watermark import WatermarkRemover
+
+    for _ in range(5):
+        remover = WatermarkRemover()
+        loads = []
+        original = remover._load_alpha_maps
+
+        def counting_load():
+            loads.append(threading.get_ident())
+            original()
+
+        remover._load_alpha_maps = counting_load
+        barrier = threading.Barrier(8)
+
+        def first_use(index):
+            barrier.wait()
+            size = 48 if index % 2 else 96
+            return remover._get_alpha_norm(size).shape
+
+        with ThreadPoolExecutor(8) as executor:
+            shapes = list(executor.map(first_use, range(8)))
+        assert len(loads) == 1
+        assert sorted(set(shapes)) == [(48, 48), (96, 96)]
+
+
+def test_shared_remover_matches_serial(remover):
+    from remove_watermark import WatermarkRemover
+
+    arrays = []
+    for seed in range(8):
+        array = photo_like(800, 600, seed)
+        arrays.append(add_watermark(array, remover._get_alpha_map(48), 720, 520, 0.8))
+    expected = [array.copy() for array in arrays]
+    for array in expected:
+        remover.remove_watermark_array(array)
+
+    shared = WatermarkRemover()
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(shared.remove_watermark_array, arrays))
+    for array, reference in zip(arrays, expected):
+        assert np.array_equal(array, reference)
@@ -0,0 +1,84 @@
+"""
+監看模式掃描 spool 目錄的測試
+"""
+
+import os
+
+import pytest
+
+from watermark_watch import SpoolWatcher, build_parser
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def test_done_file_is_skipped_until_replaced(tmp_path):
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    path = str(spool / "x.png")
+    write(path, b"first")
+    watcher = SpoolWatcher(str(spool), str(tmp_path / "out"), jobs=1)
+
+    stat = os.stat(path)
+    watcher.done[path] = (stat.st_size, stat.st_mtime_ns)
+    watcher._scan_directory(0.0)
+    assert path not in watcher.pending
+
+    # 以 rename 原子替換為內容不同的同名檔案
+    tmp = str(spool / ".x.png.part")
+    write(tmp, b"second version")
+    os.replace(tmp, path)
+    watcher._scan_directory(1.0)
+    assert path in watcher.pending
+    assert path not in watcher.done
+
+
+class Finished:
+    """已完成的 AsyncResult"""
+
+    def __init__(self, result):
+        self.result = result
+
+    def ready(self):
+        return True
+
+    def get(self):
+        return self.result
+
+
+def test_failed_file_is_retried_only_after_change(tmp_path, capsys):
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    path = str(spool / "x.png")
+    write(path, b"broken")
+    watcher = SpoolWatcher(str(spool), str(tmp_path / "out"), jobs=1, remove_source=True)
+    watcher._scan_directory(0.0)
+    watcher.pending.pop(path)
+
+    stat = os.stat(path)
+    watcher.in_flight[path] = (Finished({
+        "path": path, "status": "error", "error": "OSError: broken",
+        "bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+    }), 0.0)
+    watcher._collect(1.0)
+    assert watcher.counts["error"] == 1 and path not in watcher.tracked
+
+    # 其他檔案造成目錄變動時不重試
+    write(str(spool / "y.png"), b"other")
+    watcher._scan_directory(5.0)
+    assert path not in watcher.pending and str(spool / "y.png") in watcher.pending
+
+    tmp = str(spool / ".x.png.part")
+    write(tmp, b"fixed image")
+    os.replace(tmp, path)
+    watcher._scan_directory(10.0)
+    assert path in watcher.pending
+
+
+def test_jobs_must_be_positive(capsys):
+    for value in ("0", "-1"):
+        with pytest.raises(SystemExit):
+            build_parser().parse_args(["spool", "-o", "out", "-j", value])
+    assert build_parser().parse_args(["spool", "-o", "out", "-j", "2"]).jobs == 2
@@ -35,6 +35,12 @@ else
 	echo -e "${YELLOW}○${NC} 快速動作不存在，無需移除"
 fi
 
+# 停止常駐服務（若正在執行）
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+if command -v python3 &>/dev/null && [ -f "$SCRIPT_DIR/watermark_daemon.py" ]; then
+	python3 "$SCRIPT_DIR/watermark_daemon.py" stop >/dev/null 2>&1 || true
+fi
+
 # 更新服務註冊
 /System/Library/CoreServices/pbs -update
 echo -e "${GREEN}✓${NC} 已更新服務註冊"
@@ -0,0 +1,185 @@
+"""
+KillWatermark asyncio 介面
+供 asyncio 服務（例如接收上傳圖片的 HTTP 服務）使用：實際運算交給執行緒或行程池，
+以 semaphore 限制同時處理的圖片數，每張圖片可個別取消或設定逾時。
+
+使用方式：
+    async with AsyncWatermarkRemover(max_workers=4) as remover:
+        output, detection = await remover.process_bytes(data, timeout=10)
+
+        async for result in remover.process_many(items):
+            ...
+"""
+
+import os
+import asyncio
+import threading
+import concurrent.futures
+
+from watermark_batch import process_file
+
+# 每個執行緒／工作行程各自的 WatermarkRemover（由 _init_worker 建立）
+_local = threading.local()
+
+
+def _init_worker(remover_options: dict = None):
+    """執行緒或工作行程初始化：建立並預熱 WatermarkRemover"""
+    from remove_watermark import WatermarkRemover
+
+    _local.remover = WatermarkRemover(**(remover_options or {}))
+    _local.remover._get_alpha_map(48)
+
+
+def _remove_bytes(data: bytes, format: str = None) -> tuple:
+    return _local.remover.remove_watermark_bytes(data, format)
+
+
+def _remove_file(path: str, output_path: str = None) -> dict:
+    return process_file(_local.remover, path, output_path)
+
+
+class AsyncWatermarkRemover:
+    """
+    asyncio 版本的浮水印移除器
+    執行緒與行程池使用同一個初始化函式，每個執行緒／工作行程各自保留一個 WatermarkRemover；
+    WatermarkRemover 本身也可在執行緒間共用（見其說明），這裡分開建立只是為了與行程池一致
+    """
+
+    def __init__(self, max_workers: int = None, executor: str = "thread",
+                 max_in_flight: int = None, timeout: float = None,
+                 remover_options: dict = None):
+        """
+        Args:
+            max_workers: 執行緒或工作行程數，預設為 CPU 核心數
+            executor: "thread"（NumPy/Pillow 運算時會釋放 GIL）或 "process"
+            max_in_flight: 同時送進執行緒／行程池的圖片數上限，預設為 max_workers 的 2 倍
+            timeout: 每張圖片的預設逾時秒數，None 表示不限制
+            remover_options: 建立 WatermarkRemover 的參數
+        """
+        if executor not in ("thread", "process"):
+            raise ValueError(f"未知的 executor: {executor}")
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or self.max_workers * 2
+        self.timeout = timeout
+        if executor == "thread":
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                self.max_workers, initializer=_init_worker, initargs=(remover_options,)
+            )
+        else:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                self.max_workers, initializer=_init_worker, initargs=(remover_options,)
+            )
+        # semaphore 需在事件迴圈中建立（Python 3.8 會綁定建立時的迴圈）
+        self._semaphore = None
+        self._futures = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """取消尚未開始的工作並關閉執行緒／行程池（不等待進行中的工作）"""
+        for future in list(self._futures):
+            future.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def _submit(self, func, *args, timeout: float = None):
+        """
+        送出一個工作並等待結果
+        取消或逾時時會取消尚未開始的工作；已開始的工作無法中斷，
+        但直到它真正結束前仍佔用一個名額，讓同時運算的圖片數不超過上限
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        await self._semaphore.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        self._futures.add(future)
+
+        def on_done(done_future):
+            self._futures.discard(done_future)
+            try:
+                loop.call_soon_threadsafe(self._semaphore.release)
+            except RuntimeError:
+                # 事件迴圈已關閉
+                pass
+
+        future.add_done_callback(on_done)
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            future.cancel()
+            raise
+
+    async def process_bytes(self, data: bytes, format: str = None,
+                            timeout: float = None) -> tuple:
+        """
+        移除記憶體中圖片的浮水印（見 WatermarkRemover.remove_watermark_bytes）
+
+        Returns:
+            (輸出內容, 偵測結果)；未偵測到浮水印時回傳 (原內容, None)
+
+        Raises:
+            asyncio.TimeoutError: 超過逾時秒數
+        """
+        return await self._submit(_remove_bytes, data, format, timeout=timeout)
+
+    async def process_file(self, path: str, output_path: str = None,
+                           timeout: float = None) -> dict:
+        """
+        處理單一檔案
+
+        Returns:
+            與批次模式相同的結果 {"path", "status", "output"/"error", "elapsed", ...}
+        """
+        return await self._submit(_remove_file, path, output_path, timeout=timeout)
+
+    async def process_many(self, items, format: str = None, timeout: float = None):
+        """
+        大量送出圖片，依完成順序逐一產生結果
+        只會預先讀取有限數量的項目，呼叫端可傳入產生器以限制記憶體用量
+
+        Args:
+            items: (識別鍵, 圖片內容) 的可迭代物件
+
+        Yields:
+            {"key", "status", "data", "detection"} 或 {"key", "status": "error", "error"}，
+            status 為 ok / no_watermark / error（逾時也視為 error）
+        """
+
+        async def run(key, data: bytes) -> dict:
+            try:
+                output, detection = await self.process_bytes(data, format, timeout)
+            except asyncio.TimeoutError:
+                return {"key": key, "status": "error", "error": "逾時"}
+            except Exception as e:
+                return {"key": key, "status": "error", "error": f"{type(e).__name__}: {e}"}
+            status = "no_watermark" if detection is None else "ok"
+            return {"key": key, "status": status, "data": output, "detection": detection}
+
+        iterator = iter(items)
+        pending = set()
+        try:
+            while True:
+                # 排隊中的工作也只保留有限數量，避免一次讀入所有圖片
+                for key, data in iterator:
+                    pending.add(asyncio.ensure_future(run(key, data)))
+                    if len(pending) >= self.max_in_flight * 2:
+                        break
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+KillWatermark 批次處理
+接受多個檔案、目錄（可遞迴）與 glob 樣式，分派到行程池平行處理，
+每個工作行程各自保留一個 WatermarkRemover。
+
+使用方式：
+    python3 remove_watermark.py batch <路徑/目錄/glob> [...] [-r] [-j 行程數] [-o 輸出目錄]
+                                      [--manifest 紀錄檔] [--executor pipeline]
+                                      [--shard i/n] [--checkpoint-dir 目錄]
+"""
+
+import sys
+import os
+import glob
+import time
+import argparse
+import multiprocessing
+
+from watermark_manifest import Manifest, file_digest
+from watermark_metrics import Metrics
+from watermark_shard import CheckpointLog, checkpoint_path, parse_shard, select_shard
+
+# 批次模式會處理的圖片副檔名
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff", ".gif")
+
+# 已處理過的輸出檔名後綴
+OUTPUT_SUFFIX = "_no_watermark"
+
+# 各工作行程的 WatermarkRemover 與唯讀處理紀錄（由 _init_worker 建立）
+_worker_remover = None
+_worker_manifest = None
+
+
+def _is_image(path: str) -> bool:
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _is_candidate(path: str) -> bool:
+    """展開目錄與 glob 時只收圖片，並排除先前產生的 _no_watermark 輸出檔"""
+    base = os.path.splitext(os.path.basename(path))[0]
+    return _is_image(path) and not base.endswith(OUTPUT_SUFFIX)
+
+
+def collect_inputs(patterns: list, recursive: bool = False) -> list:
+    """
+    展開輸入：檔案、目錄與 glob 樣式
+
+    Returns:
+        (檔案路徑, 相對路徑) 清單，依輸入順序排列且不重複；
+        相對路徑用於輸出目錄下重建目錄結構
+    """
+    seen = set()
+    results = []
+
+    def add(path: str, rel_path: str):
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            results.append((path, rel_path))
+
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            if recursive:
+                for root, dirs, files in os.walk(pattern):
+                    dirs.sort()
+                    for name in sorted(files):
+                        if _is_candidate(name):
+                            path = os.path.join(root, name)
+                            add(path, os.path.relpath(path, pattern))
+            else:
+                for name in sorted(os.listdir(pattern)):
+                    path = os.path.join(pattern, name)
+                    if _is_candidate(name) and os.path.isfile(path):
+                        add(path, name)
+        elif os.path.isfile(pattern):
+            add(pattern, os.path.basename(pattern))
+        else:
+            # 相對於樣式中不含萬用字元的前綴目錄，'a/*/x.png' 的結果保留子目錄名稱
+            base = _glob_base(pattern)
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path) and _is_candidate(path):
+                    add(path, os.path.relpath(path, base))
+    return results
+
+
+def _glob_base(pattern: str) -> str:
+    """glob 樣式中第一個含萬用字元的部分之前的目錄"""
+    parts = []
+    for part in pattern.replace(os.sep, "/").split("/")[:-1]:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    if parts == [""]:
+        return os.sep
+    return os.sep.join(parts) or os.curdir
+
+
+def find_output_conflicts(inputs: list, output_dir: str = None) -> dict:
+    """
+    找出會寫到同一個輸出路徑的輸入檔案（例如不同目錄下同名的檔案）
+
+    Returns:
+        {輸出路徑: [輸入路徑, ...]}，只包含有衝突的輸出路徑
+    """
+    if output_dir is None:
+        # 輸出寫在原檔旁，不會與其他輸入衝突
+        return {}
+    outputs = {}
+    for path, rel_path in inputs:
+        output_path = get_output_path(rel_path, output_dir)
+        key = os.path.normcase(os.path.abspath(output_path))
+        outputs.setdefault(key, (output_path, []))[1].append(path)
+    return {output_path: paths for output_path, paths in outputs.values() if len(paths) > 1}
+
+
+def get_output_path(rel_path: str, output_dir: str = None):
+    """決定輸出路徑；未指定輸出目錄時回傳 None（沿用原檔旁的 _no_watermark 命名）"""
+    if output_dir is None:
+        return None
+    base, ext = os.path.splitext(rel_path)
+    return os.path.join(output_dir, f"{base}{OUTPUT_SUFFIX}{ext}")
+
+
+def process_file(remover, path: str, output_path: str = None, manifest=None) -> dict:
+    """
+    處理單一檔案並回傳結果
+    若提供處理紀錄，會先計算內容雜湊，內容相同的檔案已處理過時直接沿用結果
+
+    Returns:
+        {"path", "status", "output"/"error", "elapsed", "bytes", "mtime_ns"}，
+        status 為 ok / no_watermark / error；有處理紀錄時另含 content_hash，
+        沿用既有結果時 cached 為 True；remover 啟用量測時另含該檔案的 metrics
+    """
+    start = time.perf_counter()
+    result = {"path": path}
+    if remover.metrics is not None:
+        remover.metrics.last_record = None
+    try:
+        stat = os.stat(path)
+        result["bytes"] = stat.st_size
+        result["mtime_ns"] = stat.st_mtime_ns
+        if manifest is not None:
+            result["content_hash"] = file_digest(path)
+            cached = manifest.lookup_hash(result["content_hash"], stat.st_size, output_path)
+            if cached is not None:
+                result.update(cached, cached=True)
+                result["elapsed"] = time.perf_counter() - start
+                return result
+        if output_path is not None:
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        # 批次模式由主行程統一輸出進度，不輸出 remove_watermark 的訊息
+        output = remover.remove_watermark(path, output_path, verbose=False)
+        if output == path:
+            result["status"] = "no_watermark"
+        else:
+            result["status"] = "ok"
+            result["output"] = output
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    if remover.metrics is not None and remover.metrics.last_record is not None:
+        result["metrics"] = remover.metrics.last_record
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def _init_worker(manifest_path: str = None, remover_options: dict = None,
+                 collect_metrics: bool = False):
+    """工作行程初始化：建立並預熱 WatermarkRemover，並以唯讀模式開啟處理紀錄"""
+    global _worker_remover, _worker_manifest
+    from remove_watermark import WatermarkRemover
+
+    _worker_remover = WatermarkRemover(
+        **(remover_options or {}), metrics=Metrics() if collect_metrics else None
+    )
+    _worker_remover._get_alpha_map(48)
+    if manifest_path is not None:
+        _worker_manifest = Manifest(manifest_path, read_only=True, options=remover_options)
+
+
+def _run_task(task: tuple) -> dict:
+    path, output_path = task
+    return process_file(_worker_remover, path, output_path, _worker_manifest)
+
+
+def run_batch(tasks: list, jobs: int = None, manifest_path: str = None,
+              remover_options: dict = None, collect_metrics: bool = False):
+    """
+    以行程池平行處理 (輸入路徑, 輸出路徑) 清單，依完成順序回傳結果
+
+    Args:
+        tasks: (輸入路徑, 輸出路徑或 None) 清單
+        jobs: 工作行程數，預設為 CPU 核心數；1 表示在目前行程中處理
+        manifest_path: 處理紀錄檔路徑（需已建立），工作行程用來查詢內容雜湊
+        remover_options: 建立 WatermarkRemover 的參數（見 remover_options_from_args）
+        collect_metrics: 是否量測各階段耗時（結果放在每個檔案的 metrics 欄位）
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(tasks) <= 1:
+        _init_worker(manifest_path, remover_options, collect_metrics)
+        for task in tasks:
+            yield _run_task(task)
+        return
+
+    jobs = min(jobs, len(tasks))
+    # 每個工作行程一次領取多個檔案，降低大量小檔案時的分派成本
+    chunksize = max(1, min(16, len(tasks) // (jobs * 8)))
+    with multiprocessing.Pool(
+        jobs, initializer=_init_worker, initargs=(manifest_path, remover_options, collect_metrics)
+    ) as pool:
+        yield from pool.imap_unordered(_run_task, tasks, chunksize=chunksize)
+
+
+def print_result(result: dict):
+    """輸出單一檔案的處理狀態"""
+    elapsed_ms = result["elapsed"] * 1000
+    if result["status"] == "ok":
+        print(f"✓ {result['path']} -> {result['output']} ({elapsed_ms:.0f} ms)")
+    elif result["status"] == "no_watermark":
+        print(f"○ {result['path']}（未偵測到浮水印，{elapsed_ms:.0f} ms）")
+    else:
+        print(f"✗ {result['path']}: {result['error']}")
+
+
+def print_summary(counts: dict, total_bytes: int, elapsed: float):
+    """輸出處理摘要與吞吐量"""
+    total = sum(counts.values())
+    rate = total / elapsed if elapsed > 0 else 0.0
+    mb_rate = total_bytes / elapsed / (1024 * 1024) if elapsed > 0 else 0.0
+    print(
+        f"完成 {total} 個檔案：移除 {counts['ok']}、"
+        f"無浮水印 {counts['no_watermark']}、失敗 {counts['error']}、"
+        f"略過 {counts['skipped']}"
+    )
+    print(f"耗時 {elapsed:.2f} 秒，{rate:.1f} 檔案/秒，{mb_rate:.1f} MB/秒")
+
+
+def _jpeg_quality(value: str):
+    if value == "keep":
+        return value
+    quality = int(value)
+    if not 1 <= quality <= 100:
+        raise argparse.ArgumentTypeError("JPEG 品質必須介於 1 到 100，或為 keep")
+    return quality
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("必須是正整數")
+    return number
+
+
+def add_remover_arguments(parser: argparse.ArgumentParser):
+    """加入偵測與輸出編碼相關參數（批次與監看模式共用）"""
+    from remove_watermark import ENCODE_PROFILES, DEFAULT_ENCODE_PROFILE, DEFAULT_JPEG_QUALITY
+
+    parser.add_argument(
+        "--profile", choices=sorted(ENCODE_PROFILES), default=DEFAULT_ENCODE_PROFILE,
+        help=f"輸出編碼設定（預設 {DEFAULT_ENCODE_PROFILE}）",
+    )
+    parser.add_argument(
+        "--jpeg-quality", type=_jpeg_quality, default=DEFAULT_JPEG_QUALITY,
+        help=f"JPEG 品質 1-100，keep 表示沿用來源的量化表（預設 {DEFAULT_JPEG_QUALITY}）",
+    )
+    parser.add_argument(
+        "--jpeg-subsampling", choices=["4:4:4", "4:2:2", "4:2:0", "keep"], default=None,
+        help="JPEG 色度抽樣，keep 表示沿用來源設定",
+    )
+    parser.add_argument(
+        "--frame-jobs", type=_positive_int, default=None, metavar="N",
+        help="動態圖片與多頁 TIFF 平行處理影格的執行緒數（預設為 CPU 核心數，最多 4）",
+    )
+    add_detect_arguments(parser)
+
+
+def add_detect_arguments(parser: argparse.ArgumentParser):
+    """加入偵測相關參數（批次、監看與掃描模式共用）"""
+    parser.add_argument(
+        "--search", action="store_true",
+        help="固定位置未偵測到浮水印時，在右下角範圍內搜尋（適用於裁切、補邊或縮放過的圖片）",
+    )
+    parser.add_argument(
+        "--logo-size", type=int, default=None, metavar="PX",
+        help="指定 logo 尺寸（圖片縮放過時使用，邊距依比例縮放）",
+    )
+
+
+def detect_options_from_args(args) -> dict:
+    """將偵測相關的命令列參數轉為建立 WatermarkRemover 的參數"""
+    return {"search": args.search, "logo_size": args.logo_size}
+
+
+def remover_options_from_args(args) -> dict:
+    """將命令列參數轉為建立 WatermarkRemover 的參數"""
+    return {
+        "encode_profile": args.profile,
+        "jpeg_quality": args.jpeg_quality,
+        "jpeg_subsampling": args.jpeg_subsampling,
+        "frame_jobs": args.frame_jobs,
+        **detect_options_from_args(args),
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="remove_watermark.py batch",
+        description="批次移除多個檔案、目錄或 glob 樣式中的浮水印",
+    )
+    parser.add_argument("inputs", nargs="+", help="圖片路徑、目錄或 glob 樣式")
+    parser.add_argument("-r", "--recursive", action="store_true", help="遞迴處理子目錄")
+    parser.add_argument(
+        "-j", "--jobs", type=_positive_int, default=None,
+        help="工作行程數，pipeline 模式為運算執行緒數（預設為 CPU 核心數）",
+    )
+    parser.add_argument(
+        "-o", "--output-dir", default=None, help="輸出目錄（預設寫在原檔旁）"
+    )
+    parser.add_argument(
+        "--executor", choices=["process", "pipeline"], default="process",
+        help="process: 行程池（預設）；pipeline: 單一行程內的讀取/運算/寫入執行緒管線",
+    )
+    parser.add_argument(
+        "--readers", type=_positive_int, default=2, metavar="N", help="pipeline 模式的讀取與解碼執行緒數（預設 2）"
+    )
+    parser.add_argument(
+        "--writers", type=_positive_int, default=2, metavar="N", help="pipeline 模式的編碼與寫入執行緒數（預設 2）"
+    )
+    parser.add_argument("-q", "--quiet", action="store_true", help="只輸出失敗的檔案與摘要")
+    parser.add_argument(
+        "--manifest", default=None, help="處理紀錄檔（SQLite），略過已處理且未變更的檔案"
+    )
+    parser.add_argument(
+        "--manifest-max-age", type=float, default=None, metavar="DAYS",
+        help="執行後刪除超過指定天數都沒有處理或略過的紀錄",
+    )
+    parser.add_argument(
+        "--manifest-max-entries", type=int, default=None, metavar="N",
+        help="執行後只保留最近處理或略過的 N 筆紀錄",
+    )
+    parser.add_argument(
+        "--shard", type=parse_shard, default=None, metavar="I/N",
+        help="只處理第 I 個分片（共 N 個，依相對路徑的雜湊分配，I 從 1 開始）",
+    )
+    parser.add_argument(
+        "--checkpoint-dir", default=None, metavar="DIR",
+        help="將完成的檔案附加到此目錄下的分片檢查點紀錄，重新執行時略過已完成的檔案",
+    )
+    parser.add_argument(
+        "--timings", action="store_true",
+        help="結束時輸出各階段（decode/detect/remove/encode/write/sips）的耗時摘要",
+    )
+    parser.add_argument(
+        "--metrics-json", default=None, metavar="FILE", help="將各階段量測結果寫入 JSON 檔"
+    )
+    add_remover_arguments(parser)
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """批次模式主程式，有檔案失敗時回傳 1"""
+    args = build_parser().parse_args(argv)
+
+    inputs = collect_inputs(args.inputs, args.recursive)
+    if not inputs:
+        print("錯誤: 找不到任何圖片檔案")
+        return 1
+    # 在分片之前檢查，不同分片的檔案也不能寫到同一個輸出檔
+    conflicts = find_output_conflicts(inputs, args.output_dir)
+    if conflicts:
+        print("錯誤: 多個輸入檔案會寫到同一個輸出檔:")
+        for output_path, paths in conflicts.items():
+            print(f"  {output_path} <- {', '.join(paths)}")
+        return 1
+    manifest = None
+    if args.manifest:
+        manifest = Manifest(args.manifest, options=remover_options_from_args(args))
+        # 在分片與檢查點之前更新，本次未處理的輸入檔案的紀錄也不會被清理
+        manifest.touch(path for path, _ in inputs)
+        manifest.commit()
+    if args.shard is not None:
+        total = len(inputs)
+        inputs = select_shard(inputs, args.shard)
+        print(f"分片 {args.shard[0]}/{args.shard[1]}：{len(inputs)}/{total} 個檔案")
+
+    checkpoint = None
+    if args.checkpoint_dir:
+        try:
+            checkpoint = CheckpointLog(
+                checkpoint_path(args.checkpoint_dir, args.shard), args.shard
+            )
+        except (OSError, ValueError) as e:
+            print(f"錯誤: {e}")
+            if manifest is not None:
+                manifest.close()
+            return 1
+
+    metrics = Metrics() if args.timings or args.metrics_json else None
+    counts = {"ok": 0, "no_watermark": 0, "error": 0, "skipped": 0}
+    total_bytes = 0
+    start = time.perf_counter()
+
+    # 未變更的檔案只需 stat 即可略過，不讀取也不解碼
+    tasks = []
+    for path, rel_path in inputs:
+        if checkpoint is not None and checkpoint.is_done(path):
+            counts["skipped"] += 1
+            continue
+        output_path = get_output_path(rel_path, args.output_dir)
+        if manifest is not None and manifest.lookup(path, output_path) is not None:
+            counts["skipped"] += 1
+            continue
+        tasks.append((path, output_path))
+
+    if args.executor == "pipeline":
+        from watermark_pipeline import run_pipeline
+
+        results = run_pipeline(
+            tasks, args.manifest, remover_options_from_args(args),
+            collect_metrics=metrics is not None,
+            readers=args.readers, workers=args.jobs, writers=args.writers,
+        )
+    else:
+        results = run_batch(
+            tasks, args.jobs, args.manifest, remover_options_from_args(args),
+            collect_metrics=metrics is not None,
+        )
+    try:
+        for index, result in enumerate(results, 1):
+            if metrics is not None and "metrics" in result:
+                metrics.add(result["metrics"])
+            if result.get("cached"):
+                counts["skipped"] += 1
+            else:
+                counts[result["status"]] += 1
+                total_bytes += result.get("bytes", 0)
+                if not args.quiet or result["status"] == "error":
+                    print_result(result)
+            if checkpoint is not None:
+                checkpoint.record(result)
+            if manifest is not None:
+                manifest.record(result)
+                if index % 100 == 0:
+                    manifest.commit()
+        if checkpoint is not None:
+            checkpoint.finish()
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        if manifest is not None:
+            manifest.commit()
+    print_summary(counts, total_bytes, time.perf_counter() - start)
+    if metrics is not None:
+        if args.timings:
+            metrics.print_summary()
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+
+    if manifest is not None:
+        if args.manifest_max_age is not None or args.manifest_max_entries is not None:
+            removed = manifest.prune(args.manifest_max_age, args.manifest_max_entries)
+            print(f"已清理 {removed} 筆處理紀錄")
+        manifest.close()
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+"""
+KillWatermark 效能量測
+
+使用方式：
+    python3 remove_watermark.py bench encode <樣本路徑/目錄/glob> [...] [--repeat N]
+    python3 remove_watermark.py bench detect <樣本路徑/目錄/glob> [...] [--repeat N]
+    python3 remove_watermark.py bench suite [--sizes 512,1k,2k,4k,8k] [--baseline 基準.json]
+    python3 remove_watermark.py bench startup [--repeat N]
+"""
+
+import sys
+import os
+import json
+import time
+import subprocess
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+from io import BytesIO
+
+from watermark_batch import collect_inputs, add_remover_arguments, remover_options_from_args
+
+# 合成樣本的尺寸（512px 到 8K）
+SUITE_SIZES = {
+    "512": (512, 512),
+    "1k": (1024, 1024),
+    "2k": (2048, 2048),
+    "4k": (3840, 2160),
+    "8k": (7680, 4320),
+}
+SUITE_BACKGROUNDS = ("random", "photo")
+SUITE_FORMATS = (("png", "PNG"), ("jpg", "JPEG"))
+SUITE_STAGES = ("decode", "detect", "remove", "encode", "end_to_end")
+# 各階段總耗時的差異低於此秒數時視為量測雜訊，不判定為效能退化
+REGRESSION_FLOOR = 0.005
+# 基準結果格式版本（各階段改以最小值記錄後為 2，加入各樣本的偵測結果後為 3）
+BASELINE_VERSION = 3
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 啟動時間量測情境：(名稱, python 參數)
+STARTUP_SCENARIOS = (
+    ("usage", [os.path.join(_BASE_DIR, "remove_watermark.py")]),
+    ("missing_file", [os.path.join(_BASE_DIR, "remove_watermark.py"), "/nonexistent/kw.png"]),
+    ("batch_help", [os.path.join(_BASE_DIR, "remove_watermark.py"), "batch", "--help"]),
+    ("daemon_usage", [os.path.join(_BASE_DIR, "watermark_daemon.py")]),
+    ("remover_ready", [
+        "-c",
+        "import remove_watermark as m; m.WatermarkRemover()._get_alpha_norm(48)",
+    ]),
+)
+
+
+def _median_time(func, repeat: int) -> float:
+    """重複執行並回傳耗時中位數（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def _min_time(func, repeat: int) -> float:
+    """
+    重複執行並回傳最短耗時（秒）
+    排程、快取與頻率調整等雜訊只會讓單次耗時變長，最短耗時最接近程式本身的成本
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_encode(paths: list, repeat: int = 3, jpeg_qualities: list = None) -> list:
+    """
+    量測各編碼設定的編碼時間與輸出大小
+    每個樣本只解碼一次，再以與 remove_watermark 相同的儲存流程編碼到記憶體；
+    JPEG 樣本另外比較各個 JPEG 品質
+
+    Returns:
+        每個 (格式, 設定, JPEG 品質) 一筆
+        {"format", "profile", "jpeg_quality", "seconds", "bytes", "megapixels"}
+    """
+    from PIL import Image
+    from remove_watermark import ENCODE_PROFILES, DEFAULT_JPEG_QUALITY, WatermarkRemover
+
+    jpeg_qualities = jpeg_qualities or [DEFAULT_JPEG_QUALITY]
+    totals = {}
+
+    for path in paths:
+        image = Image.open(path)
+        image.load()
+        info = image.info.copy()
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+
+        output_format = WatermarkRemover()._get_output_format(path) or image.format or "PNG"
+        qualities = jpeg_qualities if output_format == "JPEG" else [None]
+        for profile in ENCODE_PROFILES:
+            for quality in qualities:
+                remover = WatermarkRemover(
+                    encode_profile=profile, jpeg_quality=quality or DEFAULT_JPEG_QUALITY
+                )
+
+                def encode():
+                    buffer = BytesIO()
+                    remover._save_image(image, buffer, output_format, info)
+                    return buffer
+
+                seconds = _median_time(encode, repeat)
+                total = totals.setdefault(
+                    (output_format, profile, quality),
+                    {"seconds": 0.0, "bytes": 0, "megapixels": 0.0},
+                )
+                total["seconds"] += seconds
+                total["bytes"] += encode().getbuffer().nbytes
+                total["megapixels"] += image.width * image.height / 1e6
+
+    return [
+        {"format": fmt, "profile": profile, "jpeg_quality": quality, **total}
+        for (fmt, profile, quality), total in totals.items()
+    ]
+
+
+def print_encode_report(rows: list):
+    """輸出編碼量測結果表格，相對大小以同格式中最小的設定為基準"""
+    smallest = {}
+    for row in rows:
+        smallest[row["format"]] = min(smallest.get(row["format"], row["bytes"]), row["bytes"])
+    print(
+        f"{'格式':<6}{'設定':<10}{'JPEG 品質':>10}{'編碼時間':>12}"
+        f"{'MP/秒':>10}{'輸出大小':>14}{'相對大小':>10}"
+    )
+    for row in rows:
+        rate = row["megapixels"] / row["seconds"] if row["seconds"] > 0 else 0.0
+        quality = "-" if row["jpeg_quality"] is None else str(row["jpeg_quality"])
+        print(
+            f"{row['format']:<6}{row['profile']:<10}{quality:>10}"
+            f"{row['seconds'] * 1000:>10.1f}ms{rate:>10.1f}"
+            f"{row['bytes'] / 1024:>12.1f}KB"
+            f"{row['bytes'] / (smallest[row['format']] or 1):>10.2f}"
+        )
+
+
+def _percentile(values: list, percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_detect(paths: list, repeat: int = 5) -> dict:
+    """
+    量測每張圖片的偵測延遲（不含解碼）
+    分別量測只有亮度特徵判斷，以及加上候選搜尋的完整偵測
+
+    Returns:
+        {"heuristic": [秒...], "full": [秒...], "detected": 偵測到的張數}
+    """
+    from PIL import Image
+    from remove_watermark import WatermarkRemover
+
+    remover = WatermarkRemover()
+    for size in (48, 96):
+        remover._get_alpha_norm(size)
+
+    timings = {"heuristic": [], "full": [], "detected": 0}
+    for path in paths:
+        image = Image.open(path)
+        image.load()
+        width, height = image.size
+        config = remover._detect_watermark_config(width, height)
+        position = remover._calculate_watermark_position(width, height, config)
+        if position["x"] < 0 or position["y"] < 0:
+            continue
+        alpha_map = remover._get_alpha_map(config["logo_size"])
+
+        def heuristic():
+            patch = remover._crop_patch(
+                image, position["x"], position["y"], config["logo_size"]
+            )
+            return remover._is_watermark_present(patch, alpha_map)
+
+        timings["heuristic"].append(_median_time(heuristic, repeat))
+        timings["full"].append(_median_time(lambda: remover._detect_watermark(image), repeat))
+        if remover._detect_watermark(image) is not None:
+            timings["detected"] += 1
+    return timings
+
+
+def print_detect_report(timings: dict):
+    """輸出偵測延遲統計"""
+    count = len(timings["full"])
+    print(f"量測 {count} 張圖片，偵測到浮水印 {timings['detected']} 張")
+    if not count:
+        return
+    print(f"{'模式':<14}{'平均':>10}{'p50':>10}{'p95':>10}")
+    for name, label in (("heuristic", "亮度特徵"), ("full", "完整偵測")):
+        values = timings[name]
+        print(
+            f"{label:<14}{statistics.mean(values) * 1000:>8.3f}ms"
+            f"{_percentile(values, 50) * 1000:>8.3f}ms"
+            f"{_percentile(values, 95) * 1000:>8.3f}ms"
+        )
+    ratio = statistics.mean(timings["full"]) / statistics.mean(timings["heuristic"])
+    print(f"完整偵測 / 亮度特徵: {ratio:.2f} 倍")
+
+
+def _synthetic_background(kind: str, width: int, height: int, rng):
+    """
+    產生合成背景
+    random 為均勻雜訊（最難壓縮），photo 為低頻色塊加上輕微雜訊（近似照片）
+    """
+    import numpy as np
+    from PIL import Image
+
+    if kind == "random":
+        return rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    small = rng.integers(0, 256, (max(2, height // 64), max(2, width // 64), 3), dtype=np.uint8)
+    smooth = np.asarray(Image.fromarray(small).resize((width, height), Image.BICUBIC))
+    noise = rng.normal(0, 3, (height, width, 3)).astype(np.float32)
+    return np.clip(smooth + noise, 0, 255).astype(np.uint8)
+
+
+def build_corpus(corpus_dir: str, sizes: list, seed: int = 0) -> list:
+    """
+    建立合成樣本：將 48/96 logo 依 JS 版本的位置正向混合到背景上，並包含沒有 logo 的負樣本
+    已存在的樣本直接沿用；相同的 seed 產生相同的樣本
+
+    Returns:
+        [{"name", "path", "format", "watermarked"}]
+    """
+    import numpy as np
+    from PIL import Image
+    from remove_watermark import WatermarkRemover
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    remover = WatermarkRemover()
+    cases = []
+    for label in sizes:
+        width, height = SUITE_SIZES[label]
+        for kind in SUITE_BACKGROUNDS:
+            rng = np.random.default_rng([seed, width, height, SUITE_BACKGROUNDS.index(kind)])
+            for watermarked in (True, False):
+                for ext, output_format in SUITE_FORMATS:
+                    name = f"{label}-{kind}-{'wm' if watermarked else 'neg'}.{ext}"
+                    path = os.path.join(corpus_dir, name)
+                    cases.append({
+                        "name": name, "path": path,
+                        "format": output_format, "watermarked": watermarked,
+                    })
+                    if os.path.exists(path):
+                        continue
+
+                    pixels = _synthetic_background(kind, width, height, rng)
+                    if watermarked:
+                        config = remover._detect_watermark_config(width, height)
+                        position = remover._calculate_watermark_position(width, height, config)
+                        x, y, size = position["x"], position["y"], config["logo_size"]
+                        alpha = remover._get_alpha_map(size)[..., None]
+                        patch = pixels[y:y + size, x:x + size].astype(np.float32)
+                        pixels[y:y + size, x:x + size] = patch * (1 - alpha) + 255 * alpha
+
+                    tmp_path = os.path.join(corpus_dir, f".{name}.tmp")
+                    save_args = {"compress_level": 1} if output_format == "PNG" else {"quality": 95}
+                    Image.fromarray(pixels).save(tmp_path, output_format, **save_args)
+                    os.replace(tmp_path, path)
+    return cases
+
+
+def bench_suite(cases: list, repeat: int = 5, remover_options: dict = None) -> dict:
+    """
+    量測每個樣本各階段的最短耗時
+    decode、detect（_detect_watermark_position）、remove（_remove_watermark_from_region，
+    只量測偵測到的樣本）、encode 與 end_to_end（remove_watermark_bytes）；
+    另以 tracemalloc 量測 end_to_end 的 Python/NumPy 記憶體峰值（不含 Pillow 內部緩衝區）
+
+    Returns:
+        {樣本名稱: {"megapixels", "bytes", "detected", "detection", "peak_bytes", "stages": {階段: 秒}}}，
+        detection 為偵測到的 [x, y, size]，未偵測到時為 None
+    """
+    from PIL import Image
+    from remove_watermark import WatermarkRemover
+
+    remover = WatermarkRemover(**(remover_options or {}))
+    for size in (48, 96):
+        remover._get_alpha_norm(size)
+
+    results = {}
+    for case in cases:
+        with open(case["path"], "rb") as f:
+            data = f.read()
+
+        def decode():
+            image = Image.open(BytesIO(data))
+            image.load()
+            return image
+
+        image = decode()
+        info = image.info.copy()
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        position = remover._detect_watermark_position(image)
+
+        stages = {
+            "decode": _min_time(decode, repeat),
+            "detect": _min_time(lambda: remover._detect_watermark_position(image), repeat),
+        }
+        if position is not None:
+            # 原地處理，重複執行的成本相同
+            stages["remove"] = _min_time(
+                lambda: remover._remove_watermark_from_region(image, position), repeat
+            )
+        stages["encode"] = _min_time(
+            lambda: remover._save_image(image, BytesIO(), case["format"], info), repeat
+        )
+        stages["end_to_end"] = _min_time(
+            lambda: remover.remove_watermark_bytes(data, case["format"]), repeat
+        )
+
+        tracemalloc.start()
+        remover.remove_watermark_bytes(data, case["format"])
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[case["name"]] = {
+            "megapixels": image.width * image.height / 1e6,
+            "bytes": len(data),
+            "detected": position is not None,
+            "detection": list(position) if position is not None else None,
+            "expected": case["watermarked"],
+            "peak_bytes": peak_bytes,
+            "stages": stages,
+        }
+    return results
+
+
+def print_suite_report(results: dict):
+    """輸出各樣本各階段的耗時與 end_to_end 吞吐量"""
+    header = "".join(f"{stage:>12}" for stage in SUITE_STAGES)
+    print(f"{'樣本':<22}{header}{'MP/秒':>9}{'記憶體峰值':>12}  偵測")
+    missed = 0
+    for name, result in results.items():
+        stages = result["stages"]
+        cells = "".join(
+            f"{stages[stage] * 1000:>10.2f}ms" if stage in stages else f"{'-':>12}"
+            for stage in SUITE_STAGES
+        )
+        rate = result["megapixels"] / stages["end_to_end"] if stages["end_to_end"] > 0 else 0.0
+        correct = result["detected"] == result["expected"]
+        missed += not correct
+        print(
+            f"{name:<22}{cells}{rate:>9.1f}{result['peak_bytes'] / 1048576:>10.1f}MB"
+            f"  {'✓' if correct else '✗'}"
+        )
+    if missed:
+        print(f"偵測結果與預期不符: {missed} 個樣本")
+
+
+def stage_totals(results: dict, names) -> dict:
+    """指定樣本各階段耗時的總和（秒）"""
+    totals = {}
+    for name in names:
+        for stage, seconds in results[name]["stages"].items():
+            totals[stage] = totals.get(stage, 0.0) + seconds
+    return totals
+
+
+def _check_baseline_version(baseline: dict):
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError(
+            f"基準結果格式版本 {baseline.get('version')} 與目前的 {BASELINE_VERSION} 不同，"
+            "請以 --save-baseline 重新建立"
+        )
+
+
+def compare_detections(results: dict, baseline: dict) -> list:
+    """
+    與基準結果比較每個樣本的偵測結果（是否偵測到、位置與尺寸）
+    變快但偵測結果改變（例如不再偵測到浮水印）不能通過基準比較
+
+    Returns:
+        [(樣本名稱, 基準的 [x, y, size] 或 None, 目前的 [x, y, size] 或 None)]
+
+    Raises:
+        ValueError: 基準結果的格式版本不同
+    """
+    _check_baseline_version(baseline)
+    base_results = baseline.get("results", {})
+    return [
+        (name, base_results[name]["detection"], result["detection"])
+        for name, result in results.items()
+        if name in base_results and result["detection"] != base_results[name]["detection"]
+    ]
+
+
+def compare_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    與基準結果比較各階段的總耗時（兩者都有的樣本加總）
+    單一小樣本的耗時只有幾毫秒，個別比較容易被雜訊觸發；總耗時超過基準 (1 + tolerance) 倍，
+    且差異大於 REGRESSION_FLOOR 時才視為退化
+
+    Returns:
+        [(階段, 基準秒數, 目前秒數, 差異最大的樣本名稱)]
+
+    Raises:
+        ValueError: 基準結果的格式版本不同
+    """
+    _check_baseline_version(baseline)
+    base_results = baseline.get("results", {})
+    names = [name for name in results if name in base_results]
+    current = stage_totals(results, names)
+    base_totals = stage_totals(base_results, names)
+
+    regressions = []
+    for stage, seconds in current.items():
+        base = base_totals.get(stage)
+        if base is None:
+            continue
+        if seconds > base * (1 + tolerance) and seconds - base > REGRESSION_FLOOR:
+            worst = max(
+                (name for name in names if stage in base_results[name]["stages"]
+                 and stage in results[name]["stages"]),
+                key=lambda name: results[name]["stages"][stage] - base_results[name]["stages"][stage],
+            )
+            regressions.append((stage, base, seconds, worst))
+    return regressions
+
+
+def _parse_importtime(stderr: str) -> list:
+    """
+    解析 python -X importtime 的輸出
+
+    Returns:
+        最上層模組的 [(名稱, 累計秒數)]，依耗時由大到小排列
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit() or name.startswith("  "):
+            continue
+        modules.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(modules, key=lambda item: item[1], reverse=True)
+
+
+def bench_startup(repeat: int = 10) -> list:
+    """
+    量測各情境從啟動 Python 到結束的時間（子行程），
+    並另以 -X importtime 執行一次取得匯入耗時
+
+    Returns:
+        [{"name", "seconds", "import_seconds", "imports": [(模組, 秒)], "heavy": [已匯入的 numpy/PIL]}]
+    """
+    rows = []
+    for name, args in STARTUP_SCENARIOS:
+        command = [sys.executable, *args]
+
+        def run():
+            subprocess.run(command, cwd=_BASE_DIR, capture_output=True)
+
+        # 第一次執行產生 .pyc，不列入量測
+        run()
+        seconds = _median_time(run, repeat)
+        traced = subprocess.run(
+            [sys.executable, "-X", "importtime", *args],
+            cwd=_BASE_DIR, capture_output=True, text=True,
+        )
+        imports = _parse_importtime(traced.stderr)
+        rows.append({
+            "name": name,
+            "seconds": seconds,
+            "import_seconds": sum(item[1] for item in imports),
+            "imports": imports,
+            "heavy": [module for module, _ in imports if module in ("numpy", "PIL", "PIL.Image")],
+        })
+    return rows
+
+
+def print_startup_report(rows: list):
+    """輸出啟動時間與最耗時的匯入"""
+    print(f"{'情境':<16}{'啟動時間':>12}{'匯入':>12}  numpy/PIL  主要匯入")
+    for row in rows:
+        top = ", ".join(f"{module} {seconds * 1000:.1f}ms" for module, seconds in row["imports"][:3])
+        print(
+            f"{row['name']:<16}{row['seconds'] * 1000:>10.1f}ms{row['import_seconds'] * 1000:>10.1f}ms"
+            f"  {'是' if row['heavy'] else '否':<9}  {top}"
+        )
+
+
+def _size_list(value: str) -> list:
+    sizes = value.split(",")
+    unknown = [size for size in sizes if size not in SUITE_SIZES]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"未知的尺寸: {', '.join(unknown)}（可用: {', '.join(SUITE_SIZES)}）"
+        )
+    return sizes
+
+
+def _jpeg_quality_list(value: str) -> list:
+    return [item if item == "keep" else int(item) for item in value.split(",")]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="remove_watermark.py bench", description="KillWatermark 效能量測"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    encode = subparsers.add_parser("encode", help="比較各輸出編碼設定的速度與檔案大小")
+    encode.add_argument("inputs", nargs="+", help="樣本圖片路徑、目錄或 glob 樣式")
+    encode.add_argument("-r", "--recursive", action="store_true", help="遞迴處理子目錄")
+    encode.add_argument("--repeat", type=int, default=3, help="每個設定重複次數（取中位數）")
+    encode.add_argument(
+        "--jpeg-quality", type=_jpeg_quality_list, default=None,
+        help="JPEG 樣本要比較的品質，以逗號分隔，例如 95,85,keep",
+    )
+
+    detect = subparsers.add_parser("detect", help="量測每張圖片的偵測延遲")
+    detect.add_argument("inputs", nargs="+", help="樣本圖片路徑、目錄或 glob 樣式")
+    detect.add_argument("-r", "--recursive", action="store_true", help="遞迴處理子目錄")
+    detect.add_argument("--repeat", type=int, default=5, help="每張圖片重複次數（取中位數）")
+
+    suite = subparsers.add_parser(
+        "suite", help="以合成樣本量測各階段耗時，並與基準結果比較"
+    )
+    suite.add_argument(
+        "--corpus", default=os.path.join(tempfile.gettempdir(), "killwatermark-bench"),
+        help="合成樣本目錄（不存在時自動建立，已存在的樣本直接沿用）",
+    )
+    suite.add_argument(
+        "--sizes", type=_size_list, default=list(SUITE_SIZES),
+        help=f"樣本尺寸，以逗號分隔（預設 {','.join(SUITE_SIZES)}）",
+    )
+    suite.add_argument("--seed", type=int, default=0, help="合成樣本的亂數種子")
+    suite.add_argument("--repeat", type=int, default=5, help="每個階段重複次數（取最小值）")
+    suite.add_argument("--baseline", default=None, help="基準結果 JSON，超過容許範圍時回傳 1")
+    suite.add_argument(
+        "--tolerance", type=float, default=0.25,
+        help="相對於基準可容許的耗時增加比例（預設 0.25）",
+    )
+    suite.add_argument("--save-baseline", default=None, help="將本次結果寫入基準 JSON")
+    add_remover_arguments(suite)
+
+    startup = subparsers.add_parser(
+        "startup", help="量測各情境的啟動時間與匯入耗時（類似 python -X importtime）"
+    )
+    startup.add_argument("--repeat", type=int, default=10, help="每個情境重複次數（取中位數）")
+    return parser
+
+
+def _format_detection(detection) -> str:
+    if detection is None:
+        return "未偵測到"
+    x, y, size = detection
+    return f"({x}, {y}) {size}px"
+
+
+def run_suite(args) -> int:
+    """執行合成樣本量測；與基準比較有效能退化或偵測結果不同時回傳 1"""
+    cases = build_corpus(args.corpus, args.sizes, args.seed)
+    print(f"樣本數: {len(cases)}（{args.corpus}），每個階段重複 {args.repeat} 次")
+    results = bench_suite(cases, args.repeat, remover_options_from_args(args))
+    print_suite_report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"version": BASELINE_VERSION, "results": results}, f, indent=2)
+        print(f"已寫入基準結果: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        try:
+            regressions = compare_baseline(results, baseline, args.tolerance)
+            mismatches = compare_detections(results, baseline)
+        except ValueError as e:
+            print(f"錯誤: {e}")
+            return 1
+        for name, base, detection in mismatches:
+            print(f"✗ {name}: 偵測結果 {_format_detection(base)} -> {_format_detection(detection)}")
+        for stage, base, seconds, worst in regressions:
+            print(
+                f"✗ {stage}: {base * 1000:.2f}ms -> {seconds * 1000:.2f}ms"
+                f"（+{(seconds / base - 1) * 100:.0f}%，差異最大的樣本 {worst}）"
+            )
+        if regressions:
+            print(f"效能退化: {len(regressions)} 項超過容許範圍 {args.tolerance:.0%}")
+        if mismatches:
+            print(f"偵測結果與基準不同: {len(mismatches)} 個樣本")
+        if regressions or mismatches:
+            return 1
+        print(f"與基準相比偵測結果相同，沒有超過 {args.tolerance:.0%} 的效能退化")
+    return 0
+
+
+def main(argv: list = None) -> int:
+    """效能量測主程式"""
+    args = build_parser().parse_args(argv)
+
+    if args.command == "suite":
+        return run_suite(args)
+    if args.command == "startup":
+        print_startup_report(bench_startup(args.repeat))
+        return 0
+
+    paths = [path for path, _ in collect_inputs(args.inputs, args.recursive)]
+    if not paths:
+        print("錯誤: 找不到任何圖片檔案")
+        return 1
+
+    if args.command == "encode":
+        print(f"樣本數: {len(paths)}，每個設定重複 {args.repeat} 次")
+        print_encode_report(bench_encode(paths, args.repeat, args.jpeg_quality))
+    elif args.command == "detect":
+        print_detect_report(bench_detect(paths, args.repeat))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+KillWatermark 常駐服務與精簡客戶端
+常駐服務保留一個已初始化的 WatermarkRemover，透過 Unix domain socket 接收檔案路徑，
+快速動作一次送出所有選取的檔案，省去每個檔案重新啟動 Python、匯入 NumPy/Pillow 的成本。
+
+使用方式：
+    python3 watermark_daemon.py <圖片路徑> [<圖片路徑> ...]   # 客戶端（必要時自動啟動服務）
+    python3 watermark_daemon.py serve [閒置秒數]               # 以前景模式啟動服務
+    python3 watermark_daemon.py stop                          # 停止服務
+
+客戶端只使用標準函式庫，不需要匯入 NumPy/Pillow。
+"""
+
+import sys
+import os
+import json
+import socket
+import tempfile
+import time
+
+# 閒置超過此秒數後服務自動結束
+DEFAULT_IDLE_TIMEOUT = 600
+# 客戶端等待服務啟動的最長秒數
+STARTUP_TIMEOUT = 15
+
+
+def get_socket_path() -> str:
+    """取得 Unix domain socket 路徑（每個使用者一個）"""
+    socket_path = os.environ.get("KILLWATERMARK_SOCKET")
+    if socket_path:
+        return socket_path
+    return os.path.join(tempfile.gettempdir(), f"killwatermark-{os.getuid()}.sock")
+
+
+def _send_request(sock: socket.socket, request: dict):
+    """
+    送出一行 JSON 請求並逐行讀取回應
+
+    Raises:
+        ConnectionError: 收到 done 之前連線就中斷（例如服務結束或當掉）
+    """
+    sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+    with sock.makefile("r", encoding="utf-8") as reader:
+        for line in reader:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                # 服務在寫入途中結束，最後一行不完整
+                break
+            if message.get("done"):
+                return
+            yield message
+    raise ConnectionError("常駐服務在完成前中斷連線")
+
+
+def _connect(socket_path: str):
+    """連線到服務，服務未執行時回傳 None"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+    return sock
+
+
+def _start_daemon():
+    """在背景啟動服務（脫離目前的 session）"""
+    # 只有服務未執行時才需要，延後匯入以縮短客戶端啟動時間
+    import subprocess
+
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "serve"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def connect_or_start(socket_path: str = None):
+    """連線到服務，若尚未執行則自動啟動並等待就緒"""
+    socket_path = socket_path or get_socket_path()
+    sock = _connect(socket_path)
+    if sock is not None:
+        return sock
+
+    _start_daemon()
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        sock = _connect(socket_path)
+        if sock is not None:
+            return sock
+    return None
+
+
+def _process_locally(paths: list):
+    """服務無法啟動時，改在目前行程中處理"""
+    from remove_watermark import WatermarkRemover
+
+    remover = WatermarkRemover()
+    for path in paths:
+        try:
+            output = remover.remove_watermark(path, verbose=False)
+        except Exception as e:
+            yield {"path": path, "status": "error", "error": str(e)}
+            continue
+        status = "no_watermark" if output == path else "ok"
+        yield {"path": path, "status": status, "output": output}
+
+
+def process_paths(paths: list):
+    """
+    將檔案交給服務處理並逐一回傳結果
+
+    Yields:
+        {"path", "status", "output"/"error"}，status 為 ok / no_watermark / error；
+        服務中途斷線時，尚未回報的檔案都以 error 回傳
+    """
+    paths = [os.path.abspath(p) for p in paths]
+    sock = connect_or_start()
+    if sock is None:
+        yield from _process_locally(paths)
+        return
+    reported = set()
+    with sock:
+        try:
+            for result in _send_request(sock, {"paths": paths}):
+                reported.add(result.get("path"))
+                yield result
+        except OSError as e:
+            for path in paths:
+                if path not in reported:
+                    yield {"path": path, "status": "error", "error": str(e)}
+
+
+def stop_daemon() -> bool:
+    """要求服務結束，服務未執行時回傳 False"""
+    sock = _connect(get_socket_path())
+    if sock is None:
+        return False
+    with sock:
+        for _ in _send_request(sock, {"command": "stop"}):
+            pass
+    return True
+
+
+def serve(idle_timeout: float = DEFAULT_IDLE_TIMEOUT, socket_path: str = None):
+    """
+    啟動常駐服務
+    以 lock 檔確保同一時間只有一個服務，閒置超過 idle_timeout 秒後自動結束
+    """
+    import fcntl
+    import socketserver
+    import threading
+
+    from remove_watermark import WatermarkRemover
+
+    socket_path = socket_path or get_socket_path()
+    lock_file = open(f"{socket_path}.lock", "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        # 已有其他服務在執行
+        lock_file.close()
+        return
+
+    # 預先載入 alpha map，讓第一個請求不必等待
+    remover = WatermarkRemover()
+    for size in (48, 96):
+        remover._get_alpha_map(size)
+
+    state = {"active": 0, "last_active": time.monotonic(), "stop": False}
+    state_lock = threading.Lock()
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def _reply(self, message: dict):
+            line = json.dumps(message, ensure_ascii=False) + "\n"
+            self.wfile.write(line.encode("utf-8"))
+            self.wfile.flush()
+
+        def handle(self):
+            with state_lock:
+                state["active"] += 1
+            try:
+                request = json.loads(self.rfile.readline() or b"{}")
+                if request.get("command") == "stop":
+                    state["stop"] = True
+                for path in request.get("paths", []):
+                    self._reply(self._process(path))
+                self._reply({"done": True})
+            finally:
+                with state_lock:
+                    state["active"] -= 1
+                    state["last_active"] = time.monotonic()
+
+        def _process(self, path: str) -> dict:
+            if not os.path.exists(path):
+                return {"path": path, "status": "error", "error": f"找不到檔案 {path}"}
+            try:
+                output = remover.remove_watermark(path, verbose=False)
+            except Exception as e:
+                return {"path": path, "status": "error", "error": str(e)}
+            status = "no_watermark" if output == path else "ok"
+            return {"path": path, "status": status, "output": output}
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    # 持有 lock 即代表沒有其他服務，殘留的 socket 檔可以安全移除
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    old_umask = os.umask(0o077)
+    try:
+        server = Server(socket_path, RequestHandler)
+    finally:
+        os.umask(old_umask)
+
+    server.timeout = 1.0
+    try:
+        with server:
+            while not state["stop"]:
+                server.handle_request()
+                with state_lock:
+                    idle = time.monotonic() - state["last_active"]
+                    if state["active"] == 0 and idle > idle_timeout:
+                        break
+    finally:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        lock_file.close()
+
+
+def main():
+    """主程式"""
+    if len(sys.argv) < 2:
+        print("使用方式: python3 watermark_daemon.py <圖片路徑> [<圖片路徑> ...]")
+        print("         python3 watermark_daemon.py serve [閒置秒數]")
+        print("         python3 watermark_daemon.py stop")
+        sys.exit(1)
+
+    command = sys.argv[1]
+    if command == "serve":
+        idle_timeout = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_IDLE_TIMEOUT
+        serve(idle_timeout)
+        return
+    if command == "stop":
+        if stop_daemon():
+            print("已停止常駐服務")
+        else:
+            print("常駐服務未執行")
+        return
+
+    fail = 0
+    for result in process_paths(sys.argv[1:]):
+        if result["status"] == "ok":
+            print(f"✓ {result['path']} -> {result['output']}")
+        elif result["status"] == "no_watermark":
+            print(f"✓ {result['path']}（未偵測到浮水印）")
+        else:
+            fail += 1
+            print(f"✗ {result['path']}: {result['error']}")
+    sys.exit(1 if fail else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+KillWatermark 處理紀錄（manifest）
+以 SQLite 記錄每個檔案的處理結果，鍵值為內容雜湊加上檔案大小與修改時間，
+重複執行時可略過未變更的檔案而不必重新解碼。
+紀錄同時保存處理時的參數指紋，改變偵測或輸出參數後既有結果不會被沿用。
+每次執行時更新所有輸入檔案最後看到的時間，清理紀錄以此為準，
+仍存在的檔案（包括其他分片或已由檢查點略過的檔案）不會因為久未變更而被清掉。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+# 可重複使用的處理結果（失敗的檔案下次仍會重試）
+REUSABLE_STATUSES = ("ok", "no_watermark")
+
+# 會影響處理結果的 WatermarkRemover 參數（frame_jobs 只影響速度）
+OUTPUT_OPTIONS = ("encode_profile", "jpeg_quality", "jpeg_subsampling", "search", "logo_size")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    output TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    seen_at REAL,
+    options TEXT
+);
+CREATE INDEX IF NOT EXISTS files_content_hash ON files (content_hash, size);
+"""
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """計算檔案內容雜湊（BLAKE2b，只讀取不解碼）"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def options_fingerprint(options: dict = None) -> str:
+    """
+    計算影響處理結果的參數指紋
+    未指定的參數以 WatermarkRemover 的預設值計算，省略參數與明確指定預設值的結果相同
+    """
+    from remove_watermark import DEFAULT_ENCODE_PROFILE, DEFAULT_JPEG_QUALITY
+
+    values = {
+        "encode_profile": DEFAULT_ENCODE_PROFILE,
+        "jpeg_quality": DEFAULT_JPEG_QUALITY,
+        "jpeg_subsampling": None,
+        "search": False,
+        "logo_size": None,
+    }
+    values.update((name, value) for name, value in (options or {}).items() if name in values)
+    encoded = json.dumps(values, sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+class Manifest:
+    """
+    處理紀錄
+    主行程以讀寫模式開啟並寫入結果；工作行程可用 read_only 模式查詢內容雜湊
+    只有以相同參數（options，見 OUTPUT_OPTIONS）處理的紀錄才會被沿用
+    """
+
+    def __init__(self, db_path: str, read_only: bool = False, options: dict = None):
+        self.db_path = db_path
+        self.options = options_fingerprint(options)
+        if read_only:
+            uri = f"file:{os.path.abspath(db_path)}?mode=ro"
+            self.conn = sqlite3.connect(uri, uri=True)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self.conn = sqlite3.connect(db_path)
+            # WAL 模式讓工作行程在主行程寫入時仍可讀取
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(_SCHEMA)
+            self._migrate()
+            self.conn.commit()
+
+    def _migrate(self):
+        """
+        舊版紀錄檔沒有 seen_at 欄位，加上後以 updated_at 作為初始值；
+        沒有 options 欄位時加上空值，處理參數不明的紀錄不會被沿用
+        """
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(files)")]
+        if "seen_at" not in columns:
+            self.conn.execute("ALTER TABLE files ADD COLUMN seen_at REAL")
+            self.conn.execute("UPDATE files SET seen_at = updated_at")
+        if "options" not in columns:
+            self.conn.execute("ALTER TABLE files ADD COLUMN options TEXT")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _is_reusable(status: str, output: str, output_path: str = None) -> bool:
+        """判斷既有紀錄是否仍有效：無浮水印，或輸出檔仍存在且與要求的輸出一致"""
+        if status == "no_watermark":
+            return True
+        if status != "ok" or not output or not os.path.exists(output):
+            return False
+        return output_path is None or os.path.abspath(output_path) == os.path.abspath(output)
+
+    def lookup(self, path: str, output_path: str = None):
+        """
+        以路徑、大小與修改時間查詢（不讀取檔案內容）
+
+        Returns:
+            檔案未變更且紀錄仍有效時回傳 {"status", "output"}，否則回傳 None
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, status, output FROM files WHERE path = ? AND options = ?",
+            (os.path.abspath(path), self.options),
+        ).fetchone()
+        if row is None:
+            return None
+        size, mtime_ns, status, output = row
+        if size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+            return None
+        if not self._is_reusable(status, output, output_path):
+            return None
+        return {"status": status, "output": output}
+
+    def lookup_hash(self, content_hash: str, size: int, output_path: str = None):
+        """
+        以內容雜湊查詢（用於搬移或複製過、但內容相同的檔案）
+
+        Returns:
+            有可重複使用的紀錄時回傳 {"status", "output"}，否則回傳 None
+        """
+        rows = self.conn.execute(
+            "SELECT status, output FROM files "
+            "WHERE content_hash = ? AND size = ? AND options = ?",
+            (content_hash, size, self.options),
+        ).fetchall()
+        for status, output in rows:
+            if status == "no_watermark":
+                return {"status": status, "output": None}
+            if output_path is not None and self._is_reusable(status, output, output_path):
+                return {"status": status, "output": output}
+        return None
+
+    def record(self, result: dict):
+        """寫入單一檔案的處理結果（需包含 size、mtime_ns、content_hash）"""
+        if "content_hash" not in result:
+            return
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files "
+            "(path, size, mtime_ns, content_hash, status, output, error, updated_at, seen_at, "
+            "options) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                os.path.abspath(result["path"]),
+                result["bytes"],
+                result["mtime_ns"],
+                result["content_hash"],
+                result["status"],
+                result.get("output"),
+                result.get("error"),
+                now,
+                now,
+                self.options,
+            ),
+        )
+
+    def touch(self, paths):
+        """
+        更新輸入檔案最後看到的時間（不論是否由本次執行處理），與 record 相同需呼叫 commit 寫入
+        分片或由檢查點略過的檔案也應更新，否則 prune 會刪除仍存在的檔案的紀錄
+        """
+        now = time.time()
+        self.conn.executemany(
+            "UPDATE files SET seen_at = ? WHERE path = ?",
+            ((now, os.path.abspath(path)) for path in paths),
+        )
+
+    def commit(self):
+        self.conn.commit()
+
+    def prune(self, max_age_days: float = None, max_entries: int = None) -> int:
+        """
+        清理紀錄
+        刪除超過 max_age_days 天都沒有處理或略過的紀錄，並只保留最近看到的 max_entries 筆
+
+        Returns:
+            刪除的筆數
+        """
+        removed = 0
+        if max_age_days is not None:
+            cutoff = time.time() - max_age_days * 86400
+            removed += self.conn.execute(
+                "DELETE FROM files WHERE seen_at < ?", (cutoff,)
+            ).rowcount
+        if max_entries is not None:
+            removed += self.conn.execute(
+                "DELETE FROM files WHERE path NOT IN "
+                "(SELECT path FROM files ORDER BY seen_at DESC LIMIT ?)",
+                (max_entries,),
+            ).rowcount
+        self.conn.commit()
+        if removed:
+            self.conn.execute("VACUUM")
+        return removed
@@ -0,0 +1,127 @@
+"""
+KillWatermark 各階段量測
+記錄每張圖片 decode / detect / remove / encode / sips 各階段的實際時間與 CPU 時間、
+讀寫位元組數與偵測結果。WatermarkRemover 未設定 metrics 時完全不量測。
+"""
+
+import json
+import time
+import threading
+import contextlib
+
+STAGES = ("decode", "detect", "remove", "encode", "write", "sips")
+OUTCOMES = ("detected", "no_watermark", "error")
+
+
+class ImageRecord:
+    """單張圖片的量測結果"""
+
+    __slots__ = ("stages", "bytes_read", "bytes_written", "outcome")
+
+    def __init__(self):
+        self.stages = {}  # 階段 -> [實際時間, CPU 時間]
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.outcome = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """量測一個階段；CPU 時間只計算目前執行緒"""
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, [0.0, 0.0])
+            entry[0] += time.perf_counter() - wall
+            entry[1] += time.thread_time() - cpu
+
+    def merge(self, other: "ImageRecord"):
+        """加入另一個量測的各階段時間（例如在其他執行緒處理的影格）"""
+        for name, (wall, cpu) in other.stages.items():
+            entry = self.stages.setdefault(name, [0.0, 0.0])
+            entry[0] += wall
+            entry[1] += cpu
+
+    def to_dict(self) -> dict:
+        return {
+            "stages": {name: {"wall": wall, "cpu": cpu} for name, (wall, cpu) in self.stages.items()},
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "outcome": self.outcome,
+        }
+
+
+class Metrics:
+    """
+    彙總多張圖片的量測結果（執行緒安全）
+    hook 會在每張圖片完成時以 ImageRecord.to_dict() 的內容呼叫
+    """
+
+    def __init__(self, hook=None):
+        self.hook = hook
+        self.last_record = None
+        self._lock = threading.Lock()
+        self.images = 0
+        self.stages = {name: {"count": 0, "wall": 0.0, "cpu": 0.0} for name in STAGES}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+
+    def start(self) -> ImageRecord:
+        return ImageRecord()
+
+    def finish(self, record: ImageRecord):
+        """加入一張圖片的量測結果並呼叫 hook"""
+        data = record.to_dict()
+        self.add(data)
+        self.last_record = data
+        if self.hook is not None:
+            self.hook(data)
+
+    def add(self, data: dict):
+        """加入以 to_dict() 表示的單張圖片結果（例如工作行程回傳的結果）"""
+        with self._lock:
+            self.images += 1
+            for name, timing in data["stages"].items():
+                total = self.stages.setdefault(name, {"count": 0, "wall": 0.0, "cpu": 0.0})
+                total["count"] += 1
+                total["wall"] += timing["wall"]
+                total["cpu"] += timing["cpu"]
+            self.bytes_read += data["bytes_read"]
+            self.bytes_written += data["bytes_written"]
+            if data["outcome"] is not None:
+                self.outcomes[data["outcome"]] = self.outcomes.get(data["outcome"], 0) + 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "images": self.images,
+                "stages": {name: dict(total) for name, total in self.stages.items() if total["count"]},
+                "bytes_read": self.bytes_read,
+                "bytes_written": self.bytes_written,
+                "outcomes": dict(self.outcomes),
+            }
+
+    def write_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def print_summary(self):
+        """輸出各階段耗時摘要"""
+        data = self.to_dict()
+        total_wall = sum(total["wall"] for total in data["stages"].values())
+        print(f"{'階段':<10}{'次數':>8}{'實際時間':>12}{'CPU 時間':>12}{'平均':>12}{'占比':>8}")
+        for name, total in data["stages"].items():
+            average = total["wall"] / total["count"] * 1000
+            share = total["wall"] / total_wall * 100 if total_wall > 0 else 0.0
+            print(
+                f"{name:<10}{total['count']:>8}{total['wall']:>11.3f}s{total['cpu']:>11.3f}s"
+                f"{average:>10.2f}ms{share:>7.1f}%"
+            )
+        outcomes = data["outcomes"]
+        print(
+            f"讀取 {data['bytes_read'] / 1048576:.1f} MB，寫入 {data['bytes_written'] / 1048576:.1f} MB；"
+            f"偵測到 {outcomes['detected']}、無浮水印 {outcomes['no_watermark']}、"
+            f"失敗 {outcomes['error']}"
+        )
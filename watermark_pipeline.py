@@ -0,0 +1,304 @@
+"""
+KillWatermark 執行緒管線
+在單一行程內以三個階段處理批次檔案：讀取與解碼 → 偵測與移除 → 編碼與寫入，
+各階段之間以有上限的佇列連接，每個階段可設定執行緒數，所有執行緒共用同一個 WatermarkRemover。
+Pillow 解碼與 zlib/JPEG 編碼時會釋放 GIL，磁碟或網路掛載較慢時讀寫可以與運算重疊，
+也不需要行程池傳遞檔案與結果的 pickle 成本。
+
+使用方式：
+    python3 remove_watermark.py batch <路徑/目錄/glob> [...] --executor pipeline
+                                      [--readers 2] [-j 運算執行緒數] [--writers 2]
+"""
+
+import os
+import sys
+import time
+import queue
+import hashlib
+import threading
+from io import BytesIO
+
+from watermark_manifest import OUTPUT_OPTIONS, Manifest
+from watermark_metrics import ImageRecord
+
+DEFAULT_READERS = 2
+DEFAULT_WRITERS = 2
+
+# 佇列結束標記
+_DONE = object()
+# 等待佇列時檢查是否中止的間隔秒數
+_POLL_INTERVAL = 0.1
+
+
+class _Job:
+    """在各階段之間傳遞的單一檔案"""
+
+    __slots__ = ("path", "output_path", "result", "start", "record", "image",
+                 "output_format", "original_info", "detection", "encoded")
+
+    def __init__(self, path: str, output_path: str = None, record: ImageRecord = None):
+        self.path = path
+        self.output_path = output_path
+        self.result = {"path": path}
+        self.start = time.perf_counter()
+        self.record = record
+        self.image = None
+        self.output_format = None
+        self.original_info = None
+        self.detection = None
+        self.encoded = None  # 多影格圖片在運算階段已編碼完成的內容
+
+    @property
+    def finished(self) -> bool:
+        return "status" in self.result
+
+    def fail(self, error: Exception):
+        self.image = None
+        self.encoded = None
+        self.result["status"] = "error"
+        self.result["error"] = f"{type(error).__name__}: {error}"
+
+
+class Pipeline:
+    """
+    讀取 → 運算 → 寫入的執行緒管線
+    每個階段的執行緒從上一個佇列取出檔案、處理後放入下一個佇列；
+    失敗或不需繼續處理的檔案直接往下傳遞，由最後的結果佇列依完成順序回傳
+    """
+
+    def __init__(self, remover, readers: int = DEFAULT_READERS, workers: int = None,
+                 writers: int = DEFAULT_WRITERS, queue_size: int = None,
+                 manifest_path: str = None, collect_metrics: bool = False):
+        """
+        Args:
+            remover: 所有執行緒共用的 WatermarkRemover
+            readers: 讀取與解碼的執行緒數
+            workers: 偵測與移除的執行緒數，預設為 CPU 核心數
+            writers: 編碼與寫入的執行緒數
+            queue_size: 各階段之間的佇列上限，預設為下一階段執行緒數的 2 倍
+            manifest_path: 處理紀錄檔路徑（需已建立），讀取階段用來查詢內容雜湊
+            collect_metrics: 是否量測各階段耗時（結果放在每個檔案的 metrics 欄位）
+        """
+        workers = workers or os.cpu_count() or 1
+        # 任一階段沒有執行緒時不會有人傳遞結束標記，管線會永遠等待
+        for name, count in (("readers", readers), ("workers", workers), ("writers", writers)):
+            if count < 1:
+                raise ValueError(f"{name} 必須至少為 1，收到 {count}")
+        if queue_size is not None and queue_size < 1:
+            raise ValueError(f"queue_size 必須至少為 1，收到 {queue_size}")
+        self.remover = remover
+        self.manifest_path = manifest_path
+        self.collect_metrics = collect_metrics
+        self._stop = threading.Event()
+        self._local = threading.local()
+
+        stages = [(self._read, readers), (self._compute, workers), (self._write, writers)]
+        # 最後一個佇列存放結果，只有呼叫端一個消費者
+        self._stage_counts = [count for _, count in stages] + [1]
+        self._queues = [
+            queue.Queue(queue_size or count * 2) for _, count in stages
+        ] + [queue.Queue()]
+        self._threads = []
+        for index, (func, count) in enumerate(stages):
+            remaining = [count]
+            lock = threading.Lock()
+            for _ in range(count):
+                self._threads.append(threading.Thread(
+                    target=self._run_stage,
+                    args=(func, index, remaining, lock),
+                    daemon=True,
+                ))
+
+    def _put(self, index: int, item) -> bool:
+        """放入第 index 個佇列；已中止時放棄並回傳 False"""
+        while not self._stop.is_set():
+            try:
+                self._queues[index].put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, index: int):
+        """從第 index 個佇列取出；已中止時回傳結束標記"""
+        while not self._stop.is_set():
+            try:
+                return self._queues[index].get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _run_stage(self, func, index: int, remaining: list, lock):
+        """
+        單一階段的執行緒
+        最後一個結束的執行緒負責通知下一階段的所有執行緒結束
+        """
+        try:
+            while True:
+                job = self._get(index)
+                if job is _DONE:
+                    break
+                if not job.finished:
+                    try:
+                        func(job)
+                    except Exception as e:
+                        job.fail(e)
+                if not self._put(index + 1, job):
+                    break
+        finally:
+            if index == 0:
+                self._close_manifest()
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                for _ in range(self._stage_counts[index + 1]):
+                    self._put(index + 1, _DONE)
+
+    def _feed(self, tasks):
+        for path, output_path in tasks:
+            record = ImageRecord() if self.collect_metrics else None
+            if not self._put(0, _Job(path, output_path, record)):
+                return
+        for _ in range(self._stage_counts[0]):
+            self._put(0, _DONE)
+
+    def _get_manifest(self):
+        """每個讀取執行緒各自以唯讀模式開啟處理紀錄（SQLite 連線不能跨執行緒使用）"""
+        if self.manifest_path is None:
+            return None
+        manifest = getattr(self._local, "manifest", None)
+        if manifest is None:
+            options = {name: getattr(self.remover, name) for name in OUTPUT_OPTIONS}
+            manifest = self._local.manifest = Manifest(
+                self.manifest_path, read_only=True, options=options
+            )
+        return manifest
+
+    def _close_manifest(self):
+        manifest = getattr(self._local, "manifest", None)
+        if manifest is not None:
+            manifest.close()
+            self._local.manifest = None
+
+    def _read(self, job: _Job):
+        """讀取階段：一次讀入檔案內容，必要時查詢處理紀錄，再解碼"""
+        stat = os.stat(job.path)
+        job.result["bytes"] = stat.st_size
+        job.result["mtime_ns"] = stat.st_mtime_ns
+        with self.remover._stage(job.record, "decode"):
+            with open(job.path, "rb") as f:
+                data = f.read()
+
+        manifest = self._get_manifest()
+        if manifest is not None:
+            # 與 file_digest 相同的雜湊，直接使用已讀入的內容
+            job.result["content_hash"] = hashlib.blake2b(data, digest_size=20).hexdigest()
+            cached = manifest.lookup_hash(
+                job.result["content_hash"], stat.st_size, job.output_path
+            )
+            if cached is not None:
+                job.result.update(cached, cached=True)
+                return
+
+        if job.output_path is None:
+            from remove_watermark import get_default_output_path
+
+            job.output_path = get_default_output_path(job.path)
+        output_format = self.remover._get_path_format(job.output_path)
+        job.image, job.output_format, job.original_info = self.remover._decode_stream(
+            BytesIO(data), output_format, job.record
+        )
+
+    def _compute(self, job: _Job):
+        """運算階段：偵測並移除浮水印；多影格圖片在此一併編碼"""
+        if job.original_info is None:
+            output = BytesIO()
+            job.detection = self.remover._process_frames(
+                job.image, output, job.output_format, job.record
+            )
+            job.encoded = output
+            if job.record is not None:
+                job.record.bytes_read = job.result["bytes"]
+        else:
+            job.image, job.detection = self.remover._detect_and_remove(job.image, job.record)
+        if job.detection is None:
+            job.image = None
+            job.encoded = None
+            job.result["status"] = "no_watermark"
+
+    def _write(self, job: _Job):
+        """寫入階段：編碼後一次寫入輸出檔"""
+        from remove_watermark import _refresh_macos_metadata
+
+        output = job.encoded
+        if output is None:
+            output = BytesIO()
+            self.remover._encode_image(
+                job.image, output, job.output_format, job.original_info, job.record
+            )
+        job.image = None
+        job.encoded = None
+
+        os.makedirs(os.path.dirname(job.output_path) or ".", exist_ok=True)
+        with self.remover._stage(job.record, "write"):
+            with open(job.output_path, "wb") as f:
+                f.write(output.getbuffer())
+        if sys.platform == "darwin":
+            with self.remover._stage(job.record, "sips"):
+                _refresh_macos_metadata(job.output_path)
+        job.result["status"] = "ok"
+        job.result["output"] = job.output_path
+
+    def _finish(self, job: _Job) -> dict:
+        result = job.result
+        if job.record is not None and not result.get("cached"):
+            job.record.outcome = {
+                "ok": "detected", "no_watermark": "no_watermark"
+            }.get(result["status"], "error")
+            result["metrics"] = job.record.to_dict()
+        result["elapsed"] = time.perf_counter() - job.start
+        return result
+
+    def run(self, tasks):
+        """處理 (輸入路徑, 輸出路徑或 None) 清單，依完成順序逐一產生結果"""
+        # alpha map 在主執行緒載入，運算執行緒只讀取
+        self.remover._get_alpha_map(48)
+        feeder = threading.Thread(target=self._feed, args=(tasks,), daemon=True)
+        feeder.start()
+        for thread in self._threads:
+            thread.start()
+        try:
+            while True:
+                job = self._get(len(self._queues) - 1)
+                if job is _DONE:
+                    return
+                yield self._finish(job)
+        finally:
+            # 提早結束（例如中斷）時通知所有執行緒停止，進行中的檔案會處理完
+            self._stop.set()
+
+
+def run_pipeline(tasks: list, manifest_path: str = None, remover_options: dict = None,
+                 collect_metrics: bool = False, readers: int = DEFAULT_READERS,
+                 workers: int = None, writers: int = DEFAULT_WRITERS,
+                 queue_size: int = None):
+    """
+    以執行緒管線處理 (輸入路徑, 輸出路徑) 清單，依完成順序回傳結果
+    結果與 watermark_batch.run_batch 相同
+
+    Args:
+        tasks: (輸入路徑, 輸出路徑或 None) 清單
+        manifest_path: 處理紀錄檔路徑（需已建立）
+        remover_options: 建立 WatermarkRemover 的參數（見 remover_options_from_args）
+        collect_metrics: 是否量測各階段耗時
+        readers / workers / writers: 各階段的執行緒數，workers 預設為 CPU 核心數
+        queue_size: 各階段之間的佇列上限
+    """
+    from remove_watermark import WatermarkRemover
+
+    remover = WatermarkRemover(**(remover_options or {}))
+    pipeline = Pipeline(
+        remover, readers, workers, writers, queue_size, manifest_path, collect_metrics
+    )
+    yield from pipeline.run(tasks)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+KillWatermark 掃描模式（唯讀）
+平行偵測大量圖片並輸出報表（JSONL 或 CSV），不修改也不編碼任何檔案。
+大尺寸 JPEG 以 draft 模式縮小解碼，只解出偵測需要的解析度。
+
+使用方式：
+    python3 remove_watermark.py scan <路徑/目錄/glob> [...] [-r] [-j 行程數] [-o 報表.jsonl|報表.csv]
+"""
+
+import sys
+import os
+import csv
+import json
+import time
+import argparse
+import multiprocessing
+
+from watermark_batch import collect_inputs, add_detect_arguments, detect_options_from_args
+
+# 報表欄位
+REPORT_FIELDS = (
+    "path", "status", "width", "height", "bytes", "format",
+    "x", "y", "logo_size", "alpha_scale", "score", "base_score",
+    "decode_ms", "detect_ms", "draft_scale", "error",
+)
+# draft 縮小後 logo 至少要保留的像素數
+DRAFT_MIN_LOGO_SIZE = 48
+
+# 各工作行程的 WatermarkRemover（由 _init_worker 建立）
+_worker_remover = None
+_worker_draft = True
+
+
+def _draft_scale(remover, image) -> int:
+    """
+    JPEG draft 模式可用的縮小倍率（2/4/8），logo 與邊距需能整除且縮小後不小於 48 px；
+    不適用時回傳 1
+    """
+    if image.format != "JPEG" or remover.search:
+        return 1
+    config = remover._detect_watermark_config(*image.size)
+    for scale in (8, 4, 2):
+        if (config["logo_size"] % scale == 0 and config["margin_right"] % scale == 0
+                and config["logo_size"] // scale >= DRAFT_MIN_LOGO_SIZE):
+            return scale
+    return 1
+
+
+def scan_file(remover, path: str, draft: bool = True) -> dict:
+    """
+    偵測單一檔案（不編碼、不寫入）
+
+    Returns:
+        REPORT_FIELDS 中的欄位，status 為 detected / no_watermark / error；
+        以 draft 縮小解碼時（draft_scale > 1）不含 alpha_scale、score 與 base_score
+    """
+    from PIL import Image
+
+    row = {"path": path, "draft_scale": 1}
+    try:
+        row["bytes"] = os.path.getsize(path)
+        start = time.perf_counter()
+        image = Image.open(path)
+        width, height = image.size
+        row.update(width=width, height=height, format=image.format)
+
+        scale = _draft_scale(remover, image) if draft else 1
+        if scale > 1:
+            image.draft("RGB", (-(-width // scale), -(-height // scale)))
+            if round(width / image.width) != scale:
+                scale = 1
+        image.load()
+        row["decode_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+        start = time.perf_counter()
+        if scale > 1:
+            # 縮小解碼時只檢查固定位置，回報原始解析度的座標；
+            # 使用由 96 素材縮小的 alpha map，而不是另一份 48 素材
+            config = remover._detect_watermark_config(width, height)
+            position = remover._calculate_watermark_position(width, height, config)
+            size = config["logo_size"] // scale
+            detection = remover._detect_at(
+                image,
+                round(position["x"] / scale),
+                round(position["y"] / scale),
+                size,
+                remover._get_resampled(size),
+            )
+            if detection is not None:
+                detection.update(
+                    x=position["x"], y=position["y"], size=config["logo_size"]
+                )
+        else:
+            detection = remover._detect_watermark(image)
+        row["detect_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        row["draft_scale"] = scale
+
+        if detection is None:
+            row["status"] = "no_watermark"
+        else:
+            row.update(
+                status="detected",
+                x=detection["x"],
+                y=detection["y"],
+                logo_size=detection["size"],
+            )
+            # 縮小解碼的 alpha 強度與分數只反映縮小後的區塊，不代表完整解碼的結果，留空
+            if scale == 1:
+                row.update(
+                    alpha_scale=detection["alpha_scale"],
+                    score=round(float(detection["score"]), 6),
+                    base_score=round(float(detection["base_score"]), 6),
+                )
+    except Exception as e:
+        row["status"] = "error"
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def _init_worker(detect_options: dict = None, draft: bool = True):
+    """工作行程初始化：建立並預熱 WatermarkRemover"""
+    global _worker_remover, _worker_draft
+    from remove_watermark import WatermarkRemover
+
+    _worker_remover = WatermarkRemover(**(detect_options or {}))
+    for size in (48, 96):
+        _worker_remover._get_alpha_norm(size)
+    _worker_draft = draft
+
+
+def _run_task(path: str) -> dict:
+    return scan_file(_worker_remover, path, _worker_draft)
+
+
+def run_scan(paths: list, jobs: int = None, detect_options: dict = None, draft: bool = True):
+    """以行程池平行掃描，依完成順序回傳結果"""
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) <= 1:
+        _init_worker(detect_options, draft)
+        for path in paths:
+            yield _run_task(path)
+        return
+
+    jobs = min(jobs, len(paths))
+    chunksize = max(1, min(16, len(paths) // (jobs * 8)))
+    with multiprocessing.Pool(
+        jobs, initializer=_init_worker, initargs=(detect_options, draft)
+    ) as pool:
+        yield from pool.imap_unordered(_run_task, paths, chunksize=chunksize)
+
+
+class ReportWriter:
+    """依副檔名（或指定格式）寫出 JSONL 或 CSV 報表，每筆結果立即寫入"""
+
+    def __init__(self, fp, report_format: str, fields: tuple = REPORT_FIELDS):
+        self.fp = fp
+        self.report_format = report_format
+        if report_format == "csv":
+            self._writer = csv.DictWriter(fp, fieldnames=fields, extrasaction="ignore")
+            self._writer.writeheader()
+
+    def write(self, row: dict):
+        if self.report_format == "csv":
+            self._writer.writerow(row)
+        else:
+            self.fp.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="remove_watermark.py scan",
+        description="偵測圖片是否有浮水印並輸出報表（不修改任何檔案）",
+    )
+    parser.add_argument("inputs", nargs="+", help="圖片路徑、目錄或 glob 樣式")
+    parser.add_argument("-r", "--recursive", action="store_true", help="遞迴處理子目錄")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="工作行程數（預設為 CPU 核心數）"
+    )
+    parser.add_argument(
+        "-o", "--output", default=None,
+        help="報表檔路徑（.csv 輸出 CSV，其餘為 JSONL；預設輸出到標準輸出）",
+    )
+    parser.add_argument(
+        "--format", choices=["jsonl", "csv"], default=None, help="報表格式（預設依副檔名決定）"
+    )
+    parser.add_argument(
+        "--no-draft", action="store_true", help="JPEG 一律以完整解析度解碼"
+    )
+    add_detect_arguments(parser)
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """掃描模式主程式，有檔案失敗時回傳 1"""
+    args = build_parser().parse_args(argv)
+
+    paths = [path for path, _ in collect_inputs(args.inputs, args.recursive)]
+    if not paths:
+        print("錯誤: 找不到任何圖片檔案", file=sys.stderr)
+        return 1
+
+    report_format = args.format
+    if report_format is None:
+        is_csv = args.output is not None and args.output.lower().endswith(".csv")
+        report_format = "csv" if is_csv else "jsonl"
+
+    counts = {"detected": 0, "no_watermark": 0, "error": 0}
+    start = time.perf_counter()
+    output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        writer = ReportWriter(output, report_format)
+        for row in run_scan(
+            paths, args.jobs, detect_options_from_args(args), draft=not args.no_draft
+        ):
+            counts[row["status"]] += 1
+            writer.write(row)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    rate = len(paths) / elapsed if elapsed > 0 else 0.0
+    # 報表可能輸出到標準輸出，摘要寫到標準錯誤
+    print(
+        f"掃描 {len(paths)} 個檔案：偵測到 {counts['detected']}、"
+        f"無浮水印 {counts['no_watermark']}、失敗 {counts['error']}；"
+        f"耗時 {elapsed:.2f} 秒，{rate:.1f} 檔案/秒",
+        file=sys.stderr,
+    )
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
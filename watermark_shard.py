@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+KillWatermark 分片與續跑
+大量封存檔案可分給多台機器處理：批次模式以 --shard i/n 依相對路徑的穩定雜湊分片，
+每個分片將完成的檔案逐筆附加到自己的檢查點紀錄（JSONL），中斷後重新執行同一個分片時
+略過已完成的檔案；merge 將各分片的紀錄合併為一份報表，並回報缺少或未完成的分片。
+只讀寫本機（或共用掛載）上的檔案，不需要任何協調服務。
+
+使用方式：
+    python3 remove_watermark.py batch archive/ -r -o cleaned/ --shard 1/4 --checkpoint-dir shards/
+    python3 remove_watermark.py merge shards/ [-o 報表.jsonl|報表.csv]
+"""
+
+import sys
+import os
+import json
+import time
+import hashlib
+import argparse
+
+from watermark_manifest import REUSABLE_STATUSES
+
+# 合併報表的欄位
+MERGED_FIELDS = (
+    "path", "status", "output", "error", "bytes", "mtime_ns", "elapsed", "shard",
+)
+# 檢查點紀錄每寫入多少筆 fsync 一次（行程被中止時已 flush 的內容不會遺失）
+CHECKPOINT_SYNC_INTERVAL = 100
+
+
+def parse_shard(value: str) -> tuple:
+    """解析 --shard 參數 "i/n"（i 從 1 開始）"""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("分片格式應為 i/n，例如 1/4")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError("分片編號必須介於 1 到 n")
+    return index, count
+
+
+def shard_of(rel_path: str, count: int) -> int:
+    """
+    相對路徑所屬的分片（1 到 count）
+    使用 BLAKE2b 而不是 hash()，不同機器、不同 Python 版本都會得到相同結果；
+    路徑分隔字元統一為 /，Windows 與 macOS 也一致
+    """
+    key = rel_path.replace(os.sep, "/").encode("utf-8")
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+
+def select_shard(inputs: list, shard: tuple) -> list:
+    """從 collect_inputs 的結果中選出屬於指定分片的 (檔案路徑, 相對路徑)"""
+    index, count = shard
+    return [(path, rel_path) for path, rel_path in inputs if shard_of(rel_path, count) == index]
+
+
+def checkpoint_path(directory: str, shard: tuple = None) -> str:
+    """分片的檢查點紀錄路徑，未分片時視為 1/1"""
+    index, count = shard or (1, 1)
+    return os.path.join(directory, f"shard-{index}-of-{count}.jsonl")
+
+
+class CheckpointLog:
+    """
+    分片的檢查點紀錄（只附加的 JSONL）
+    每次執行先寫入一筆 run 紀錄，之後每完成一個檔案寫入一筆結果，全部處理完後寫入 finished 紀錄；
+    重新執行時讀入既有紀錄，路徑、大小與修改時間都相同且已成功的檔案不再處理。
+    路徑一律以絕對路徑記錄與比對，從其他工作目錄或以不同寫法（./a.png）重新執行也能續跑。
+    行程在寫入途中被中止時，最後一行可能不完整，讀取時會略過
+    """
+
+    def __init__(self, path: str, shard: tuple = None):
+        self.path = path
+        self.shard = shard or (1, 1)
+        self.done = {}  # 絕對路徑 -> (大小, 修改時間)
+        self._unsynced = 0
+        needs_newline = self._load()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            self._file.write("\n")
+        self._write({"run": time.time(), "shard": list(self.shard), "pid": os.getpid()})
+
+    def _load(self) -> bool:
+        """讀入既有紀錄，回傳最後一行是否不完整（需要先補上換行）"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8", errors="replace") as f:
+            content = f.read()
+        for entry in iter_entries(content.splitlines()):
+            if "run" in entry:
+                if tuple(entry.get("shard", ())) != self.shard:
+                    raise ValueError(
+                        f"{self.path} 屬於分片 {entry.get('shard')}，與 {list(self.shard)} 不符"
+                    )
+                continue
+            if "finished" in entry:
+                continue
+            # 舊版紀錄可能是相對路徑
+            key = os.path.abspath(entry["path"])
+            if entry.get("status") in REUSABLE_STATUSES:
+                self.done[key] = (entry.get("bytes"), entry.get("mtime_ns"))
+            else:
+                # 失敗的檔案下次重試
+                self.done.pop(key, None)
+        return bool(content) and not content.endswith("\n")
+
+    def is_done(self, path: str) -> bool:
+        """檔案已在先前的執行中完成，且之後沒有變更"""
+        entry = self.done.get(os.path.abspath(path))
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return entry == (stat.st_size, stat.st_mtime_ns)
+
+    def _write(self, entry: dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def record(self, result: dict):
+        """附加一筆處理結果（不含各階段量測，路徑轉為絕對路徑）"""
+        entry = {key: value for key, value in result.items() if key != "metrics"}
+        entry["path"] = os.path.abspath(entry["path"])
+        self._write(entry)
+        if entry.get("status") in REUSABLE_STATUSES:
+            self.done[entry["path"]] = (entry.get("bytes"), entry.get("mtime_ns"))
+        self._unsynced += 1
+        if self._unsynced >= CHECKPOINT_SYNC_INTERVAL:
+            self.sync()
+
+    def finish(self):
+        """記錄這次執行已處理完分片中的所有檔案（中斷的執行沒有這筆紀錄）"""
+        self._write({"finished": time.time(), "shard": list(self.shard)})
+
+    def sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        self.sync()
+        self._file.close()
+
+
+def iter_entries(lines):
+    """逐行解析檢查點紀錄，略過空白與不完整的行"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(entry, dict) and ("run" in entry or "finished" in entry or "path" in entry):
+            yield entry
+
+
+def collect_logs(inputs: list) -> list:
+    """展開輸入：檢查點紀錄檔或包含 shard-*.jsonl 的目錄"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(
+                os.path.join(item, name) for name in sorted(os.listdir(item))
+                if name.startswith("shard-") and name.endswith(".jsonl")
+            )
+        else:
+            paths.append(item)
+    return paths
+
+
+def merge_logs(paths: list) -> tuple:
+    """
+    合併各分片的檢查點紀錄
+    同一個檔案有多筆結果時（例如失敗後重試），以最後一筆為準；
+    分片最後一次執行沒有 finished 紀錄時視為未完成（執行被中斷）
+
+    Returns:
+        (依路徑排序的結果清單, 分片數, 缺少的分片編號清單, 未完成的分片編號清單)
+    """
+    rows = {}
+    finished = {}  # 分片編號 -> 最後一次執行是否已完成
+    count = None
+    for path in paths:
+        shard = None
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for entry in iter_entries(f):
+                if "run" in entry:
+                    index, entry_count = entry["shard"]
+                    if count is not None and entry_count != count:
+                        raise ValueError(f"{path} 的分片數 {entry_count} 與其他紀錄的 {count} 不符")
+                    count = entry_count
+                    finished[index] = False
+                    shard = f"{index}/{entry_count}"
+                    continue
+                if "finished" in entry:
+                    finished[entry["shard"][0]] = True
+                    continue
+                row = {key: entry.get(key) for key in MERGED_FIELDS if key in entry}
+                row["shard"] = shard
+                rows[entry["path"]] = row
+    missing = [index for index in range(1, (count or 0) + 1) if index not in finished]
+    incomplete = sorted(index for index, done in finished.items() if not done)
+    return [rows[path] for path in sorted(rows)], count or 0, missing, incomplete
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="remove_watermark.py merge",
+        description="合併各分片的檢查點紀錄為一份報表",
+    )
+    parser.add_argument("inputs", nargs="+", help="檢查點紀錄檔，或包含 shard-*.jsonl 的目錄")
+    parser.add_argument(
+        "-o", "--output", default=None,
+        help="報表檔路徑（.csv 輸出 CSV，其餘為 JSONL；預設輸出到標準輸出）",
+    )
+    parser.add_argument(
+        "--format", choices=["jsonl", "csv"], default=None, help="報表格式（預設依副檔名決定）"
+    )
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """合併模式主程式，有檔案失敗、缺少分片或分片未完成時回傳 1"""
+    from watermark_scan import ReportWriter
+
+    args = build_parser().parse_args(argv)
+    paths = collect_logs(args.inputs)
+    if not paths:
+        print("錯誤: 找不到任何檢查點紀錄", file=sys.stderr)
+        return 1
+    try:
+        rows, count, missing, incomplete = merge_logs(paths)
+    except (OSError, ValueError) as e:
+        print(f"錯誤: {e}", file=sys.stderr)
+        return 1
+
+    report_format = args.format
+    if report_format is None:
+        is_csv = args.output is not None and args.output.lower().endswith(".csv")
+        report_format = "csv" if is_csv else "jsonl"
+
+    counts = {"ok": 0, "no_watermark": 0, "error": 0}
+    output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        writer = ReportWriter(output, report_format, MERGED_FIELDS)
+        for row in rows:
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+            writer.write(row)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    # 報表可能輸出到標準輸出，摘要寫到標準錯誤
+    print(
+        f"合併 {len(paths)} 個紀錄（{count - len(missing) - len(incomplete)}/{count} 個分片已完成）："
+        f"{len(rows)} 個檔案，移除 {counts['ok']}、無浮水印 {counts['no_watermark']}、"
+        f"失敗 {counts['error']}",
+        file=sys.stderr,
+    )
+    if missing:
+        print(f"缺少分片: {', '.join(f'{index}/{count}' for index in missing)}", file=sys.stderr)
+    if incomplete:
+        print(
+            f"未完成的分片（執行被中斷）: {', '.join(f'{index}/{count}' for index in incomplete)}",
+            file=sys.stderr,
+        )
+    return 1 if counts["error"] or missing or incomplete else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
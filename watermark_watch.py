@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+KillWatermark 監看資料夾模式
+持續監看 spool 目錄，檔案寫入完成（大小與修改時間穩定）後交給行程池處理，
+結果以暫存檔 + rename 的方式原子寫入輸出目錄。
+
+使用方式：
+    python3 remove_watermark.py watch <spool 目錄> -o <輸出目錄> [-j 行程數]
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import signal
+import argparse
+import tempfile
+import collections
+import multiprocessing
+
+from watermark_batch import (
+    _is_candidate,
+    _positive_int,
+    add_remover_arguments,
+    remover_options_from_args,
+    process_file,
+)
+
+# 各工作行程的 WatermarkRemover（由 _init_worker 建立）
+_worker_remover = None
+
+
+def _init_worker(remover_options: dict = None):
+    """工作行程初始化：建立並預熱 WatermarkRemover"""
+    global _worker_remover
+    from remove_watermark import WatermarkRemover
+
+    # Ctrl-C 由主行程處理，讓工作行程完成手上的檔案
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_remover = WatermarkRemover(**(remover_options or {}))
+    _worker_remover._get_alpha_map(48)
+    _worker_remover._get_alpha_map(96)
+
+
+def _atomic_copy(src: str, dst: str):
+    """複製檔案到暫存檔後 rename，避免下游讀到寫到一半的檔案"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dst), prefix=".", suffix=".part")
+    os.close(fd)
+    try:
+        shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _process_spool_file(task: tuple) -> dict:
+    """
+    處理 spool 中的單一檔案
+    有浮水印時寫入移除後的結果，沒有時原樣複製，兩者都以 rename 原子完成
+    """
+    path, output_path, remove_source = task
+    out_dir, name = os.path.split(output_path)
+    ext = os.path.splitext(name)[1]
+    # 保留副檔名，remove_watermark 依副檔名決定輸出格式
+    tmp_path = os.path.join(out_dir, f".{name}.{os.getpid()}.part{ext}")
+
+    result = process_file(_worker_remover, path, tmp_path)
+    try:
+        if result["status"] == "ok":
+            os.replace(tmp_path, output_path)
+        elif result["status"] == "no_watermark":
+            _atomic_copy(path, output_path)
+        if result["status"] != "error":
+            result["output"] = output_path
+            if remove_source:
+                os.remove(path)
+    except OSError as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return result
+
+
+class SpoolWatcher:
+    """
+    監看 spool 目錄並分派處理
+    只有目錄本身的修改時間改變時才重新列出檔案，其餘時間只 stat 尚未穩定的檔案
+    """
+
+    def __init__(self, spool_dir: str, output_dir: str, jobs: int = None,
+                 settle: float = 1.0, remove_source: bool = False,
+                 remover_options: dict = None):
+        self.spool_dir = spool_dir
+        self.output_dir = output_dir
+        self.jobs = jobs or os.cpu_count() or 1
+        self.settle = settle
+        self.remove_source = remove_source
+        self.remover_options = remover_options
+        # 每個工作行程最多排 2 個工作，其餘留在佇列中，避免記憶體無限制成長
+        self.max_in_flight = self.jobs * 2
+
+        self.pending = {}  # 路徑 -> [大小, 修改時間, 發現時間, 穩定起始時間]
+        self.queued = collections.deque()  # (路徑, 發現時間)
+        self.in_flight = {}  # 路徑 -> (AsyncResult, 發現時間)
+        self.tracked = set()  # 等待、排隊與處理中的路徑
+        # 路徑 -> (大小, 修改時間)，避免重複處理仍留在 spool 的檔案；
+        # 失敗的檔案也記錄在此，內容變更後才重試，不會在每次目錄變動時重複失敗
+        self.done = {}
+        self.counts = {"ok": 0, "no_watermark": 0, "error": 0}
+        self.last_latency = 0.0
+        self._dir_mtime = None
+        self._dir_listed_at = 0.0
+
+    def _scan_directory(self, now: float):
+        """目錄有變動時列出新檔案加入等待清單"""
+        try:
+            dir_mtime = os.stat(self.spool_dir).st_mtime_ns
+        except FileNotFoundError:
+            return
+        # 檔案系統的時間精度可能只有 1 秒，剛變動過的目錄在精度範圍內仍重新列出
+        if dir_mtime == self._dir_mtime and now - self._dir_listed_at > 2.0:
+            return
+        if dir_mtime != self._dir_mtime:
+            self._dir_listed_at = now
+        self._dir_mtime = dir_mtime
+
+        names = set()
+        with os.scandir(self.spool_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                if not _is_candidate(entry.name):
+                    continue
+                names.add(entry.path)
+                if entry.path in self.tracked:
+                    continue
+                stat = entry.stat()
+                if entry.path in self.done:
+                    # 同名檔案被替換（例如以 rename 原子寫入新內容）時重新處理
+                    if self.done[entry.path] == (stat.st_size, stat.st_mtime_ns):
+                        continue
+                    del self.done[entry.path]
+                self.tracked.add(entry.path)
+                self.pending[entry.path] = [stat.st_size, stat.st_mtime_ns, now, now]
+        # 已從 spool 移走的檔案不再需要記錄
+        for path in [p for p in self.done if p not in names]:
+            del self.done[path]
+
+    def _check_pending(self, now: float):
+        """檔案大小與修改時間在 settle 秒內都沒有變化，才視為寫入完成"""
+        for path, info in list(self.pending.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self.pending[path]
+                self.tracked.discard(path)
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (info[0], info[1]):
+                info[0], info[1], info[3] = stat.st_size, stat.st_mtime_ns, now
+            elif now - info[3] >= self.settle:
+                del self.pending[path]
+                self.queued.append((path, info[2]))
+
+    def _dispatch(self, pool):
+        while self.queued and len(self.in_flight) < self.max_in_flight:
+            path, detected_at = self.queued.popleft()
+            output_path = os.path.join(self.output_dir, os.path.basename(path))
+            task = (path, output_path, self.remove_source)
+            self.in_flight[path] = (pool.apply_async(_process_spool_file, (task,)), detected_at)
+
+    def _collect(self, now: float, quiet: bool = False):
+        for path, (async_result, detected_at) in list(self.in_flight.items()):
+            if not async_result.ready():
+                continue
+            del self.in_flight[path]
+            self.tracked.discard(path)
+            result = async_result.get()
+            self.counts[result["status"]] += 1
+            self.last_latency = now - detected_at
+            # 失敗時原檔仍留在 spool，即使設定了 remove_source 也要記錄
+            if result["status"] == "error" or not self.remove_source:
+                self.done[path] = (result.get("bytes"), result.get("mtime_ns"))
+            if result["status"] == "error":
+                print(f"✗ {path}: {result['error']}", flush=True)
+            elif not quiet:
+                print(f"✓ {path} -> {result['output']}", flush=True)
+
+    def stats(self, now: float = None) -> dict:
+        """
+        目前的佇列狀態
+        queue_depth 為尚未完成的檔案數，lag_seconds 為最舊的待處理檔案已等待的秒數
+        """
+        now = time.monotonic() if now is None else now
+        waiting = [info[2] for info in self.pending.values()]
+        waiting += [detected_at for _, detected_at in self.queued]
+        waiting += [detected_at for _, detected_at in self.in_flight.values()]
+        return {
+            "pending": len(self.pending),
+            "queued": len(self.queued),
+            "in_flight": len(self.in_flight),
+            "queue_depth": len(waiting),
+            "lag_seconds": round(now - min(waiting), 3) if waiting else 0.0,
+            "last_latency_seconds": round(self.last_latency, 3),
+            "processed": self.counts["ok"] + self.counts["no_watermark"],
+            "failed": self.counts["error"],
+        }
+
+    def run(self, interval: float = 0.5, stats_interval: float = 10.0,
+            stats_file: str = None, quiet: bool = False):
+        """持續監看直到收到中斷（Ctrl-C），結束前等待進行中的工作完成"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        last_stats = time.monotonic()
+        with multiprocessing.Pool(
+            self.jobs, initializer=_init_worker, initargs=(self.remover_options,)
+        ) as pool:
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._scan_directory(now)
+                    self._check_pending(now)
+                    self._dispatch(pool)
+                    self._collect(now, quiet)
+                    if now - last_stats >= stats_interval:
+                        last_stats = now
+                        self._report(stats_file, now)
+                    time.sleep(interval)
+            except KeyboardInterrupt:
+                print("正在等待進行中的檔案完成...", flush=True)
+                while self.in_flight:
+                    time.sleep(0.05)
+                    self._collect(time.monotonic(), quiet)
+            finally:
+                self._report(stats_file)
+
+    def _report(self, stats_file: str = None, now: float = None):
+        stats = self.stats(now)
+        print(
+            f"[watch] 佇列 {stats['queue_depth']}（等待寫入 {stats['pending']}、"
+            f"排隊 {stats['queued']}、處理中 {stats['in_flight']}），"
+            f"延遲 {stats['lag_seconds']:.1f} 秒，完成 {stats['processed']}，"
+            f"失敗 {stats['failed']}",
+            flush=True,
+        )
+        if stats_file:
+            stats["timestamp"] = time.time()
+            tmp_path = f"{stats_file}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(stats, f)
+            os.replace(tmp_path, stats_file)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="remove_watermark.py watch",
+        description="監看 spool 目錄並持續移除新圖片的浮水印",
+    )
+    parser.add_argument("spool_dir", help="監看的目錄")
+    parser.add_argument("-o", "--output-dir", required=True, help="輸出目錄")
+    parser.add_argument(
+        "-j", "--jobs", type=_positive_int, default=None, help="工作行程數（預設為 CPU 核心數）"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=0.5, help="輪詢間隔秒數（預設 0.5）"
+    )
+    parser.add_argument(
+        "--settle", type=float, default=1.0,
+        help="檔案大小與修改時間維持不變多少秒後才處理（預設 1）",
+    )
+    parser.add_argument(
+        "--remove-source", action="store_true", help="處理完成後刪除 spool 中的原檔"
+    )
+    parser.add_argument(
+        "--stats-interval", type=float, default=10.0, help="輸出佇列狀態的間隔秒數"
+    )
+    parser.add_argument(
+        "--stats-file", default=None, help="同時將佇列狀態寫入此 JSON 檔（供監控使用）"
+    )
+    parser.add_argument("-q", "--quiet", action="store_true", help="只輸出失敗的檔案與佇列狀態")
+    add_remover_arguments(parser)
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """監看模式主程式"""
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.spool_dir):
+        print(f"錯誤: 找不到目錄 {args.spool_dir}")
+        return 1
+
+    watcher = SpoolWatcher(
+        args.spool_dir, args.output_dir, args.jobs, args.settle, args.remove_source,
+        remover_options_from_args(args),
+    )
+    print(f"監看中: {args.spool_dir} -> {args.output_dir}（Ctrl-C 結束）", flush=True)
+    watcher.run(args.interval, args.stats_interval, args.stats_file, args.quiet)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())